@@ -0,0 +1,155 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Times loading an instance to show it, against the fake Nova and guest.
+
+The fakes answer after a delay: usually a few tens of milliseconds, but
+one call in fifty takes seconds. The old way of asking Nova and then the
+guest is timed against the concurrent load, which has a deadline.
+
+    python tools/instance_show_benchmark.py [requests] [deadline]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import eventlet
+from sqlalchemy import exc
+
+from trove.common import cfg
+from trove.common.context import TroveContext
+from trove.db import get_db_api
+from trove.db.sqlalchemy import session
+from trove.instance.tasks import InstanceTasks
+from trove.tests.fakes import guestagent as fake_guest
+from trove.tests.fakes import nova as fake_nova
+
+CONF = cfg.CONF
+
+
+def latency(typical, slow, rng):
+    """A typical call takes around typical seconds, one in fifty slow."""
+    if rng.random() < 0.02:
+        return slow
+    return rng.uniform(typical * 0.5, typical * 1.5)
+
+
+class SlowServers(object):
+
+    def __init__(self, servers, rng):
+        self.servers = servers
+        self.rng = rng
+
+    def get(self, id):
+        eventlet.sleep(latency(0.04, 2.0, self.rng))
+        return self.servers.get(id)
+
+
+class SlowNova(object):
+
+    def __init__(self, context, rng):
+        self.servers = SlowServers(
+            fake_nova.fake_create_nova_client(context).servers, rng)
+
+
+class SlowGuest(object):
+
+    def __init__(self, guest, rng):
+        self.guest = guest
+        self.rng = rng
+
+    def get_volume_info(self):
+        eventlet.sleep(latency(0.03, 2.0, self.rng))
+        return self.guest.get_volume_info()
+
+
+def load_sequentially(models, context, id):
+    """Loads the instance the way it was before Nova and the guest were
+    asked at the same time."""
+    db_info = models.get_db_info(context, id)
+    models.load_simple_instance_server_status(context, db_info)
+    service_status = models.InstanceServiceStatus.find_by(instance_id=id)
+    instance = models.DetailInstance(context, db_info, service_status)
+    return models.load_guest_info(instance, context, id, live=True)
+
+
+def load_concurrently(models, context, id):
+    return models.load_instance_with_guest(models.DetailInstance, context,
+                                           id, live=True)
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def main(requests, deadline, connection):
+    CONF.set_override('sql_connection', connection)
+    CONF.set_override('instance_show_timeout', deadline)
+    get_db_api().db_sync(CONF)
+    try:
+        session.configure_db(CONF)
+    except exc.NoSuchTableError:
+        # The SQLite migrations leave a foreign key pointing at their
+        # temporary table, which only trips up the first mapping.
+        session.configure_db(CONF)
+    from trove.instance import models
+
+    context = TroveContext(tenant='bench', is_admin=True)
+    server = fake_nova.FakeServer(None, context, 'compute-bench', 'bench',
+                                  'image', 1, None, [])
+    server._current_status = 'ACTIVE'
+    fake_nova.FAKE_SERVERS_DB[server.id] = server
+    db_info = models.DBInstance.create(
+        name='bench', flavor_id='1', tenant_id='bench',
+        compute_instance_id=server.id, task_status=InstanceTasks.NONE)
+    models.InstanceServiceStatus.create(
+        instance_id=db_info.id, status=models.ServiceStatuses.RUNNING)
+
+    rng = random.Random(42)
+    models.create_nova_client = lambda context: SlowNova(context, rng)
+    models.create_guest_client = lambda context, id: SlowGuest(
+        fake_guest.fake_create_guest_client(context, id), rng)
+
+    for name, load in (('sequential', load_sequentially),
+                       ('concurrent', load_concurrently)):
+        timings = []
+        degraded = 0
+        for i in xrange(requests):
+            start = time.time()
+            instance = load(models, context, db_info.id)
+            timings.append(time.time() - start)
+            if (instance.volume_used is None or
+                    instance.db_info.addresses is None):
+                degraded += 1
+        print("%s: p50 %.0fms, p99 %.0fms, max %.0fms, %d of %d degraded" %
+              (name, percentile(timings, 0.5) * 1000,
+               percentile(timings, 0.99) * 1000, max(timings) * 1000,
+               degraded, requests))
+
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    deadline = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        main(requests, deadline, 'sqlite:///%s' % path)
+    finally:
+        os.remove(path)
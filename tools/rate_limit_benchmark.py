@@ -0,0 +1,101 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Times Limiter.check_for_delay with each rate limiter backend.
+
+Tenants idle long enough for their buckets to drain are dropped by the
+memory backend, so the number it keeps is printed too.
+
+The shared memory backend is also run from several forked processes at
+once, the way API workers use it, and the requests they let through are
+checked against the limit.
+
+    python tools/rate_limit_benchmark.py [requests] [workers]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from trove.common import limits
+
+LIMITS = [
+    limits.Limit("POST", "*", ".*", 200, limits.PER_MINUTE),
+    limits.Limit("PUT", "*", ".*", 200, limits.PER_MINUTE),
+    limits.Limit("DELETE", "*", ".*", 200, limits.PER_MINUTE),
+    limits.Limit("GET", "*", ".*", 200, limits.PER_MINUTE),
+]
+
+
+def time_checks(limiter, requests, tenants=100):
+    start = time.time()
+    for i in xrange(requests):
+        limiter.check_for_delay("GET", "/v1.0/tenant/instances",
+                                "tenant_%d" % (i % tenants))
+    return (time.time() - start) / requests * 1e6
+
+
+def count_allowed(limiter, requests):
+    allowed = 0
+    for i in xrange(requests):
+        delay, error = limiter.check_for_delay("POST", "/v1.0/t/instances",
+                                               "one_tenant")
+        if not delay:
+            allowed += 1
+    return allowed
+
+
+def main(requests, workers):
+    backend = limits.MemoryLimiterBackend()
+    memory = limits.Limiter(LIMITS, backend=backend)
+    print("memory backend:        %6.1fus per request, %d tenants kept" %
+          (time_checks(memory, requests), len(backend)))
+
+    state_dir = tempfile.mkdtemp()
+    path = os.path.join(state_dir, 'rate_limits')
+    try:
+        shared = limits.Limiter(
+            LIMITS, backend=limits.SharedMemoryLimiterBackend(path, 65536))
+        print("shared memory backend: %6.1fus per request" %
+              time_checks(shared, requests))
+
+        read_fd, write_fd = os.pipe()
+        pids = []
+        for worker in xrange(workers):
+            pid = os.fork()
+            if pid == 0:
+                limiter = limits.Limiter(
+                    LIMITS,
+                    backend=limits.SharedMemoryLimiterBackend(path, 65536))
+                os.write(write_fd, "%d\n" % count_allowed(limiter, 500))
+                os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        os.close(write_fd)
+        allowed = sum(int(line) for line in
+                      os.fdopen(read_fd).read().split())
+        print("%d workers let through %d POSTs against a limit of 200 "
+              "per minute" % (workers, allowed))
+    finally:
+        shutil.rmtree(state_dir)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
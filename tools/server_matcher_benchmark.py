@@ -0,0 +1,66 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Times matching instances to a compute server list, as the mgmt listing
+does: two lookups per instance.
+
+The matcher that scanned the whole list for every lookup is timed against
+the one that indexes the list by server id.
+
+    python tools/server_matcher_benchmark.py [servers]
+"""
+
+import sys
+import time
+
+from trove.instance.models import create_server_list_matcher
+
+
+class Server(object):
+
+    def __init__(self, id):
+        self.id = id
+
+
+def create_scanning_matcher(server_list):
+    """The matcher as it was before the list was indexed."""
+    def find_server(instance_id, server_id):
+        matches = [server for server in server_list if server.id == server_id]
+        if len(matches) != 1:
+            raise LookupError(server_id)
+        return matches[0]
+    return find_server
+
+
+def match_all(create_matcher, servers):
+    start = time.time()
+    find_server = create_matcher(servers)
+    for i in xrange(len(servers)):
+        find_server(str(i), 'compute-%d' % i)
+        find_server(str(i), 'compute-%d' % i)
+    return time.time() - start
+
+
+def main(count):
+    servers = [Server('compute-%d' % i) for i in xrange(count)]
+    for name, create_matcher in (('scan', create_scanning_matcher),
+                                 ('index', create_server_list_matcher)):
+        print("%s: matched %d instances in %.3fs" %
+              (name, count, match_all(create_matcher, servers)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,70 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Times request validation against the schemas in trove.common.apischema.
+
+Each body is validated with a validator built per call, the way requests
+used to be validated, and with the controller's cached validator.
+
+    python tools/validation_benchmark.py [iterations]
+"""
+
+import sys
+import timeit
+
+import jsonschema
+
+from trove.common import apischema
+from trove.common import wsgi
+
+
+class BenchmarkController(wsgi.Controller):
+    schemas = apischema.instance
+
+
+BODIES = [
+    ('create', apischema.instance['create'],
+     {"instance": {"name": "bench", "flavorRef": "1",
+                   "volume": {"size": 1},
+                   "databases": [{"name": "db1"}],
+                   "users": [{"name": "user1", "password": "secret",
+                              "databases": [{"name": "db1"}]}]}}),
+    ('resize volume', apischema.instance['action']['resize']['volume'],
+     {"resize": {"volume": {"size": 2}}}),
+    ('user create', apischema.user['create'],
+     {"users": [{"name": "user1", "password": "secret"}]}),
+    ('database create', apischema.dbschema['create'],
+     {"databases": [{"name": "db1"}]}),
+]
+
+
+def main(iterations):
+    BenchmarkController.compile_validators()
+    print("%-16s %12s %12s" % ("schema", "per call", "cached"))
+    for name, schema, body in BODIES:
+        uncached = timeit.timeit(
+            lambda: jsonschema.Draft4Validator(schema).is_valid(body),
+            number=iterations)
+        cached = timeit.timeit(
+            lambda: BenchmarkController.get_validator(schema).is_valid(body),
+            number=iterations)
+        print("%-16s %10.1fus %10.1fus" % (name,
+                                          uncached / iterations * 1e6,
+                                          cached / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
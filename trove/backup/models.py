@@ -99,6 +99,20 @@ class Backup(object):
             query = query.filter(DBBackup.id != exclude)
         return query.first()
 
+    @classmethod
+    def running_instance_ids(cls, instance_ids):
+        """
+        Returns the subset of instance_ids which have a running backup
+        :param instance_ids: Ids of the instances to check
+        """
+        if not instance_ids:
+            return set()
+        query = DBBackup.query()
+        query = query.filter(DBBackup.instance_id.in_(instance_ids),
+                             DBBackup.state.in_(BackupState.RUNNING_STATES))
+        query = query.filter_by(deleted=False)
+        return set(backup.instance_id for backup in query.all())
+
     @classmethod
     def get_by_id(cls, context, backup_id, deleted=False):
         """
@@ -117,29 +131,69 @@ class Backup(object):
             raise exception.NotFound(uuid=backup_id)
 
     @classmethod
-    def list(cls, context):
+    def list(cls, context, instance_id=None, state=None, created_since=None):
         """
         list all live Backups belong to given tenant
         :param cls:
         :param context: tenant_id included
+        :param instance_id: only list the backups of this instance
+        :param state: only list the backups in this state
+        :param created_since: only list the backups created at or after
+        this time
         :return:
         """
+        conditions = cls._filter_conditions(state, created_since)
+        if instance_id:
+            conditions['instance_id'] = instance_id
         db_info = DBBackup.find_all(tenant_id=context.tenant,
-                                    deleted=False)
+                                    deleted=False,
+                                    **conditions)
         return db_info
 
     @classmethod
-    def list_for_instance(cls, instance_id):
+    def list_for_instance(cls, instance_id, state=None, created_since=None):
         """
         list all live Backups associated with given instance
         :param cls:
         :param instance_id:
+        :param state: only list the backups in this state
+        :param created_since: only list the backups created at or after
+        this time
         :return:
         """
+        conditions = cls._filter_conditions(state, created_since)
         db_info = DBBackup.find_all(instance_id=instance_id,
-                                    deleted=False)
+                                    deleted=False,
+                                    **conditions)
         return db_info
 
+    @staticmethod
+    def _filter_conditions(state, created_since):
+        conditions = {}
+        if state:
+            conditions['state'] = state
+        if created_since:
+            conditions['criteria'] = [DBBackup.created >= created_since]
+        return conditions
+
+    @classmethod
+    def paginate(cls, context, query):
+        """
+        return a page of the backups in query, oldest first
+        :param cls:
+        :param context: limit and marker included
+        :param query: backups returned by list or list_for_instance
+        :return: the backups and the marker of the next page
+        """
+        limit = int(context.limit or CONF.backups_page_size)
+        if limit > CONF.backups_page_size:
+            limit = CONF.backups_page_size
+        data_view = DBBackup.find_by_pagination('backups', query, 'foo',
+                                                limit=limit,
+                                                marker=context.marker,
+                                                sort_keys=['created', 'id'])
+        return data_view.collection, data_view.next_page_marker
+
     @classmethod
     def fail_for_instance(cls, instance_id):
         query = DBBackup.query()
@@ -18,9 +18,12 @@
 from trove.common import wsgi
 from trove.backup import views
 from trove.backup.models import Backup
+from trove.backup.models import BackupState
 from trove.common import exception
 from trove.common import cfg
+from trove.common import pagination
 from trove.openstack.common import log as logging
+from trove.openstack.common import timeutils
 from trove.openstack.common.gettextutils import _
 import trove.common.apischema as apischema
 
@@ -28,6 +31,27 @@ CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
+def list_filters(params):
+    """Reads the state and created_since filters of a backup listing
+    from the query parameters."""
+    filters = {}
+    state = params.get('state')
+    if state:
+        state = state.upper()
+        if state not in BackupState.RUNNING_STATES + BackupState.END_STATES:
+            raise exception.BadRequest(_("Invalid backup state: %s") % state)
+        filters['state'] = state
+    created_since = params.get('created_since')
+    if created_since:
+        try:
+            filters['created_since'] = timeutils.normalize_time(
+                timeutils.parse_isotime(created_since))
+        except ValueError:
+            raise exception.BadRequest(_("Invalid created_since: %s") %
+                                       created_since)
+    return filters
+
+
 class BackupController(wsgi.Controller):
     """
     Controller for accessing backups in the OpenStack API.
@@ -40,8 +64,15 @@ class BackupController(wsgi.Controller):
         """
         LOG.debug("Listing Backups for tenant '%s'" % tenant_id)
         context = req.environ[wsgi.CONTEXT_KEY]
-        backups = Backup.list(context)
-        return wsgi.Result(views.BackupViews(backups).data(), 200)
+        filters = list_filters(req.GET)
+        backups, marker = Backup.paginate(
+            context, Backup.list(context,
+                                 instance_id=req.GET.get('instance_id'),
+                                 **filters))
+        view = views.BackupViews(backups)
+        paged = pagination.SimplePaginatedDataView(req.url, 'backups', view,
+                                                   marker)
+        return wsgi.Result(paged.data(), 200)
 
     def show(self, req, tenant_id, id):
         """Return a single backup."""
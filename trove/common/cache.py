@@ -0,0 +1,168 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Time limited caches for data Trove fetches from other services."""
+
+import collections
+import time
+
+from trove.common import cfg
+from trove.openstack.common import log as logging
+from trove.openstack.common.importutils import import_class
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+
+class MemoryBackend(object):
+    """Keeps cached values in the memory of the current process.
+
+    Entries are evicted once they expire or, when max_size is given, in
+    least recently used order once the cache is full.
+    """
+
+    def __init__(self, name, max_size=None):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        self._entries[key] = entry
+        return value
+
+    def set(self, key, value, ttl):
+        expires_at = time.time() + ttl if ttl else None
+        self._entries.pop(key, None)
+        self._entries[key] = (expires_at, value)
+        if self.max_size:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class MemcacheBackend(object):
+    """Keeps cached values in memcached so all API workers share them.
+
+    Keys carry a generation number stored in memcached, so clearing the
+    cache from any process is a matter of bumping it.
+    """
+
+    def __init__(self, name, max_size=None):
+        # python-memcached is only needed when this backend is configured.
+        import memcache
+        self.client = memcache.Client(CONF.memcached_servers)
+        self.prefix = "trove:%s" % name
+
+    def _generation(self):
+        generation_key = str(self.prefix)
+        generation = self.client.get(generation_key)
+        if generation is None:
+            # Starting from the clock keeps an evicted generation from
+            # bringing back entries written under an old one.
+            self.client.add(generation_key, int(time.time()))
+            generation = self.client.get(generation_key)
+        return generation
+
+    def _key(self, key):
+        return str("%s:%s:%s" % (self.prefix, self._generation(), key))
+
+    def get(self, key):
+        return self.client.get(self._key(key))
+
+    def set(self, key, value, ttl):
+        self.client.set(self._key(key), value, time=ttl or 0)
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        # Entries of the old generation are left to expire on their own.
+        if self.client.incr(str(self.prefix)) is None:
+            self.client.add(str(self.prefix), int(time.time()))
+
+
+class TTLCache(object):
+    """A cache whose entries expire after a fixed number of seconds.
+
+    Missing values can be cached too (negative caching) with their own,
+    usually shorter, time to live. A ttl of zero disables the cache.
+    """
+
+    NOT_FOUND = '__trove_cache_not_found__'
+
+    def __init__(self, name, ttl, negative_ttl=None, backend=None):
+        self.name = name
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.backend = backend or MemoryBackend(name)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        """Returns the cached value or None if there is none.
+
+        A cached miss is returned as TTLCache.NOT_FOUND.
+        """
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.enabled:
+            self.backend.set(key, value, self.ttl)
+
+    def set_not_found(self, key):
+        if self.enabled and self.negative_ttl > 0:
+            self.backend.set(key, self.NOT_FOUND, self.negative_ttl)
+
+    def invalidate(self, key):
+        if self.enabled:
+            LOG.debug("Invalidating %s from cache %s." % (key, self.name))
+            self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {'name': self.name,
+                'hits': self.hits,
+                'misses': self.misses}
+
+
+def create_cache(name, ttl, negative_ttl=None, backend=None, max_size=None):
+    """Creates a cache using the backend class named in the config."""
+    backend_class = import_class(backend or CONF.cache_backend)
+    return TTLCache(name, ttl, negative_ttl=negative_ttl,
+                    backend=backend_class(name, max_size=max_size))
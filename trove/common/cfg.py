@@ -75,13 +75,36 @@ common_opts = [
     cfg.IntOpt('users_page_size', default=20),
     cfg.IntOpt('databases_page_size', default=20),
     cfg.IntOpt('instances_page_size', default=20),
+    cfg.IntOpt('backups_page_size', default=20),
+    cfg.IntOpt('security_groups_page_size', default=20),
+    cfg.IntOpt('accounts_page_size', default=20),
     cfg.ListOpt('ignore_users', default=[]),
     cfg.ListOpt('ignore_dbs', default=[]),
     cfg.IntOpt('agent_call_low_timeout', default=5),
     cfg.IntOpt('agent_call_high_timeout', default=60),
+    cfg.FloatOpt('mgmt_instance_call_timeout', default=10.0,
+                 help='Seconds each of the Nova, Cinder and guest calls made '
+                      'to show an instance through the mgmt API may take.'),
+    cfg.FloatOpt('instance_show_timeout', default=5.0,
+                 help='Seconds the Nova and guest calls made to show an '
+                      'instance may take, together.'),
+    cfg.IntOpt('guest_update_concurrency', default=10,
+               help='Guests a guest update job updates at once on a host.'),
+    cfg.IntOpt('guest_update_timeout', default=60,
+               help='Seconds a guest update job waits for each guest.'),
+    cfg.FloatOpt('guest_update_max_failure_rate', default=0.2,
+                 help='Share of failed guests at which a guest update job '
+                      'stops starting new updates.'),
     cfg.StrOpt('guest_id', default=None),
     cfg.IntOpt('state_change_wait_time', default=3 * 60),
-    cfg.IntOpt('agent_heartbeat_time', default=10),
+    cfg.IntOpt('agent_heartbeat_time', default=60,
+               help='Seconds after its last heartbeat that a guest agent is '
+                    'considered down, and calls to it fail right away.'),
+    cfg.IntOpt('agent_heartbeat_interval', default=20,
+               help='Seconds between the heartbeats a guest agent writes.'),
+    cfg.IntOpt('agent_heartbeat_cache_ttl', default=5,
+               help='Seconds to cache the heartbeat of a guest agent that '
+                    'is up. Zero disables the cache.'),
     cfg.IntOpt('num_tries', default=3),
     cfg.StrOpt('volume_fstype', default='ext3'),
     cfg.StrOpt('format_options', default='-m 5'),
@@ -96,8 +119,18 @@ common_opts = [
     cfg.IntOpt('max_backups_per_user', default=5,
                help='default maximum number of backups created by a tenant'),
     cfg.StrOpt('quota_driver',
-               default='trove.quota.quota.DbQuotaDriver',
+               default='trove.quota.quota.AtomicDbQuotaDriver',
                help='default driver to use for quota checks'),
+    cfg.IntOpt('quota_reserve_retries', default=5,
+               help='Times a quota reservation is retried after losing a '
+                    'database deadlock to a concurrent one.'),
+    cfg.IntOpt('quota_reservation_expire', default=60 * 60,
+               help='Seconds after which quota reconciliation rolls back a '
+                    'reservation that was neither committed nor rolled '
+                    'back.'),
+    cfg.IntOpt('quota_reconcile_ticks', default=360,
+               help='Number of report_intervals between the taskmanager\'s '
+                    'quota usage reconciliations. Zero disables them.'),
     cfg.StrOpt('taskmanager_queue', default='taskmanager'),
     cfg.BoolOpt('use_nova_server_volume', default=False),
     cfg.StrOpt('fake_mode_events', default='simulated'),
@@ -118,6 +151,36 @@ common_opts = [
     cfg.IntOpt('http_post_rate', default=200),
     cfg.IntOpt('http_delete_rate', default=200),
     cfg.IntOpt('http_put_rate', default=200),
+    cfg.StrOpt('rate_limit_backend',
+               default='trove.common.limits.MemoryLimiterBackend',
+               help='Where the rate limiter keeps its buckets. Use '
+                    'trove.common.limits.SharedMemoryLimiterBackend to '
+                    'share them between the API workers of a host.'),
+    cfg.StrOpt('rate_limit_state_file', default='/var/lib/trove/rate_limits',
+               help='File mapped into memory by the shared memory rate '
+                    'limiter backend. The number of slots is appended to '
+                    'its name.'),
+    cfg.IntOpt('rate_limit_slots', default=65536,
+               help='Number of limit buckets the shared memory rate limiter '
+                    'backend has room for.'),
+    cfg.IntOpt('rate_limit_proxy_pool_size', default=10,
+               help='Connections WsgiLimiterProxy keeps open to the central '
+                    'rate limiter.'),
+    cfg.FloatOpt('rate_limit_proxy_timeout', default=0.5,
+                 help='Seconds WsgiLimiterProxy waits for a connection or an '
+                      'answer from the central rate limiter.'),
+    cfg.BoolOpt('rate_limit_proxy_fail_open', default=True,
+                help='Let requests through when the central rate limiter '
+                     'cannot be reached in time, rather than rejecting '
+                     'them.'),
+    cfg.FloatOpt('rate_limit_proxy_precheck_ratio', default=0.0,
+                 help='Share of the requests a tenant has left that '
+                      'WsgiLimiterProxy lets through without asking the '
+                      'central rate limiter, which is told about them on '
+                      'the next call. Zero always asks.'),
+    cfg.IntOpt('rate_limit_proxy_precheck_ttl', default=5,
+               help='Seconds WsgiLimiterProxy uses an answer of the central '
+                    'rate limiter for its pre-check.'),
     cfg.BoolOpt('hostname_require_ipv4', default=True,
                 help="Require user hostnames to be IPv4 addresses."),
     cfg.BoolOpt('trove_security_groups_support', default=True),
@@ -168,11 +231,26 @@ common_opts = [
                default='trove.common.remote.cinder_client'),
     cfg.StrOpt('remote_swift_client',
                default='trove.common.remote.swift_client'),
+    cfg.IntOpt('remote_client_cache_ttl', default=300,
+               help='Seconds to reuse the Nova and Cinder clients of a '
+                    'token. Keep it shorter than the token lifetime. Zero '
+                    'disables the cache.'),
+    cfg.IntOpt('remote_client_cache_size', default=100,
+               help='Most Nova and Cinder clients to keep per process.'),
+    cfg.IntOpt('remote_pool_size', default=10,
+               help='Most keep-alive connections each process keeps open '
+                    'to a remote service.'),
     cfg.StrOpt('exists_notification_transformer',
                help='Transformer for exists notifications'),
     cfg.IntOpt('exists_notification_ticks', default=360,
                help='Number of report_intevals to wait between pushing events '
                     '(see report_interval)'),
+    cfg.IntOpt('exists_notification_batch_size', default=500,
+               help='Instances read from the database, and exists events '
+                    'published between progress reports, at a time.'),
+    cfg.IntOpt('exists_notification_rate', default=0,
+               help='Most exists events to publish per second. Zero '
+                    'publishes them as fast as possible.'),
     cfg.StrOpt('notification_service_id',
                help='Unique ID to tag notification events'),
     cfg.StrOpt('nova_proxy_admin_user', default='',
@@ -182,6 +260,40 @@ common_opts = [
     cfg.StrOpt('nova_proxy_admin_tenant_name', default='',
                help="Admin tenant used to connect to Nova"),
     cfg.StrOpt('network_label_regex', default='^private$'),
+    cfg.StrOpt('cache_backend', default='trove.common.cache.MemoryBackend',
+               help='Backend used to store cached data. Use '
+                    'trove.common.cache.MemcacheBackend to share it between '
+                    'API workers.'),
+    cfg.ListOpt('memcached_servers', default=[],
+                help='Memcached servers used by the memcache cache backend.'),
+    cfg.IntOpt('server_state_cache_ttl', default=0,
+               help='Seconds to cache the status and addresses of compute '
+                    'servers. Zero disables the cache.'),
+    cfg.IntOpt('server_state_cache_negative_ttl', default=0,
+               help='Seconds to remember that a compute server was not '
+                    'found.'),
+    cfg.IntOpt('flavor_cache_ttl', default=300,
+               help='Seconds to cache Nova flavors. Zero disables the '
+                    'cache.'),
+    cfg.IntOpt('flavor_cache_negative_ttl', default=30,
+               help='Seconds to remember that a flavor was not found.'),
+    cfg.IntOpt('flavor_cache_size', default=1000,
+               help='Most flavors kept by the memory cache backend.'),
+    cfg.IntOpt('service_image_cache_ttl', default=300,
+               help='Seconds to cache the image of each service type. Zero '
+                    'disables the cache.'),
+    cfg.BoolOpt('server_state_from_notifications', default=False,
+                help='Read the status and addresses of compute servers from '
+                     'the instances table, kept up to date by the '
+                     'taskmanager from compute notifications, instead of '
+                     'asking Nova on every request.'),
+    cfg.StrOpt('compute_notification_exchange', default='nova',
+               help='Exchange Nova publishes its notifications to.'),
+    cfg.StrOpt('compute_notification_topic', default='notifications.info',
+               help='Topic Nova publishes its notifications to.'),
+    cfg.IntOpt('compute_notification_batch_size', default=100,
+               help='Number of compute servers whose state is buffered '
+                    'before it is written to the database.'),
     cfg.StrOpt('cloudinit_location', default='/etc/trove/cloudinit',
                help="Path to folder with cloudinit scripts"),
     cfg.StrOpt('guest_config',
@@ -17,24 +17,35 @@
 Module dedicated functions/classes dealing with rate limiting requests.
 """
 
+import array
 import collections
-import copy
+import contextlib
+import fcntl
+import hashlib
 import httplib
 import math
+import mmap
+import os
+import Queue
 import re
+import socket
+import struct
 import time
 import webob.dec
 import webob.exc
 
 from trove.common import cfg
+from trove.common import exception
 from trove.common import wsgi as base_wsgi
 from trove.openstack.common import importutils
 from trove.openstack.common import jsonutils
+from trove.openstack.common import log as logging
 from trove.openstack.common import wsgi
 from trove.openstack.common.gettextutils import _
 
 
 CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
 
 # Convenience constants for the limits dictionary passed to Limiter().
 PER_SECOND = 1
@@ -70,6 +81,7 @@ class Limit(object):
         self.verb = verb
         self.uri = uri
         self.regex = regex
+        self.match = re.compile(regex).match
         self.value = int(value)
         self.unit = unit
         self.unit_string = self.display_unit().lower()
@@ -95,54 +107,66 @@ class Limit(object):
         @param verb: string http verb (POST, GET, etc.)
         @param url: string URL
         """
-        if self.verb != verb or not re.match(self.regex, url):
+        if not self.matches(verb, url):
             return
 
-        now = self._get_time()
+        delay, self.water_level, self.last_request, self.next_request, \
+            self.remaining = self.pour(self._get_time(), self.water_level,
+                                       self.last_request, self.next_request,
+                                       self.remaining)
+        return delay
 
-        if self.last_request is None:
-            self.last_request = now
-
-        leak_value = now - self.last_request
+    def pour(self, now, water_level, last_request, next_request, remaining):
+        """
+        Pour a request into a bucket in the given state.
 
-        self.water_level -= leak_value
-        self.water_level = max(self.water_level, 0)
-        self.water_level += self.request_value
+        @return: Tuple of the delay (or None) followed by the new water
+                 level, last request, next request and remaining values
+        """
+        if last_request is None:
+            last_request = now
 
-        difference = self.water_level - self.capacity
+        water_level = max(water_level - (now - last_request), 0)
+        water_level += self.request_value
 
-        self.last_request = now
+        difference = water_level - self.capacity
 
         if difference > 0:
-            self.water_level -= self.request_value
-            self.next_request = now + difference
-            return difference
+            return (difference, water_level - self.request_value, now,
+                    now + difference, remaining)
 
         cap = self.capacity
-        water = self.water_level
-        val = self.value
-
-        self.remaining = math.floor(((cap - water) / cap) * val)
-        self.next_request = now
+        remaining = math.floor(((cap - water_level) / cap) * self.value)
+        return None, water_level, now, now, remaining
 
     def _get_time(self):
         """Retrieve the current time. Broken out for testability."""
         return time.time()
 
+    def matches(self, verb, url):
+        """Whether a request is counted against this limit."""
+        return self.verb == verb and self.match(url) is not None
+
     def display_unit(self):
         """Display the string name of the unit."""
         return self.UNITS.get(self.unit, "UNKNOWN")
 
-    def display(self):
-        """Return a useful representation of this class."""
+    def display(self, remaining=None, next_request=None):
+        """Return a useful representation of this class.
+
+        The bucket state shown is the limit's own unless one is given.
+        """
+        if remaining is None:
+            remaining = self.remaining
+            next_request = self.next_request
         return {
             "verb": self.verb,
             "URI": self.uri,
             "regex": self.regex,
             "value": self.value,
-            "remaining": int(self.remaining),
+            "remaining": int(remaining),
             "unit": self.display_unit(),
-            "resetTime": int(self.next_request or self._get_time()),
+            "resetTime": int(next_request or self._get_time()),
         }
 
 # "Limit" format is a dictionary with the HTTP verb, human-readable URI,
@@ -216,19 +240,242 @@ class RateLimitingMiddleware(base_wsgi.TroveMiddleware):
         return self.application
 
 
+# Each limit of a tenant's rules keeps these values, in this order, in the
+# tenant's state array. An empty bucket has nothing to leak, so its last
+# request time is simply left at zero.
+WATER_LEVEL, LAST_REQUEST, NEXT_REQUEST, REMAINING = range(4)
+STATE_SIZE = 4
+
+
+class Rules(object):
+    """
+    A list of limits indexed by HTTP verb, so a request is only matched
+    against the limits it could count against.
+    """
+
+    def __init__(self, limits):
+        self.limits = list(limits)
+        self.by_verb = {}
+        for index, limit in enumerate(self.limits):
+            self.by_verb.setdefault(limit.verb, []).append((index, limit))
+        # Every bucket is empty again once no request came for this long.
+        self.idle_time = max([limit.capacity for limit in self.limits] or
+                             [0])
+
+    def __len__(self):
+        return len(self.limits)
+
+    def matching(self, verb, url):
+        """Return the (index, limit) pairs a request is counted against."""
+        return [(index, limit)
+                for index, limit in self.by_verb.get(verb, ())
+                if limit.match(url) is not None]
+
+    def new_state(self):
+        """Return the state array of a tenant with empty buckets."""
+        state = array.array('d', [0.0] * (STATE_SIZE * len(self.limits)))
+        for index, limit in enumerate(self.limits):
+            state[index * STATE_SIZE + REMAINING] = limit.value
+        return state
+
+
+class MemoryLimiterBackend(object):
+    """
+    Keeps the state of each tenant's limits in the memory of the process, so
+    every API worker has buckets of its own.
+
+    Tenants are kept in the order they last made a request and are dropped
+    once all of their buckets have drained, so memory grows with the tenants
+    that are active rather than with every tenant ever seen.
+    """
+
+    def __init__(self):
+        self._tenants = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._tenants)
+
+    def lock(self):
+        return _NO_LOCK
+
+    def _evict(self, now):
+        while self._tenants:
+            username, (expires_at, state) = next(self._tenants.iteritems())
+            if expires_at > now:
+                break
+            del self._tenants[username]
+
+    def load(self, username, rules, indexes, now):
+        self._evict(now)
+        entry = self._tenants.get(username)
+        if entry is None:
+            return rules.new_state()
+        return entry[1]
+
+    def store(self, username, rules, state, indexes, now):
+        self._tenants.pop(username, None)
+        self._tenants[username] = (now + rules.idle_time, state)
+
+
+class _NoLock(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_NO_LOCK = _NoLock()
+
+
+class SharedMemoryLimiterBackend(object):
+    """
+    Keeps the state of limits in a file mapped into the memory of every API
+    worker on the host, so a tenant's requests drain the same buckets
+    whichever worker serves them, and the buckets survive a restart.
+
+    The file is a fixed size table of slots found by hashing the limit key,
+    guarded by a POSIX record lock. A full neighbourhood of slots gives up
+    the one used longest ago. The file's name ends in the number of slots,
+    and a file of the wrong size is refused rather than resized.
+    """
+
+    MAGIC = 'TRVRL001'
+    HEADER = struct.Struct('<8sI')
+    HEADER_SIZE = 64
+    # Key hash, water level, last request, next request, remaining.
+    SLOT = struct.Struct('<Qdddd')
+    PROBES = 8
+
+    def __init__(self, path=None, slots=None):
+        self.slots = slots or CONF.rate_limit_slots
+        # Each table size has a file of its own, so workers started with
+        # another size never resize a file mapped by the others.
+        self.path = "%s.%d" % (path or CONF.rate_limit_state_file,
+                               self.slots)
+        self.size = self.HEADER_SIZE + self.slots * self.SLOT.size
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _open(self):
+        # Forked workers each map the file themselves, so their record
+        # locks exclude each other.
+        if self._pid == os.getpid():
+            return
+        if self._fd is not None:
+            # Left over from the parent process.
+            self._map.close()
+            os.close(self._fd)
+            self._fd = self._map = None
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0600)
+        try:
+            state = self._map_file(fd)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._map = state
+        self._pid = os.getpid()
+
+    def _map_file(self, fd):
+        """Map the table, creating it if the file is new."""
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                os.ftruncate(fd, self.size)
+            elif size != self.size:
+                raise exception.TroveError(
+                    _("Rate limit state file %(path)s holds %(size)d bytes "
+                      "instead of %(expected)d.") %
+                    {'path': self.path, 'size': size, 'expected': self.size})
+            state = mmap.mmap(fd, self.size)
+            magic, slots = self.HEADER.unpack_from(state, 0)
+            if magic != self.MAGIC or slots != self.slots:
+                state[:] = '\0' * self.size
+                self.HEADER.pack_into(state, 0, self.MAGIC, self.slots)
+            return state
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def lock(self):
+        self._open()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _key(username, index, limit):
+        return "%s:%d:%s:%s" % (username, index, limit.verb, limit.regex)
+
+    def _find(self, key):
+        """Return the offset of the key's slot, its hash and if it's set."""
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        key_hash = struct.unpack('<Q', hashlib.md5(key).digest()[:8])[0] or 1
+        start = key_hash % self.slots
+        oldest = None
+        for probe in xrange(self.PROBES):
+            offset = (self.HEADER_SIZE +
+                      ((start + probe) % self.slots) * self.SLOT.size)
+            slot_hash, _, last_request, _, _ = self.SLOT.unpack_from(
+                self._map, offset)
+            if slot_hash == key_hash:
+                return offset, key_hash, True
+            if slot_hash == 0:
+                return offset, key_hash, False
+            if oldest is None or last_request < oldest[1]:
+                oldest = (offset, last_request)
+        return oldest[0], key_hash, False
+
+    def load(self, username, rules, indexes, now):
+        state = rules.new_state()
+        for index in indexes:
+            offset, _, found = self._find(
+                self._key(username, index, rules.limits[index]))
+            if found:
+                start = index * STATE_SIZE
+                state[start:start + STATE_SIZE] = array.array(
+                    'd', self.SLOT.unpack_from(self._map, offset)[1:])
+        return state
+
+    def store(self, username, rules, state, indexes, now):
+        for index in indexes:
+            offset, key_hash, _ = self._find(
+                self._key(username, index, rules.limits[index]))
+            start = index * STATE_SIZE
+            self.SLOT.pack_into(self._map, offset, key_hash,
+                                *state[start:start + STATE_SIZE])
+
+
 class Limiter(object):
     """
     Rate-limit checking class which handles limits in memory.
+
+    The limits are shared by every tenant; each tenant only has an array
+    with the state of its buckets, kept by a pluggable backend which by
+    default leaves it in the memory of the process.
     """
 
-    def __init__(self, limits, **kwargs):
+    def __init__(self, limits, backend=None, **kwargs):
         """
         Initialize the new `Limiter`.
 
         @param limits: List of `Limit` objects
+        @param backend: Limiter backend, or the name of its class
         """
-        self.limits = copy.deepcopy(limits)
-        self.levels = collections.defaultdict(lambda: copy.deepcopy(limits))
+        if backend is None:
+            backend = CONF.rate_limit_backend
+        if isinstance(backend, basestring):
+            backend = importutils.import_object(backend)
+        self.backend = backend
+        self.limits = list(limits)
+        self.levels = {}
 
         # Pick up any per-user limit information
         for key, value in kwargs.items():
@@ -236,11 +483,27 @@ class Limiter(object):
                 username = key[5:]
                 self.levels[username] = self.parse_limits(value)
 
+        self._rules = Rules(self.limits)
+        self._user_rules = dict((username, Rules(levels))
+                                for username, levels in self.levels.items())
+
+    def _rules_for(self, username):
+        return self._user_rules.get(username, self._rules)
+
     def get_limits(self, username=None):
         """
         Return the limits for a given user.
         """
-        return [limit.display() for limit in self.levels[username]]
+        rules = self._rules_for(username)
+        if not rules:
+            return []
+        now = rules.limits[0]._get_time()
+        with self.backend.lock():
+            state = self.backend.load(username, rules, range(len(rules)),
+                                      now)
+        return [limit.display(state[index * STATE_SIZE + REMAINING],
+                              state[index * STATE_SIZE + NEXT_REQUEST])
+                for index, limit in enumerate(rules.limits)]
 
     def check_for_delay(self, verb, url, username=None):
         """
@@ -248,12 +511,24 @@ class Limiter(object):
 
         @return: Tuple of delay (in seconds) and error message (or None, None)
         """
-        delays = []
+        rules = self._rules_for(username)
+        matching = rules.matching(verb, url)
+        if not matching:
+            return None, None
 
-        for limit in self.levels[username]:
-            delay = limit(verb, url)
-            if delay:
-                delays.append((delay, limit.error_message))
+        delays = []
+        now = matching[0][1]._get_time()
+        indexes = [index for index, limit in matching]
+        with self.backend.lock():
+            state = self.backend.load(username, rules, indexes, now)
+            for index, limit in matching:
+                start = index * STATE_SIZE
+                bucket = limit.pour(now, *state[start:start + STATE_SIZE])
+                state[start:start + STATE_SIZE] = array.array('d',
+                                                              bucket[1:])
+                if bucket[0]:
+                    delays.append((bucket[0], limit.error_message))
+            self.backend.store(username, rules, state, indexes, now)
 
         if delays:
             delays.sort()
@@ -261,6 +536,30 @@ class Limiter(object):
 
         return None, None
 
+    def get_largest_limit(self, verb, url, username=None):
+        """
+        Return the most requests any limit a request would be counted
+        against allows, or 0 if it isn't counted against any.
+        """
+        matching = self._rules_for(username).matching(verb, url)
+        return max([limit.value for index, limit in matching] or [0])
+
+    def get_remaining(self, verb, url, username=None):
+        """
+        Return the fewest requests left in the limits a request would be
+        counted against, or None if it isn't counted against any.
+        """
+        rules = self._rules_for(username)
+        matching = rules.matching(verb, url)
+        if not matching:
+            return None
+        now = matching[0][1]._get_time()
+        indexes = [index for index, limit in matching]
+        with self.backend.lock():
+            state = self.backend.load(username, rules, indexes, now)
+        return min(state[index * STATE_SIZE + REMAINING]
+                   for index in indexes)
+
     # This was ported from nova.
     # Keeping it as a static method for the sake of consistency
     #
@@ -338,7 +637,11 @@ class WsgiLimiter(object):
 
     and receive a 204 No Content, or a 403 Forbidden with an X-Wait-Seconds
     header containing the number of seconds to wait before the action would
-    succeed.
+    succeed. A 204 carries the requests left in an X-Remaining-Requests
+    header when the request is counted against any limit.
+
+    A "skipped" count in the data charges that many earlier requests a
+    `WsgiLimiterProxy` let through without asking.
     """
 
     def __init__(self, limits=None):
@@ -368,45 +671,153 @@ class WsgiLimiter(object):
         verb = info.get("verb")
         path = info.get("path")
 
+        try:
+            skipped = int(info.get("skipped", 0))
+        except (TypeError, ValueError):
+            raise webob.exc.HTTPBadRequest()
+        if skipped < 0:
+            raise webob.exc.HTTPBadRequest()
+        # Once a bucket is full more requests add nothing to it, so no
+        # more than the largest limit needs charging.
+        skipped = min(skipped,
+                      self._limiter.get_largest_limit(verb, path, username))
+        for x in xrange(skipped):
+            self._limiter.check_for_delay(verb, path, username)
+
         delay, error = self._limiter.check_for_delay(verb, path, username)
 
         if delay:
             headers = {"X-Wait-Seconds": "%.2f" % delay}
             return webob.exc.HTTPForbidden(headers=headers, explanation=error)
         else:
-            return webob.exc.HTTPNoContent()
+            headers = {}
+            remaining = self._limiter.get_remaining(verb, path, username)
+            if remaining is not None:
+                headers["X-Remaining-Requests"] = "%d" % remaining
+            return webob.exc.HTTPNoContent(headers=headers)
 
 
 class WsgiLimiterProxy(object):
     """
     Rate-limit requests based on answers from a remote source.
+
+    Connections to the remote limiter are kept alive in a bounded pool.
+    When it can't be reached within the timeout the request is let through
+    or rejected, as configured, rather than waited on. Optionally, a share
+    of the requests the limiter says a tenant has left is let through
+    without asking; they are charged with the next request that asks.
     """
 
-    def __init__(self, limiter_address):
+    # Seconds a request is told to wait when failing closed.
+    FAIL_CLOSED_DELAY = 1.0
+
+    def __init__(self, limiter_address, pool_size=None, timeout=None,
+                 fail_open=None, precheck_ratio=None, precheck_ttl=None):
         """
         Initialize the new `WsgiLimiterProxy`.
 
         @param limiter_address: IP/port combination of where to request limit
         """
         self.limiter_address = limiter_address
+        self.pool_size = pool_size or CONF.rate_limit_proxy_pool_size
+        self.timeout = timeout or CONF.rate_limit_proxy_timeout
+        self.fail_open = (CONF.rate_limit_proxy_fail_open
+                          if fail_open is None else fail_open)
+        self.precheck_ratio = (CONF.rate_limit_proxy_precheck_ratio
+                               if precheck_ratio is None else precheck_ratio)
+        self.precheck_ttl = precheck_ttl or CONF.rate_limit_proxy_precheck_ttl
+        # Each slot holds an idle connection, or None for one not yet made.
+        self._pool = Queue.LifoQueue(self.pool_size)
+        for x in xrange(self.pool_size):
+            self._pool.put(None)
+        # (username, verb, path) -> [expires_at, requests left]
+        self._credits = collections.OrderedDict()
+        # (username, verb, path) -> requests skipped but not yet reported.
+        # They outlive the credits, so expiry never loses a charge.
+        self._skipped = {}
+
+    def _take_credit(self, key, now):
+        """
+        Let a request through on the last answer, if it allows it.
 
-    def check_for_delay(self, verb, path, username=None):
-        body = jsonutils.dumps({"verb": verb, "path": path})
-        headers = {"Content-Type": "application/json"}
-
-        conn = httplib.HTTPConnection(self.limiter_address)
+        @return: Whether to skip the remote call
+        """
+        entry = self._credits.get(key)
+        if entry is not None:
+            expires_at, left = entry
+            if expires_at > now and left > 0:
+                entry[1] -= 1
+                self._skipped[key] = self._skipped.get(key, 0) + 1
+                return True
+            del self._credits[key]
+            return False
+        # Entries are added in expiry order, so expired ones are in front.
+        while self._credits:
+            oldest = next(self._credits.itervalues())
+            if oldest[0] > now:
+                break
+            self._credits.popitem(last=False)
+        return False
+
+    def _request(self, path, body, headers):
+        connection = self._pool.get(timeout=self.timeout)
+        try:
+            while True:
+                reused = connection is not None
+                if not reused:
+                    connection = httplib.HTTPConnection(self.limiter_address,
+                                                        timeout=self.timeout)
+                try:
+                    connection.request("POST", path, body, headers)
+                    resp = connection.getresponse()
+                    return resp, resp.read()
+                except (socket.error, httplib.HTTPException):
+                    connection.close()
+                    connection = None
+                    # The limiter may have closed an idle connection.
+                    if not reused:
+                        raise
+        finally:
+            self._pool.put(connection)
 
-        if username:
-            conn.request("POST", "/%s" % (username), body, headers)
-        else:
-            conn.request("POST", "/", body, headers)
+    def check_for_delay(self, verb, path, username=None):
+        key = (username, verb, path)
+        now = time.time()
+        if self.precheck_ratio > 0 and self._take_credit(key, now):
+            return None, None
 
-        resp = conn.getresponse()
+        data = {"verb": verb, "path": path}
+        skipped = self._skipped.pop(key, 0)
+        if skipped:
+            data["skipped"] = skipped
+        body = jsonutils.dumps(data)
+        headers = {"Content-Type": "application/json"}
 
-        if 200 >= resp.status < 300:
+        try:
+            resp, resp_body = self._request("/%s" % (username or ""), body,
+                                            headers)
+        except (Queue.Empty, socket.error, httplib.HTTPException) as e:
+            if skipped:
+                # Charged with the next request that gets an answer.
+                self._skipped[key] = self._skipped.get(key, 0) + skipped
+            LOG.warning(_("Rate limiter at %(address)s did not answer: "
+                          "%(error)s") % {'address': self.limiter_address,
+                                          'error': str(e) or
+                                          type(e).__name__})
+            if self.fail_open:
+                return None, None
+            return (self.FAIL_CLOSED_DELAY,
+                    _("The rate limiter could not be reached."))
+
+        if 200 <= resp.status < 300:
+            remaining = resp.getheader("X-Remaining-Requests")
+            if self.precheck_ratio > 0 and remaining:
+                left = int(int(remaining) * self.precheck_ratio)
+                if left > 0:
+                    self._credits[key] = [now + self.precheck_ttl, left]
             return None, None
 
-        return resp.getheader("X-Wait-Seconds"), resp.read() or None
+        return resp.getheader("X-Wait-Seconds"), resp_body or None
 
     # This was ported from nova.
     # Keeping it as a static method for the sake of consistency
@@ -15,10 +15,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 import urllib
 import urlparse
 from xml.dom import minidom
 
+from trove.common import exception
+from trove.openstack.common import jsonutils
+from trove.openstack.common.gettextutils import _
+
 
 class PaginatedDataView(object):
 
@@ -97,3 +102,20 @@ class AppUrl(object):
                                  parsed_url.netloc, parsed_url.path,
                                  parsed_url.params, new_query_params,
                                  parsed_url.fragment).geturl())
+
+
+def encode_marker(values):
+    """Packs the sort key values of the last item of a page into an opaque
+    marker for the next page."""
+    return base64.urlsafe_b64encode(jsonutils.dumps(values))
+
+
+def decode_marker(marker):
+    """Unpacks a marker made by encode_marker into its list of values."""
+    try:
+        values = jsonutils.loads(base64.urlsafe_b64decode(str(marker)))
+    except (TypeError, ValueError):
+        values = None
+    if not isinstance(values, list):
+        raise exception.BadRequest(_("Invalid marker: %s") % marker)
+    return values
@@ -15,6 +15,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import requests
+from requests import adapters
+
+from trove.common import cache
 from trove.common import cfg
 from trove.openstack.common.importutils import import_class
 from cinderclient.v2 import client as CinderClient
@@ -29,6 +33,82 @@ VOLUME_URL = CONF.cinder_url
 OBJECT_STORE_URL = CONF.swift_url
 USE_SNET = CONF.backup_use_snet
 
+_CLIENT_CACHE = None
+_HTTP_ADAPTER = None
+
+
+class CountingHTTPAdapter(adapters.HTTPAdapter):
+    """An HTTP adapter that counts checkouts from its connection pools.
+
+    A checkout waits when every connection of the host's pool is in use.
+    """
+
+    def __init__(self, pool_maxsize):
+        super(CountingHTTPAdapter, self).__init__(pool_maxsize=pool_maxsize,
+                                                  pool_block=True)
+        self.checkouts = 0
+        self.waits = 0
+
+    def get_connection(self, url, proxies=None):
+        conn_pool = super(CountingHTTPAdapter, self).get_connection(
+            url, proxies)
+        self.checkouts += 1
+        if conn_pool.pool is not None and conn_pool.pool.empty():
+            self.waits += 1
+        return conn_pool
+
+
+def get_http_adapter():
+    """Returns the adapter whose keep-alive connection pools are shared by
+    all the clients of this process."""
+    global _HTTP_ADAPTER
+    if _HTTP_ADAPTER is None:
+        _HTTP_ADAPTER = CountingHTTPAdapter(CONF.remote_pool_size)
+    return _HTTP_ADAPTER
+
+
+def create_http_session():
+    # Each client gets its own session, and so its own cookies, on top of
+    # the shared connection pools.
+    session = requests.Session()
+    session.mount('http://', get_http_adapter())
+    session.mount('https://', get_http_adapter())
+    return session
+
+
+def get_client_cache():
+    """Returns the cache of clients keyed by endpoint, tenant and token.
+
+    Clients hold connections, so they are always kept in this process's
+    memory whatever the configured cache backend is.
+    """
+    global _CLIENT_CACHE
+    if _CLIENT_CACHE is None:
+        _CLIENT_CACHE = cache.TTLCache(
+            'remote_clients', CONF.remote_client_cache_ttl, negative_ttl=0,
+            backend=cache.MemoryBackend(
+                'remote_clients', max_size=CONF.remote_client_cache_size))
+    return _CLIENT_CACHE
+
+
+def _cached_client(endpoint, context, create_client):
+    key = (endpoint, context.tenant, context.auth_token)
+    client_cache = get_client_cache()
+    client = client_cache.get(key)
+    if client is None:
+        client = create_client(context)
+        client_cache.set(key, client)
+    return client
+
+
+def pool_stats():
+    """Counters for the client cache and the shared connection pools."""
+    adapter = get_http_adapter()
+    stats = get_client_cache().stats()
+    stats.update({'checkouts': adapter.checkouts,
+                  'waits': adapter.waits})
+    return stats
+
 
 def dns_client(context):
     from trove.dns.manager import DnsManager
@@ -40,26 +120,35 @@ def guest_client(context, id):
     return API(context, id)
 
 
-def nova_client(context):
+def _nova_client(context):
     client = Client(context.user, context.auth_token,
                     project_id=context.tenant, auth_url=PROXY_AUTH_URL)
     client.client.auth_token = context.auth_token
     client.client.management_url = "%s/%s/" % (COMPUTE_URL, context.tenant)
-
+    client.client.http = create_http_session()
     return client
 
 
+def nova_client(context):
+    return _cached_client(COMPUTE_URL, context, _nova_client)
+
+
 def create_admin_nova_client(context):
     """
     Creates client that uses trove admin credentials
     :return: a client for nova for the trove admin
     """
-    client = create_nova_client(context)
+    if create_nova_client is nova_client:
+        # Cached clients are shared, so the admin one is never taken from
+        # the cache.
+        client = _nova_client(context)
+    else:
+        client = create_nova_client(context)
     client.client.auth_token = None
     return client
 
 
-def cinder_client(context):
+def _cinder_client(context):
     client = CinderClient.Client(context.user, context.auth_token,
                                  project_id=context.tenant,
                                  auth_url=PROXY_AUTH_URL)
@@ -68,7 +157,13 @@ def cinder_client(context):
     return client
 
 
+def cinder_client(context):
+    return _cached_client(VOLUME_URL, context, _cinder_client)
+
+
 def swift_client(context):
+    # A swift Connection holds a single HTTP connection and is not safe to
+    # share between green threads, so it isn't cached.
     client = Connection(preauthurl=OBJECT_STORE_URL + context.tenant,
                         preauthtoken=context.auth_token,
                         tenant_name=context.tenant,
@@ -252,6 +252,43 @@ def poll_until(retriever, condition=lambda value: value,
     return lc.wait()
 
 
+def fetch_concurrently(fetches, timeout):
+    """Calls each of the named fetches on its own green thread.
+
+    Each call is given timeout seconds. A call that fails or runs out of
+    time leaves None as its result, so the others are still returned.
+
+    :param fetches: A dict of callables keyed by name.
+    :returns: A dict of the results keyed by name, and the sorted names
+              of the calls that timed out.
+    """
+    def fetch(name, func):
+        deadline = Timeout(timeout)
+        try:
+            return func(), False
+        except Timeout as t:
+            if t is not deadline:
+                raise
+            LOG.error(_("Fetching %(name)s timed out after %(timeout)s "
+                        "seconds.") % {'name': name, 'timeout': timeout})
+            return None, True
+        except Exception:
+            LOG.exception(_("Fetching %s failed.") % name)
+            return None, False
+        finally:
+            deadline.cancel()
+
+    threads = dict((name, greenthread.spawn(fetch, name, func))
+                   for name, func in fetches.items())
+    results = {}
+    timed_out = []
+    for name, thread in threads.items():
+        results[name], late = thread.wait()
+        if late:
+            timed_out.append(name)
+    return results, sorted(timed_out)
+
+
 # Copied from nova.api.openstack.common in the old code.
 def get_id_from_href(href):
     """Return the id or uuid portion of a url.
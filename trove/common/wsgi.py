@@ -21,6 +21,7 @@ import math
 import jsonschema
 import paste.urlmap
 import re
+import StringIO
 import time
 import traceback
 import uuid
@@ -79,6 +80,7 @@ CUSTOM_SERIALIZER_METADATA = {
     'volume': {
         'size': '',
         'used': '',
+        'used_age': '',
         #mgmt/instance
         'id': '',
     },
@@ -452,11 +454,50 @@ class Controller(object):
         error_msg = "; ".join(messages)
         return "Validation error: %s" % error_msg
 
+    @classmethod
+    def get_validator(cls, schema):
+        """Returns the compiled validator for one of the class's schemas.
+
+        Validators are built once per schema and kept on the controller
+        class, keyed by the identity of the schema dict.
+        """
+        validators = cls.__dict__.get('_validators')
+        if validators is None:
+            validators = {}
+            cls._validators = validators
+        entry = validators.get(id(schema))
+        if entry is None or entry[0] is not schema:
+            entry = (schema, jsonschema.Draft4Validator(schema))
+            validators[id(schema)] = entry
+        return entry[1]
+
+    @classmethod
+    def compile_validators(cls):
+        """Builds the validators of every schema the controller has."""
+
+        def iter_schemas(schemas):
+            if not isinstance(schemas, dict):
+                return
+            if 'type' in schemas:
+                yield schemas
+                return
+            for value in schemas.values():
+                for schema in iter_schemas(value):
+                    yield schema
+
+        count = 0
+        for schema in iter_schemas(cls.schemas):
+            cls.get_validator(schema)
+            count += 1
+        return count
+
     def validate_request(self, action, action_args):
         body = action_args.get('body', {})
         schema = self.get_schema(action, body)
         if schema:
-            validator = jsonschema.Draft4Validator(schema)
+            validator = self.get_validator(schema)
+            # Bodies that pass stop at is_valid; only failing ones pay for
+            # collecting and sorting every error.
             if not validator.is_valid(body):
                 errors = sorted(validator.iter_errors(body),
                                 key=lambda e: e.path)
@@ -465,6 +506,7 @@ class Controller(object):
                 raise exception.BadRequest(message=error_msg)
 
     def create_resource(self):
+        self.compile_validators()
         serializer = TroveResponseSerializer(
             body_serializers={'application/xml': TroveXMLDictSerializer()})
         return Resource(
@@ -536,11 +578,23 @@ class TroveXMLDeserializer(XMLDeserializer):
             return result
 
 
+def _escape_xml(text):
+    """Escapes text the way minidom does when writing a document."""
+    return (text.replace("&", "&amp;").replace("<", "&lt;").
+            replace("\"", "&quot;").replace(">", "&gt;"))
+
+
 class TroveXMLDictSerializer(openstack_wsgi.XMLDictSerializer):
+
+    # The size of the pieces iter_serialize hands to the WSGI server.
+    STREAM_CHUNK_SIZE = 8192
+
+    INDENT = '    '
+
     def __init__(self, metadata=None, xmlns=None):
         super(TroveXMLDictSerializer, self).__init__(metadata, XMLNS)
 
-    def default(self, data):
+    def _root_key(self, data):
         # We expect data to be a dictionary containing a single key as the XML
         # root, or two keys, the later being "links."
         # We expect data to contain a single key which is the XML root,
@@ -559,6 +613,10 @@ class TroveXMLDictSerializer(openstack_wsgi.XMLDictSerializer):
             msg = "Missing root key in dict: %s" % data
             LOG.error(msg)
             raise RuntimeError(msg)
+        return root_key, has_links
+
+    def default(self, data):
+        root_key, has_links = self._root_key(data)
         doc = minidom.Document()
         node = self._to_xml_node(doc, self.metadata, root_key, data[root_key])
         if has_links:
@@ -578,6 +636,143 @@ class TroveXMLDictSerializer(openstack_wsgi.XMLDictSerializer):
             nodename,
             data)
 
+    def iter_serialize(self, data, action='default'):
+        """Serializes data into an iterable of XML chunks.
+
+        The document is the same one serialize builds with minidom, but it
+        is written straight from the dict as it is walked, so no DOM is
+        built for large listings. The root is checked up front so a bad
+        dict fails before any of the body is sent.
+        """
+        if action != 'default' and hasattr(self, action):
+            return iter([self.serialize(data, action)])
+        root_key, has_links = self._root_key(data)
+        children = []
+        if has_links:
+            children.append((self._iter_xml_node,
+                             (self.metadata, 'links', data['links'])))
+        root_attrs = {}
+        if self.xmlns is not None:
+            root_attrs['xmlns'] = self.xmlns
+        pieces = self._iter_xml_node('', self.metadata, root_key,
+                                     data[root_key], root_attrs=root_attrs,
+                                     extra_children=children)
+        return self._iter_chunks(pieces)
+
+    def _iter_chunks(self, pieces):
+        chunk = []
+        size = 0
+        for piece in pieces:
+            if isinstance(piece, unicode):
+                piece = piece.encode('UTF-8')
+            chunk.append(piece)
+            size += len(piece)
+            if size >= self.STREAM_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield ''.join(chunk)
+
+    def _iter_xml_node(self, indent, metadata, nodename, data,
+                       root_attrs=None, extra_children=None):
+        """Writes the element _to_xml_node would build, as pretty XML."""
+        metadata['attributes'] = CUSTOM_SERIALIZER_METADATA
+        if hasattr(data, "to_xml"):
+            for piece in self._iter_dom_node(indent, metadata, data.to_xml(),
+                                             root_attrs, extra_children):
+                yield piece
+            return
+
+        attrs = {}
+        xmlns = metadata.get('xmlns', None)
+        if xmlns:
+            attrs['xmlns'] = xmlns
+        text = None
+        children = []
+        # Mirrors the type checks of XMLDictSerializer._to_xml_node.
+        if type(data) is list:
+            collections = metadata.get('list_collections', {})
+            if nodename in collections:
+                item_meta = collections[nodename]
+                for item in data:
+                    children.append((self._iter_xml_leaf,
+                                     (item_meta['item_name'],
+                                      {item_meta['item_key']: str(item)})))
+            else:
+                singular = metadata.get('plurals', {}).get(nodename, None)
+                if singular is None:
+                    if nodename.endswith('s'):
+                        singular = nodename[:-1]
+                    else:
+                        singular = 'item'
+                for item in data:
+                    children.append((self._iter_xml_node,
+                                     (metadata, singular, item)))
+        elif type(data) is dict:
+            collections = metadata.get('dict_collections', {})
+            if nodename in collections:
+                item_meta = collections[nodename]
+                for k, v in data.items():
+                    children.append((self._iter_xml_leaf,
+                                     (item_meta['item_name'],
+                                      {item_meta['item_key']: str(k)},
+                                      str(v))))
+            else:
+                node_attrs = metadata.get('attributes', {}).get(nodename, {})
+                for k, v in data.items():
+                    if k in node_attrs:
+                        attrs[k] = str(v)
+                    else:
+                        children.append((self._iter_xml_node,
+                                         (metadata, k, v)))
+        else:
+            text = str(data)
+        attrs.update(root_attrs or {})
+        children.extend(extra_children or [])
+
+        if text is not None and not children:
+            yield self._start_tag(indent, nodename, attrs)
+            yield ">%s</%s>\n" % (_escape_xml(text), nodename)
+            return
+        yield self._start_tag(indent, nodename, attrs)
+        if not children:
+            yield "/>\n"
+            return
+        yield ">\n"
+        if text is not None:
+            yield "%s%s\n" % (indent + self.INDENT, _escape_xml(text))
+        for iter_child, args in children:
+            for piece in iter_child(indent + self.INDENT, *args):
+                yield piece
+        yield "%s</%s>\n" % (indent, nodename)
+
+    def _iter_xml_leaf(self, indent, nodename, attrs, text=None):
+        yield self._start_tag(indent, nodename, attrs)
+        if text is None:
+            yield "/>\n"
+        else:
+            yield ">%s</%s>\n" % (_escape_xml(text), nodename)
+
+    def _iter_dom_node(self, indent, metadata, node, root_attrs,
+                       extra_children):
+        # Objects that build their own DOM node are written with minidom.
+        doc = minidom.Document()
+        for iter_child, args in extra_children or []:
+            node.appendChild(self._to_xml_node(doc, *args))
+        for name, value in (root_attrs or {}).items():
+            node.setAttribute(name, value)
+        writer = StringIO.StringIO()
+        node.writexml(writer, indent, self.INDENT, "\n")
+        yield writer.getvalue()
+
+    @staticmethod
+    def _start_tag(indent, nodename, attrs):
+        return "%s<%s%s" % (indent, nodename,
+                            ''.join([' %s="%s"' % (name,
+                                                   _escape_xml(attrs[name]))
+                                     for name in sorted(attrs)]))
+
 
 class TroveResponseSerializer(openstack_wsgi.ResponseSerializer):
     def serialize_body(self, response, data, content_type, action):
@@ -590,6 +785,13 @@ class TroveResponseSerializer(openstack_wsgi.ResponseSerializer):
         """
         if isinstance(data, Result):
             data = data.data(content_type)
+        if data is not None:
+            serializer = self.get_body_serializer(content_type)
+            if hasattr(serializer, 'iter_serialize'):
+                # Stream the body rather than building it all in memory.
+                response.headers['Content-Type'] = content_type
+                response.app_iter = serializer.iter_serialize(data, action)
+                return
         super(TroveResponseSerializer, self).serialize_body(
             response,
             data,
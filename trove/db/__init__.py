@@ -17,8 +17,11 @@
 
 import optparse
 
-from trove.common import utils
 from trove.common import cfg
+from trove.common import exception
+from trove.common import pagination
+from trove.common import utils
+from trove.openstack.common.gettextutils import _
 
 CONF = cfg.CONF
 
@@ -62,19 +65,49 @@ class Query(object):
         self.db_api.delete_all(self._query_func, self._model,
                                **self._conditions)
 
-    def limit(self, limit=200, marker=None, marker_column=None):
+    def limit(self, limit=200, marker=None, marker_column=None,
+              sort_keys=None, sort_dir='asc'):
         return self.db_api.find_all_by_limit(
             self._query_func,
             self._model,
             self._conditions,
             limit=limit,
             marker=marker,
-            marker_column=marker_column)
-
-    def paginated_collection(self, limit=200, marker=None, marker_column=None):
-        collection = self.limit(int(limit) + 1, marker, marker_column)
+            marker_column=marker_column,
+            sort_keys=sort_keys,
+            sort_dir=sort_dir)
+
+    def paginated_collection(self, limit=200, marker=None, marker_column=None,
+                             sort_keys=None, sort_dir='asc'):
+        """Returns a page of the collection and the marker of the next.
+
+        Without sort_keys the collection is ordered by id, which is also
+        the marker. With sort_keys, e.g. ['created', 'id'], it is ordered
+        by those columns and paged by keyset: the marker is an opaque
+        encoding of the sort key values of the last item. The keys should
+        end with a unique column so the order is stable.
+        """
+        if not sort_keys:
+            collection = self.limit(int(limit) + 1, marker, marker_column)
+            if len(collection) > int(limit):
+                return (collection[0:-1], collection[-2]['id'])
+            return (collection, None)
+
+        if sort_dir not in ('asc', 'desc'):
+            raise exception.BadRequest(_("Invalid sort direction: %s") %
+                                       sort_dir)
+        marker_values = None
+        if marker:
+            marker_values = pagination.decode_marker(marker)
+            if len(marker_values) != len(sort_keys):
+                raise exception.BadRequest(_("Invalid marker: %s") % marker)
+        collection = self.limit(int(limit) + 1, marker_values,
+                                sort_keys=sort_keys, sort_dir=sort_dir)
         if len(collection) > int(limit):
-            return (collection[0:-1], collection[-2]['id'])
+            last = collection[-2]
+            next_marker = pagination.encode_marker(
+                [last[key] for key in sort_keys])
+            return (collection[0:-1], next_marker)
         return (collection, None)
 
 
@@ -15,16 +15,32 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import operator
+import random
+import time
+
 import sqlalchemy.exc
 from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import case
+from sqlalchemy import func
 from sqlalchemy import or_
+from sqlalchemy import orm
+from sqlalchemy import select
 from sqlalchemy.orm import aliased
+from sqlalchemy.types import DateTime
 
+from trove.common import cfg
 from trove.common import exception
 from trove.common import utils
 from trove.db.sqlalchemy import migration
 from trove.db.sqlalchemy import mappers
 from trove.db.sqlalchemy import session
+from trove.openstack.common import timeutils
+from trove.openstack.common.gettextutils import _
+from trove.quota import models as quota_models
+
+CONF = cfg.CONF
 
 
 def list(query_func, *args, **kwargs):
@@ -35,12 +51,18 @@ def count(query, *args, **kwargs):
     return query(*args, **kwargs).count()
 
 
-def find_all(model, **conditions):
-    return _query_by(model, **conditions)
+def find_all(model, criteria=None, **conditions):
+    query = _query_by(model, **conditions)
+    for criterion in criteria or []:
+        query = query.filter(criterion)
+    return query
 
 
 def find_all_by_limit(query_func, model, conditions, limit, marker=None,
-                      marker_column=None):
+                      marker_column=None, sort_keys=None, sort_dir='asc'):
+    if sort_keys:
+        return _keyset_limits(query_func, model, conditions, limit, marker,
+                              sort_keys, sort_dir).all()
     return _limits(query_func, model, conditions, limit, marker,
                    marker_column).all()
 
@@ -80,6 +102,270 @@ def update_all(query_func, model, conditions, values):
     query_func(model, **conditions).update(values)
 
 
+def bulk_update(model, key, rows, newer_than=None):
+    """Updates many rows of a model's table with a single executemany.
+
+    Each row is a dict holding the key column and the columns to set, and
+    every row must set the same columns. When newer_than names a column,
+    a row is only updated if its value in the table is NULL or older than
+    the one being written.
+    """
+    if not rows:
+        return
+    table = orm.class_mapper(model).mapped_table
+    columns = [column for column in rows[0] if column != key]
+    criteria = table.c[key] == bindparam('b_' + key)
+    if newer_than:
+        criteria = and_(criteria,
+                        or_(table.c[newer_than].is_(None),
+                            table.c[newer_than] < bindparam('b_' +
+                                                            newer_than)))
+    statement = table.update().where(criteria).values(
+        dict((column, bindparam('b_' + column)) for column in columns))
+    params = [dict(('b_' + column, value)
+                   for column, value in row.iteritems()) for row in rows]
+    session.get_session().execute(statement, params)
+
+
+def bulk_insert(model, rows):
+    """Inserts many rows, given as dicts of column values, into a model's
+    table with a single executemany."""
+    if not rows:
+        return
+    try:
+        session.get_session().execute(_table(model).insert(), rows)
+    except sqlalchemy.exc.IntegrityError as error:
+        raise exception.DBConstraintError(model_name=model.__name__,
+                                          error=str(error.orig))
+
+
+def quota_reserve(tenant_id, deltas, hard_limits):
+    """Checks a tenant's quotas and reserves the deltas in one transaction.
+
+    The tenant's usage rows for the resources are read with SELECT ... FOR
+    UPDATE, so reservations of the same tenant are serialized, and the
+    usages are updated and the reservations inserted in bulk. hard_limits
+    are the limits of resources the tenant has no quota row for.
+
+    Raises QuotaExceeded, with nothing reserved, if a positive delta would
+    take a resource over its limit. Transactions lost to a deadlock or to
+    a concurrent first reservation of the tenant are retried.
+    """
+    for attempt in range(CONF.quota_reserve_retries + 1):
+        try:
+            return _quota_reserve(tenant_id, deltas, hard_limits)
+        except (sqlalchemy.exc.OperationalError,
+                sqlalchemy.exc.IntegrityError):
+            if attempt == CONF.quota_reserve_retries:
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+
+def _quota_reserve(tenant_id, deltas, hard_limits):
+    Quota = quota_models.Quota
+    QuotaUsage = quota_models.QuotaUsage
+    Reservation = quota_models.Reservation
+    usages_table = orm.class_mapper(QuotaUsage).mapped_table
+    reservations_table = orm.class_mapper(Reservation).mapped_table
+    resources = deltas.keys()
+    now = utils.utcnow()
+
+    db_session = session.get_session()
+    with db_session.begin():
+        usages = dict(
+            (usage.resource, {'id': usage.id,
+                              'in_use': usage.in_use or 0,
+                              'reserved': usage.reserved or 0})
+            for usage in db_session.query(QuotaUsage).
+            filter_by(tenant_id=tenant_id).
+            filter(QuotaUsage.resource.in_(resources)).
+            with_lockmode('update'))
+        limits = dict(hard_limits)
+        limits.update(
+            (quota.resource, quota.hard_limit)
+            for quota in db_session.query(Quota).
+            filter_by(tenant_id=tenant_id).
+            filter(Quota.resource.in_(resources)))
+
+        new_usages = []
+        for resource in resources:
+            if resource not in usages:
+                usages[resource] = {'id': utils.generate_uuid(),
+                                    'in_use': 0, 'reserved': 0}
+                new_usages.append({'id': usages[resource]['id'],
+                                   'created': now, 'updated': now,
+                                   'tenant_id': tenant_id,
+                                   'resource': resource,
+                                   'in_use': 0, 'reserved': 0})
+
+        overs = [resource for resource in resources
+                 if (int(deltas[resource]) > 0 and
+                     (usages[resource]['in_use'] +
+                      usages[resource]['reserved'] +
+                      int(deltas[resource])) > limits[resource])]
+        if overs:
+            raise exception.QuotaExceeded(overs=sorted(overs))
+
+        if new_usages:
+            db_session.execute(usages_table.insert(), new_usages)
+        # The update checks the limits again, which keeps databases that
+        # ignore FOR UPDATE, like SQLite, from going over them.
+        delta = bindparam('b_delta')
+        result = db_session.execute(
+            usages_table.update().
+            where(and_(usages_table.c.id == bindparam('b_id'),
+                       or_(delta <= 0,
+                           usages_table.c.in_use + usages_table.c.reserved +
+                           delta <= bindparam('b_limit')))).
+            values(reserved=usages_table.c.reserved + delta, updated=now),
+            [{'b_id': usages[resource]['id'],
+              'b_delta': int(deltas[resource]),
+              'b_limit': limits[resource]} for resource in resources])
+        if result.rowcount != len(resources):
+            raise exception.QuotaExceeded(overs=sorted(resources))
+        reservations = [{'id': utils.generate_uuid(),
+                         'created': now, 'updated': now,
+                         'usage_id': usages[resource]['id'],
+                         'delta': int(deltas[resource]),
+                         'status': Reservation.Statuses.RESERVED}
+                        for resource in resources]
+        db_session.execute(reservations_table.insert(), reservations)
+
+    return [Reservation(**values) for values in reservations]
+
+
+def reservations_commit(reservation_ids):
+    """Moves the deltas of reserved reservations into use."""
+    if reservation_ids:
+        _settle_reservations(
+            _table(quota_models.Reservation).c.id.in_(reservation_ids),
+            quota_models.Reservation.Statuses.COMMITTED)
+
+
+def reservations_rollback(reservation_ids):
+    """Releases the deltas of reserved reservations."""
+    if reservation_ids:
+        _settle_reservations(
+            _table(quota_models.Reservation).c.id.in_(reservation_ids),
+            quota_models.Reservation.Statuses.ROLLEDBACK)
+
+
+def reservations_expire(created_before):
+    """Rolls back the reservations still reserved that were created before
+    the given time, and returns how many there were."""
+    return _settle_reservations(
+        _table(quota_models.Reservation).c.created < created_before,
+        quota_models.Reservation.Statuses.ROLLEDBACK)
+
+
+def quota_usages_correct(corrections):
+    """Sets the in_use and reserved of quota usages in one executemany.
+
+    Each correction is a dict of the usage's id, the in_use and reserved
+    values it was read with and the new_in_use and new_reserved values to
+    set. A usage changed since it was read is left alone. Returns the
+    number of usages corrected.
+    """
+    if not corrections:
+        return 0
+    usages = _table(quota_models.QuotaUsage)
+    statement = usages.update().where(
+        and_(usages.c.id == bindparam('b_id'),
+             usages.c.in_use == bindparam('b_in_use'),
+             usages.c.reserved == bindparam('b_reserved')))
+    statement = statement.values(in_use=bindparam('b_new_in_use'),
+                                 reserved=bindparam('b_new_reserved'),
+                                 updated=utils.utcnow())
+    params = [dict(('b_' + key, value)
+                   for key, value in correction.iteritems())
+              for correction in corrections]
+    return session.get_session().execute(statement, params).rowcount
+
+
+def _settle_reservations(criterion, status):
+    # One UPDATE of the usages, whose deltas are summed from the
+    # reservations by a correlated subquery, and one of the reservations.
+    # Only reservations still reserved count, so settling twice is harmless.
+    Reservation = quota_models.Reservation
+    usages = _table(quota_models.QuotaUsage)
+    reservations = _table(Reservation)
+    pending = and_(criterion,
+                   reservations.c.status == Reservation.Statuses.RESERVED)
+    delta = select([func.coalesce(func.sum(reservations.c.delta), 0)]).\
+        where(and_(pending, reservations.c.usage_id == usages.c.id)).\
+        as_scalar()
+    now = utils.utcnow()
+    values = {'reserved': usages.c.reserved - delta, 'updated': now}
+    if status == Reservation.Statuses.COMMITTED:
+        values['in_use'] = usages.c.in_use + delta
+
+    db_session = session.get_session()
+    with db_session.begin():
+        db_session.execute(
+            usages.update().
+            where(usages.c.id.in_(select([reservations.c.usage_id]).
+                                  where(pending))).
+            values(values))
+        return db_session.execute(reservations.update().where(pending).
+                                  values(status=status,
+                                         updated=now)).rowcount
+
+
+def find_values(model, columns, criteria=None, **conditions):
+    """Returns tuples of the named columns, rather than model objects, of
+    the rows matching the conditions."""
+    query = session.get_session().query(
+        *[getattr(model, column) for column in columns])
+    return _filter(query, criteria, conditions).all()
+
+
+def aggregate(model, group_by, totals, criteria=None, outerjoin=None,
+              limit=None, **conditions):
+    """Groups the rows matching the conditions by the group_by columns
+    with a single GROUP BY query.
+
+    Each returned tuple holds a group's group_by values followed by its
+    totals. A total is either 'count', ('count', criterion), which counts
+    the rows matching the criterion, or ('sum', column). Counts and sums
+    are zero rather than NULL for a group without values. outerjoin is an
+    optional (model, onclause) whose columns criteria may refer to. With a
+    limit, only the first groups in the order of group_by are returned.
+    """
+    keys = [getattr(model, column) for column in group_by]
+    columns = keys[:]
+    for total in totals:
+        if total == 'count':
+            columns.append(func.count())
+        elif total[0] == 'count':
+            columns.append(func.coalesce(
+                func.sum(case([(total[1], 1)], else_=0)), 0))
+        else:
+            function, column = total
+            columns.append(func.coalesce(
+                getattr(func, function)(getattr(model, column)), 0))
+    # The conditions apply to model, so they are added before the join.
+    query = _filter(session.get_session().query(*columns), criteria,
+                    conditions)
+    if outerjoin:
+        query = query.outerjoin(outerjoin)
+    query = query.group_by(*keys)
+    if limit:
+        query = query.order_by(*keys).limit(limit)
+    return query.all()
+
+
+def _filter(query, criteria, conditions):
+    if conditions:
+        query = query.filter_by(**conditions)
+    for criterion in criteria or []:
+        query = query.filter(criterion)
+    return query
+
+
+def _table(model):
+    return orm.class_mapper(model).mapped_table
+
+
 def configure_db(options, *plugins):
     session.configure_db(options)
     configure_db_for_plugins(options, *plugins)
@@ -133,3 +419,46 @@ def _limits(query_func, model, conditions, limit, marker, marker_column=None):
     if marker:
         query = query.filter(marker_column > marker)
     return query.order_by(marker_column).limit(limit)
+
+
+def _keyset_limits(query_func, model, conditions, limit, marker_values,
+                   sort_keys, sort_dir):
+    """Orders the query by the sort_keys columns and returns the rows
+    after the one whose sort key values are marker_values."""
+    query = query_func(model, **conditions)
+    columns = [getattr(model, key) for key in sort_keys]
+    if marker_values:
+        values = [_marker_value(column, value)
+                  for column, value in zip(columns, marker_values)]
+        query = query.filter(_keyset_criterion(columns, values, sort_dir))
+    if sort_dir == 'desc':
+        order = [column.desc() for column in columns]
+    else:
+        order = [column.asc() for column in columns]
+    return query.order_by(*order).limit(limit)
+
+
+def _keyset_criterion(columns, values, sort_dir):
+    # (a, b, c) > (x, y, z) expands to
+    #   a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+    # and the leading a >= x keeps the scan to a range of the index.
+    if sort_dir == 'desc':
+        after, leading = operator.lt, operator.le
+    else:
+        after, leading = operator.gt, operator.ge
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*(equal + [after(column, value)])))
+    return and_(leading(columns[0], values[0]), or_(*clauses))
+
+
+def _marker_value(column, value):
+    # Markers carry datetimes as strings.
+    if (value is not None and
+            isinstance(column.property.columns[0].type, DateTime)):
+        try:
+            return timeutils.parse_strtime(value)
+        except ValueError:
+            raise exception.BadRequest(_("Invalid marker value: %s") % value)
+    return value
@@ -38,6 +38,8 @@ def map(engine, models):
                Table('dns_records', meta, autoload=True))
     orm.mapper(models['agent_heartbeats'],
                Table('agent_heartbeats', meta, autoload=True))
+    orm.mapper(models['volume_usages'],
+               Table('volume_usages', meta, autoload=True))
     orm.mapper(models['quotas'],
                Table('quotas', meta, autoload=True))
     orm.mapper(models['quota_usages'],
@@ -46,6 +48,8 @@ def map(engine, models):
                Table('reservations', meta, autoload=True))
     orm.mapper(models['backups'],
                Table('backups', meta, autoload=True))
+    orm.mapper(models['guest_update_jobs'],
+               Table('guest_update_jobs', meta, autoload=True))
     orm.mapper(models['security_group'],
                Table('security_groups', meta, autoload=True))
     orm.mapper(models['security_group_rule'],
@@ -0,0 +1,58 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import Index
+from sqlalchemy.schema import MetaData
+
+from trove.db.sqlalchemy.migrate_repo.schema import Table
+
+
+# Collections are filtered by their owner and paged in (created, id) order,
+# so each page is a range scan of one of these indexes.
+INDEXES = [
+    ('instances', 'ix_instances_tenant_deleted_created',
+     ['tenant_id', 'deleted', 'created', 'id']),
+    ('backups', 'ix_backups_tenant_deleted_created',
+     ['tenant_id', 'deleted', 'created', 'id']),
+    ('backups', 'ix_backups_instance_deleted_created',
+     ['instance_id', 'deleted', 'created', 'id']),
+    ('security_groups', 'ix_security_groups_tenant_deleted_created',
+     ['tenant_id', 'deleted', 'created', 'id']),
+]
+
+
+def _indexes(meta):
+    tables = {}
+    for table_name, name, columns in INDEXES:
+        if table_name not in tables:
+            tables[table_name] = Table(table_name, meta, autoload=True)
+        table = tables[table_name]
+        yield Index(name, *[table.c[column] for column in columns])
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    for index in _indexes(meta):
+        index.create()
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    for index in _indexes(meta):
+        index.drop()
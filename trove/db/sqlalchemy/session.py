@@ -48,6 +48,7 @@ def configure_db(options, models_mapper=None):
         from trove.quota import models as quota_models
         from trove.backup import models as backup_models
         from trove.extensions.security_group import models as secgrp_models
+        from trove.extensions.mgmt.host import models as host_models
 
         model_modules = [
             base_models,
@@ -57,6 +58,7 @@ def configure_db(options, models_mapper=None):
             quota_models,
             backup_models,
             secgrp_models,
+            host_models,
         ]
 
         models = {}
@@ -17,11 +17,17 @@
 
 from trove.openstack.common import log as logging
 
+from trove.common import cfg
 from trove.common.remote import create_nova_client
+from trove.db import get_db_api
 from trove.instance.models import DBInstance
+from trove.instance.models import InstanceServiceStatus
+from trove.instance.models import ServiceStatus
+from trove.instance.models import ServiceStatuses
 from trove.extensions.mgmt.instances.models import MgmtInstances
 from trove.common.exception import Forbidden
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
@@ -59,21 +65,65 @@ class Account(object):
 
 
 class AccountsSummary(object):
+    """The number of instances of each tenant having any, a page at a time.
 
-    def __init__(self, accounts):
+    Tenants are ordered by id, which is also the page marker. The detailed
+    summary adds the total volume size of each tenant and the number of
+    its instances in each status.
+    """
+
+    DEFAULT_LIMIT = CONF.accounts_page_size
+
+    def __init__(self, accounts, next_marker=None):
         self.accounts = accounts
+        self.next_marker = next_marker
+
+    @classmethod
+    def _status_totals(cls):
+        codes_by_status = {}
+        for status in vars(ServiceStatuses).values():
+            if isinstance(status, ServiceStatus):
+                codes_by_status.setdefault(status.api_status,
+                                           []).append(status.code)
+        return [(api_status, InstanceServiceStatus.status_id.in_(codes))
+                for api_status, codes in sorted(codes_by_status.items())]
 
     @classmethod
-    def load(cls):
-        # TODO(pdmars): This should probably be changed to a more generic
-        # database filter query if one is added, however, this should suffice
-        # for now.
-        db_infos = DBInstance.find_all(deleted=False)
-        tenant_ids_for_instances = [db_info.tenant_id for db_info in db_infos]
-        tenant_ids = set(tenant_ids_for_instances)
-        LOG.debug("All tenants with instances: %s" % tenant_ids)
+    def load(cls, limit=None, marker=None, detailed=False):
+        limit = int(limit or cls.DEFAULT_LIMIT)
+        if limit > cls.DEFAULT_LIMIT:
+            limit = cls.DEFAULT_LIMIT
+        criteria = []
+        if marker:
+            criteria.append(DBInstance.tenant_id > marker)
+        totals = ['count']
+        outerjoin = None
+        statuses = []
+        if detailed:
+            statuses = cls._status_totals()
+            totals.append(('sum', 'volume_size'))
+            totals.extend(('count', criterion)
+                          for api_status, criterion in statuses)
+            outerjoin = (InstanceServiceStatus,
+                         InstanceServiceStatus.instance_id == DBInstance.id)
+        # One row per tenant is read instead of every instance.
+        rows = get_db_api().aggregate(DBInstance, ['tenant_id'], totals,
+                                      criteria=criteria, outerjoin=outerjoin,
+                                      limit=limit + 1, deleted=False)
+        next_marker = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_marker = rows[-1][0]
         accounts = []
-        for tenant_id in tenant_ids:
-            num_instances = tenant_ids_for_instances.count(tenant_id)
-            accounts.append({'id': tenant_id, 'num_instances': num_instances})
-        return cls(accounts)
+        for row in rows:
+            account = {'id': row[0], 'num_instances': int(row[1])}
+            if detailed:
+                account['volume_size'] = int(row[2])
+                account['statuses'] = dict(
+                    (api_status, int(count))
+                    for (api_status, criterion), count
+                    in zip(statuses, row[3:]) if count)
+            accounts.append(account)
+        LOG.debug("Tenants with instances in this page: %s" %
+                  [row[0] for row in rows])
+        return cls(accounts, next_marker)
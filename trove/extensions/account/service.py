@@ -19,6 +19,8 @@ from novaclient import exceptions as nova_exceptions
 
 from trove.common import exception
 
+from trove.common import pagination
+from trove.common import utils
 from trove.common import wsgi
 from trove.common.auth import admin_context
 from trove.common.remote import create_nova_client
@@ -51,5 +53,12 @@ class AccountController(wsgi.Controller):
         """Return a list of all accounts with non-deleted instances."""
         LOG.info(_("req : '%s'\n\n") % req)
         LOG.info(_("Showing all accounts with instances for '%s'") % tenant_id)
-        accounts_summary = models.AccountsSummary.load()
-        return wsgi.Result(views.AccountsView(accounts_summary).data(), 200)
+        context = req.environ[wsgi.CONTEXT_KEY]
+        detailed = utils.bool_from_string(req.GET.get('detailed', 'false'))
+        accounts_summary = models.AccountsSummary.load(limit=context.limit,
+                                                       marker=context.marker,
+                                                       detailed=detailed)
+        view = views.AccountsView(accounts_summary)
+        paged = pagination.SimplePaginatedDataView(
+            req.url, 'accounts', view, accounts_summary.next_marker)
+        return wsgi.Result(paged.data(), 200)
@@ -0,0 +1,56 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from trove.common import exception
+from trove.common import wsgi
+from trove.common.auth import admin_context
+from trove.flavor import models as flavor_models
+from trove.instance import models as instance_models
+from trove.openstack.common import log as logging
+from trove.openstack.common.gettextutils import _
+
+LOG = logging.getLogger(__name__)
+
+
+class CacheController(wsgi.Controller):
+    """Controller for flushing the caches of rarely changing data."""
+
+    caches = {
+        'flavors': flavor_models.get_flavor_cache,
+        'server_state': instance_models.get_server_state_cache,
+        'service_images': instance_models.get_service_image_cache,
+    }
+
+    def _get_cache(self, name):
+        if name not in self.caches:
+            raise exception.NotFound(uuid=name)
+        return self.caches[name]()
+
+    @admin_context
+    def index(self, req, tenant_id):
+        """Return the hit and miss counts of this worker's caches."""
+        LOG.info(_("req : '%s'\n\n") % req)
+        stats = [self._get_cache(name).stats() for name in sorted(self.caches)]
+        return wsgi.Result({'caches': stats}, 200)
+
+    @admin_context
+    def delete(self, req, tenant_id, id):
+        """Flush a cache."""
+        LOG.info(_("req : '%s'\n\n") % req)
+        LOG.info(_("Flushing the %s cache.") % id)
+        self._get_cache(id).clear()
+        return wsgi.Result(None, 202)
@@ -19,6 +19,8 @@
 from trove.common import exception
 from trove.common import wsgi
 from trove.extensions.mgmt.host import models
+from trove.extensions.mgmt.host import views
+from trove.extensions.mgmt.host.service import guest_update_options
 from trove.openstack.common import log as logging
 from trove.openstack.common.gettextutils import _
 
@@ -55,5 +57,6 @@ class HostInstanceController(wsgi.Controller):
 
     def _action_update(self, context, host, body):
         LOG.debug("Updating all instances for host: %s" % host.name)
-        host.update_all(context)
-        return wsgi.Result(None, 202)
+        options = body['update'] if isinstance(body['update'], dict) else {}
+        job = host.update_all(context, **guest_update_options(options))
+        return wsgi.Result(views.GuestUpdateJobView(job).data(), 202)
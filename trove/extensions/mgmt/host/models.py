@@ -19,21 +19,30 @@
 Model classes that extend the instances functionality for MySQL instances.
 """
 
+from eventlet import greenpool
+from eventlet import queue
+
 from trove.openstack.common import log as logging
+from trove.openstack.common.gettextutils import _
 
 from trove import db
 
+from trove.backup.models import Backup
+from trove.common import cfg
 from trove.common import exception
 from trove.common import utils
+from trove.db import models as dbmodels
 from trove.instance.models import DBInstance
-from trove.instance.models import InstanceServiceStatus
+from trove.instance.models import load_service_statuses
 from trove.instance.models import SimpleInstance
 from trove.guestagent.db import models as guest_models
 from trove.common.remote import create_guest_client
 from trove.common.remote import create_nova_client
+from trove.taskmanager import api as task_api
 from novaclient import exceptions as nova_exceptions
 
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
@@ -66,36 +75,46 @@ class DetailedHost(object):
         for instance in self.instances:
             instance['server_id'] = instance['uuid']
             del instance['uuid']
-            try:
-                db_info = DBInstance.find_by(
-                    compute_instance_id=instance['server_id'])
-                instance['id'] = db_info.id
+        self._load_instances()
+
+    def _load_instances(self):
+        """Matches the host's servers to their instances and statuses.
+
+        The instances, their service statuses and their running backups
+        are each loaded with a single query, however many servers the host
+        has.
+        """
+        server_ids = [instance['server_id'] for instance in self.instances]
+        db_infos = {}
+        if server_ids:
+            for db_info in DBInstance.find_all(criteria=[
+                    DBInstance.compute_instance_id.in_(server_ids)]):
+                # A live instance wins over deleted ones on the same server.
+                known = db_infos.get(db_info.compute_instance_id)
+                if known is None or known.deleted:
+                    db_infos[db_info.compute_instance_id] = db_info
+        instance_ids = [db_info.id for db_info in db_infos.values()]
+        statuses = load_service_statuses(instance_ids)
+        backups_running = Backup.running_instance_ids(instance_ids)
+        for instance in self.instances:
+            db_info = db_infos.get(instance['server_id'])
+            status = db_info and statuses.get(db_info.id)
+            if db_info is not None:
                 instance['tenant_id'] = db_info.tenant_id
-                status = InstanceServiceStatus.find_by(
-                    instance_id=db_info.id)
-                instance_info = SimpleInstance(None, db_info, status)
-                instance['status'] = instance_info.status
-            except exception.TroveError as re:
-                LOG.error(re)
+            if status is None:
                 LOG.error("Compute Instance ID found with no associated RD "
                           "instance: %s" % instance['server_id'])
                 instance['id'] = None
+                continue
+            instance['id'] = db_info.id
+            instance_info = SimpleInstance(
+                None, db_info, status,
+                backup_running=db_info.id in backups_running)
+            instance['status'] = instance_info.status
 
-    def update_all(self, context):
-        num_i = len(self.instances)
-        LOG.debug("Host %s has %s instances to update" % (self.name, num_i))
-        failed_instances = []
-        for instance in self.instances:
-            client = create_guest_client(context, instance['id'])
-            try:
-                client.update_guest()
-            except exception.TroveError as re:
-                LOG.error(re)
-                LOG.error("Unable to update instance: %s" % instance['id'])
-                failed_instances.append(instance['id'])
-        if len(failed_instances) > 0:
-            msg = "Failed to update instances: %s" % failed_instances
-            raise exception.UpdateGuestError(msg)
+    def update_all(self, context, **kwargs):
+        """Starts a job updating the guests of this host's instances."""
+        return GuestUpdateJob.create(context, hosts=[self.name], **kwargs)
 
     @staticmethod
     def load(context, name):
@@ -104,3 +123,167 @@ class DetailedHost(object):
             return DetailedHost(client.rdhosts.get(name))
         except nova_exceptions.NotFound:
             raise exception.NotFound(uuid=name)
+
+
+def persisted_models():
+    return {'guest_update_jobs': GuestUpdateJob}
+
+
+class GuestUpdateState(object):
+    NEW = "NEW"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    STOPPED = "STOPPED"
+    END_STATES = [COMPLETED, FAILED, STOPPED]
+
+
+class GuestUpdateJob(dbmodels.DatabaseModelBase):
+    """A rolling update of the guest agents on some or all hosts.
+
+    The taskmanager updates one host after another. On each host up to
+    concurrency guests are updated at a time, each call allowed timeout
+    seconds. Once at least concurrency guests were tried and more than
+    max_failure_rate of them failed, no more updates are started and the
+    job is STOPPED. Progress is saved as it goes so the job can be polled.
+    """
+
+    _data_fields = ['id', 'tenant_id', 'hosts', 'state', 'concurrency',
+                    'timeout', 'max_failure_rate', 'total', 'succeeded',
+                    'failed', 'failed_instances', 'message', 'created',
+                    'updated']
+
+    @classmethod
+    def create(cls, context, hosts=None, concurrency=None, timeout=None,
+               max_failure_rate=None):
+        """Records a job for the named hosts, or all hosts, and casts it
+        to the taskmanager."""
+        if concurrency is None:
+            concurrency = CONF.guest_update_concurrency
+        if timeout is None:
+            timeout = CONF.guest_update_timeout
+        if max_failure_rate is None:
+            max_failure_rate = CONF.guest_update_max_failure_rate
+        try:
+            concurrency = int(concurrency)
+            timeout = int(timeout)
+            max_failure_rate = float(max_failure_rate)
+        except (TypeError, ValueError):
+            raise exception.BadRequest(_("Invalid guest update options."))
+        if concurrency < 1 or timeout < 1:
+            raise exception.BadRequest(_("The concurrency and timeout of a "
+                                         "guest update must be positive."))
+        if not 0 <= max_failure_rate <= 1:
+            raise exception.BadRequest(_("The max_failure_rate of a guest "
+                                         "update must be between 0 and 1."))
+        job = super(GuestUpdateJob, cls).create(
+            tenant_id=context.tenant,
+            hosts=','.join(hosts) if hosts else None,
+            state=GuestUpdateState.NEW,
+            concurrency=concurrency,
+            timeout=timeout,
+            max_failure_rate=max_failure_rate,
+            total=0,
+            succeeded=0,
+            failed=0,
+            failed_instances='')
+        task_api.API(context).update_guests(job.id)
+        return job
+
+    @classmethod
+    def load(cls, id):
+        try:
+            return cls.find_by(id=id)
+        except exception.ModelNotFoundError:
+            raise exception.NotFound(uuid=id)
+
+    @property
+    def host_names(self):
+        return self.hosts.split(',') if self.hosts else []
+
+    @property
+    def failed_instance_ids(self):
+        return self.failed_instances.split(',') if self.failed_instances \
+            else []
+
+    def run(self, context):
+        """Updates the guests, saving progress as they finish."""
+        self.update(state=GuestUpdateState.RUNNING)
+        try:
+            host_names = (self.host_names or
+                          [host.name for host in SimpleHost.load_all(context)])
+            for name in host_names:
+                LOG.info(_("Guest update %(id)s moving to host %(host)s.") %
+                         {'id': self.id, 'host': name})
+                self._update_host(context, DetailedHost.load(context, name))
+                if self._failure_rate_exceeded():
+                    self.update(state=GuestUpdateState.STOPPED,
+                                message=_("Stopped on host %s after too "
+                                          "many failures.") % name)
+                    return
+        except Exception as e:
+            LOG.exception(_("Guest update %s failed.") % self.id)
+            self.update(state=GuestUpdateState.FAILED, message=str(e)[:255])
+            return
+        if self.failed:
+            self.update(state=GuestUpdateState.FAILED,
+                        message=_("Failed to update instances"))
+        else:
+            self.update(state=GuestUpdateState.COMPLETED)
+
+    def _update_host(self, context, host):
+        instance_ids = [instance['id'] for instance in host.instances
+                        if instance['id']]
+        self.update(total=self.total + len(instance_ids))
+        pool = greenpool.GreenPool(self.concurrency)
+        results = queue.LightQueue()
+        in_flight = 0
+
+        def update_guest(instance_id):
+            results.put((instance_id, self._update_guest(context,
+                                                         instance_id)))
+
+        for instance_id in instance_ids:
+            # Only decide whether to go on once the window has room, so
+            # the updates that made room are taken into account.
+            while in_flight >= self.concurrency:
+                in_flight -= self._record(results, block=True)
+            if self._failure_rate_exceeded():
+                break
+            pool.spawn_n(update_guest, instance_id)
+            in_flight += 1
+        pool.waitall()
+        self._record(results)
+
+    def _update_guest(self, context, instance_id):
+        try:
+            create_guest_client(context, instance_id).update_guest(
+                timeout=self.timeout)
+            return True
+        except Exception as e:
+            LOG.error(e)
+            LOG.error(_("Unable to update instance: %s") % instance_id)
+            return False
+
+    def _record(self, results, block=False):
+        """Saves the outcome of the finished updates, waiting for one if
+        block is set, and returns how many there were."""
+        outcomes = []
+        if block:
+            outcomes.append(results.get())
+        while not results.empty():
+            outcomes.append(results.get_nowait())
+        if outcomes:
+            failed = self.failed_instance_ids
+            failed.extend(instance_id for instance_id, updated in outcomes
+                          if not updated)
+            self.update(succeeded=self.succeeded + len(outcomes) -
+                        (len(failed) - self.failed),
+                        failed=len(failed),
+                        failed_instances=','.join(failed))
+        return len(outcomes)
+
+    def _failure_rate_exceeded(self):
+        done = self.succeeded + self.failed
+        return (self.failed > 0 and done >= self.concurrency and
+                self.failed > done * self.max_failure_rate)
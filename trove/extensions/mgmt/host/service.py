@@ -30,6 +30,16 @@ from trove.openstack.common.gettextutils import _
 LOG = logging.getLogger(__name__)
 
 
+def guest_update_options(options):
+    """Picks the settings of a guest update job out of a request body."""
+    allowed = ('concurrency', 'timeout', 'max_failure_rate')
+    unknown = set(options) - set(allowed)
+    if unknown:
+        raise exception.BadRequest(_("Invalid guest update options: %s") %
+                                   ', '.join(sorted(unknown)))
+    return dict((key, options[key]) for key in allowed if key in options)
+
+
 class HostController(InstanceController):
     """Controller for instance functionality"""
 
@@ -51,3 +61,31 @@ class HostController(InstanceController):
         context = req.environ[wsgi.CONTEXT_KEY]
         host = models.DetailedHost.load(context, id)
         return wsgi.Result(views.HostDetailedView(host).data(), 200)
+
+
+class GuestUpdateController(wsgi.Controller):
+    """Controller for rolling guest agent updates across hosts."""
+
+    @admin_context
+    def show(self, req, tenant_id, id):
+        """Return the progress of a guest update job."""
+        LOG.info(_("req : '%s'\n\n") % req)
+        LOG.info(_("Showing guest update job '%s'") % id)
+        job = models.GuestUpdateJob.load(id)
+        return wsgi.Result(views.GuestUpdateJobView(job).data(), 200)
+
+    @admin_context
+    def create(self, req, body, tenant_id):
+        """Start updating the guests on the given hosts, or all hosts."""
+        LOG.info(_("req : '%s'\n\n") % req)
+        if not body or not isinstance(body.get('guest_update'), dict):
+            raise exception.BadRequest(_("Invalid request body."))
+        options = dict(body['guest_update'])
+        context = req.environ[wsgi.CONTEXT_KEY]
+        hosts = options.pop('hosts', None) or None
+        if hosts is not None and not isinstance(hosts, list):
+            raise exception.BadRequest(_("hosts must be a list."))
+        LOG.info(_("Updating the guests on %s") % (hosts or "all hosts"))
+        job = models.GuestUpdateJob.create(context, hosts=hosts,
+                                           **guest_update_options(options))
+        return wsgi.Result(views.GuestUpdateJobView(job).data(), 202)
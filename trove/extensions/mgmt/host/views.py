@@ -43,6 +43,29 @@ class HostDetailedView(object):
         }}
 
 
+class GuestUpdateJobView(object):
+
+    def __init__(self, job):
+        self.job = job
+
+    def data(self):
+        return {'guest_update': {
+            'id': self.job.id,
+            'hosts': self.job.host_names,
+            'state': self.job.state,
+            'concurrency': self.job.concurrency,
+            'timeout': self.job.timeout,
+            'max_failure_rate': self.job.max_failure_rate,
+            'total': self.job.total,
+            'succeeded': self.job.succeeded,
+            'failed': self.job.failed,
+            'failed_instances': self.job.failed_instance_ids,
+            'message': self.job.message,
+            'created': self.job.created,
+            'updated': self.job.updated,
+        }}
+
+
 class HostsView(object):
 
     def __init__(self, hosts):
@@ -12,30 +12,42 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import datetime
+import time
 
+from novaclient import exceptions as nova_exceptions
+
+from trove.backup.models import Backup
 from trove.common import cfg
 from trove.common import remote
 from trove.common import utils
 from trove.openstack.common import log as logging
+from trove.openstack.common.gettextutils import _
 from trove.openstack.common.notifier import api as notifier
 from trove.instance import models as imodels
-from trove.instance.models import load_instance, InstanceServiceStatus
+from trove.instance.models import InstanceServiceStatus
+from trove.instance.models import load_instance
 from trove.instance import models as instance_models
 from trove.extensions.mysql import models as mysql_models
+from trove.flavor import models as flavor_models
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
 
-def load_mgmt_instances(context, deleted=None, client=None):
-    if not client:
-        client = remote.create_nova_client(context)
+def _list_mgmt_servers(client):
     try:
         mgmt_servers = client.rdservers.list()
     except AttributeError:
         mgmt_servers = client.servers.list(search_opts={'all_tenants': 1})
     LOG.info("Found %d servers in Nova" %
              len(mgmt_servers if mgmt_servers else []))
+    return mgmt_servers
+
+
+def load_mgmt_instances(context, deleted=None, client=None):
+    if not client:
+        client = remote.create_nova_client(context)
+    mgmt_servers = _list_mgmt_servers(client)
     if deleted is not None:
         db_infos = instance_models.DBInstance.find_all(deleted=deleted)
     else:
@@ -45,6 +57,43 @@ def load_mgmt_instances(context, deleted=None, client=None):
     return instances
 
 
+def iter_instance_pages(batch_size, **conditions):
+    """Yields the instances matching the conditions a page at a time.
+
+    Only one page of rows is held at once, so the whole table can be
+    walked without loading it into memory.
+    """
+    query = instance_models.DBInstance.find_all(**conditions)
+    marker = None
+    while True:
+        db_infos, marker = query.paginated_collection(limit=batch_size,
+                                                      marker=marker)
+        if db_infos:
+            yield db_infos
+        if not marker:
+            break
+
+
+def iter_mgmt_instances(context, deleted=None, client=None,
+                        batch_size=None):
+    """Yields pages of the instances load_mgmt_instances would return.
+
+    Nova is asked for its servers once, while the database is read and
+    matched against them a page at a time.
+    """
+    if not client:
+        client = remote.create_nova_client(context)
+    find_server = imodels.create_server_list_matcher(
+        _list_mgmt_servers(client))
+    conditions = {}
+    if deleted is not None:
+        conditions['deleted'] = deleted
+    for db_infos in iter_instance_pages(
+            batch_size or CONF.exists_notification_batch_size, **conditions):
+        yield MgmtInstances.load_status_with_matcher(context, db_infos,
+                                                     find_server)
+
+
 def load_mgmt_instance(cls, context, id):
     try:
         instance = load_instance(cls, context, id, needs_server=True)
@@ -62,9 +111,9 @@ def load_mgmt_instance(cls, context, id):
 
 
 class SimpleMgmtInstance(imodels.BaseInstance):
-    def __init__(self, context, db_info, server, service_status):
+    def __init__(self, context, db_info, server, service_status, **kwargs):
         super(SimpleMgmtInstance, self).__init__(context, db_info, server,
-                                                 service_status)
+                                                 service_status, **kwargs)
 
     @property
     def status(self):
@@ -94,23 +143,66 @@ class DetailedMgmtInstance(SimpleMgmtInstance):
         super(DetailedMgmtInstance, self).__init__(*args, **kwargs)
         self.volume = None
         self.volume_used = None
+        self.volume_used_age = None
         self.root_history = None
+        self.timed_out = []
 
     @classmethod
-    def load(cls, context, id):
-        instance = load_mgmt_instance(cls, context, id)
-        client = remote.create_cinder_client(context)
-        try:
-            instance.volume = client.volumes.get(instance.volume_id)
-        except Exception:
-            instance.volume = None
-            # Populate the volume_used attribute from the guest agent.
-        instance_models.load_guest_info(instance, context, id)
-        instance.root_history = mysql_models.RootHistory.load(context=context,
-                                                              instance_id=id)
+    def load(cls, context, id, live=False):
+        """Loads the instance along with its server, volume, volume usage
+        and root history.
+
+        The server, volume and usage come from Nova, Cinder and the guest,
+        which are asked at the same time. Each call has
+        mgmt_instance_call_timeout seconds; those that run out of time are
+        listed in timed_out and what they would have loaded is left empty.
+        """
+        db_info = instance_models.get_db_info(context, id)
+        service_status = InstanceServiceStatus.find_by(instance_id=id)
+        instance = cls(context, db_info, None, service_status)
+        fetches = {
+            'server': lambda: _load_mgmt_server(context, db_info),
+            'root_history': lambda: mysql_models.RootHistory.load(
+                context=context, instance_id=id),
+            # The guest is asked, or not, based on the status the instance
+            # has without its server.
+            'guest': lambda: instance_models.load_guest_info(
+                instance, context, id, live=live),
+        }
+        if db_info.volume_id:
+            fetches['volume'] = lambda: remote.create_cinder_client(
+                context).volumes.get(db_info.volume_id)
+        results, instance.timed_out = utils.fetch_concurrently(
+            fetches, CONF.mgmt_instance_call_timeout)
+        # Without an answer from Nova the stored server state is kept.
+        if results['server'] is not None:
+            instance.server, state = results['server']
+            db_info.server_status = state.status if state else "SHUTDOWN"
+            db_info.addresses = state.addresses if state else {}
+        instance.volume = results.get('volume')
+        instance.root_history = results['root_history']
         return instance
 
 
+def _load_mgmt_server(context, db_info):
+    """Gets the server with the details only admins see in one call.
+
+    Returns the server, or None if Nova lacks the admin extension, along
+    with the state of the server, which is None if it no longer exists.
+    """
+    client = remote.create_nova_client(context)
+    try:
+        server = client.rdservers.get(db_info.compute_instance_id)
+    except AttributeError:
+        return None, imodels.load_server_state(
+            context, db_info.compute_instance_id, client=client)
+    except nova_exceptions.NotFound:
+        LOG.debug("Could not find nova server_id(%s)" %
+                  db_info.compute_instance_id)
+        return None, None
+    return server, server
+
+
 class MgmtInstance(imodels.Instance):
     def get_diagnostics(self):
         return self.get_guest().get_diagnostics()
@@ -125,12 +217,19 @@ class MgmtInstance(imodels.Instance):
 class MgmtInstances(imodels.Instances):
     @staticmethod
     def load_status_from_existing(context, db_infos, servers):
-        def load_instance(context, db, status, server=None):
-            return SimpleMgmtInstance(context, db, server, status)
+        find_server = imodels.create_server_list_matcher(servers)
+        return MgmtInstances.load_status_with_matcher(context, db_infos,
+                                                      find_server)
+
+    @staticmethod
+    def load_status_with_matcher(context, db_infos, find_server):
+        def load_instance(context, db, status, server=None,
+                          backup_running=None):
+            return SimpleMgmtInstance(context, db, server, status,
+                                      backup_running=backup_running)
 
         if context is None:
             raise TypeError("Argument context not defined.")
-        find_server = imodels.create_server_list_matcher(servers)
         instances = imodels.Instances._load_servers_status(load_instance,
                                                            context,
                                                            db_infos,
@@ -152,13 +251,39 @@ def _load_servers(instances, find_server):
 
 
 def publish_exist_events(transformer, admin_context):
-    notifications = transformer()
-    for notification in notifications:
+    """Publishes an exists event for every message the transformer yields.
+
+    Messages are published as they are produced, in batches of
+    exists_notification_batch_size. When exists_notification_rate is set,
+    publishing pauses between batches so that no more than that many
+    events go out per second. Progress is logged after every batch.
+
+    :returns: A dict of the number of events published and the seconds
+              the run took.
+    """
+    batch_size = CONF.exists_notification_batch_size
+    rate = CONF.exists_notification_rate
+    started = time.time()
+    published = 0
+    for notification in transformer():
         notifier.notify(admin_context,
                         CONF.host,
                         "trove.instance.exists",
                         'INFO',
                         notification)
+        published += 1
+        if published % batch_size:
+            continue
+        elapsed = time.time() - started
+        LOG.info(_("Published %(published)d exists events in "
+                   "%(elapsed).1fs.") % {'published': published,
+                                         'elapsed': elapsed})
+        if rate > 0 and published > elapsed * rate:
+            time.sleep(float(published) / rate - elapsed)
+    result = {'published': published, 'duration': time.time() - started}
+    LOG.info(_("Finished publishing %(published)d exists events in "
+               "%(duration).1fs.") % result)
+    return result
 
 
 class NotificationTransformer(object):
@@ -192,16 +317,28 @@ class NotificationTransformer(object):
                 'service_id': CONF.notification_service_id}
 
     def __call__(self):
+        """Yields the exists message of every live instance.
+
+        Instances are read a page at a time, with the service statuses and
+        running backups of a whole page loaded by a query each.
+        """
         audit_start, audit_end = NotificationTransformer._get_audit_period()
-        messages = []
-        db_infos = instance_models.DBInstance.find_all(deleted=False)
-        for db_info in db_infos:
-            service_status = InstanceServiceStatus.find_by(
-                instance_id=db_info.id)
-            instance = SimpleMgmtInstance(None, db_info, None, service_status)
-            message = self.transform_instance(instance, audit_start, audit_end)
-            messages.append(message)
-        return messages
+        for db_infos in iter_instance_pages(
+                CONF.exists_notification_batch_size, deleted=False):
+            instance_ids = [db_info.id for db_info in db_infos]
+            statuses = imodels.load_service_statuses(instance_ids)
+            backups_running = Backup.running_instance_ids(instance_ids)
+            for db_info in db_infos:
+                status = statuses.get(db_info.id)
+                if status is None:
+                    LOG.error(_("Server status could not be read for "
+                                "instance id(%s)") % db_info.id)
+                    continue
+                instance = SimpleMgmtInstance(
+                    None, db_info, None, status,
+                    backup_running=db_info.id in backups_running)
+                yield self.transform_instance(instance, audit_start,
+                                              audit_end)
 
 
 class NovaNotificationTransformer(NotificationTransformer):
@@ -209,31 +346,27 @@ class NovaNotificationTransformer(NotificationTransformer):
         super(NovaNotificationTransformer, self).__init__(**kwargs)
         self.context = kwargs['context']
         self.nova_client = remote.create_admin_nova_client(self.context)
-        self._flavor_cache = {}
 
     def _lookup_flavor(self, flavor_id):
-        if flavor_id in self._flavor_cache:
-            LOG.debug("Flavor cache hit for %s" % flavor_id)
-            return self._flavor_cache[flavor_id]
-        # fetch flavor resource from nova
-        LOG.info("Flavor cache miss for %s" % flavor_id)
-        flavor = self.nova_client.flavors.get(flavor_id)
-        self._flavor_cache[flavor_id] = flavor.name if flavor else 'unknown'
-        return self._flavor_cache[flavor_id]
+        try:
+            flavor = flavor_models.get_flavor(self.context, flavor_id,
+                                              client=self.nova_client)
+        except nova_exceptions.NotFound:
+            LOG.info("Flavor %s was not found." % flavor_id)
+            return 'unknown'
+        return flavor.name
 
     def __call__(self):
         audit_start, audit_end = NotificationTransformer._get_audit_period()
-        instances = load_mgmt_instances(self.context, deleted=False,
-                                        client=self.nova_client)
-        messages = []
-        for instance in filter(
-                lambda inst: inst.status != 'SHUTDOWN' and inst.server,
-                instances):
-            message = {
-                'instance_type': self._lookup_flavor(instance.flavor_id),
-                'user_id': instance.server.user_id}
-            message.update(self.transform_instance(instance,
-                                                   audit_start,
-                                                   audit_end))
-            messages.append(message)
-        return messages
+        for instances in iter_mgmt_instances(self.context, deleted=False,
+                                             client=self.nova_client):
+            for instance in instances:
+                if instance.status == 'SHUTDOWN' or not instance.server:
+                    continue
+                message = {
+                    'instance_type': self._lookup_flavor(instance.flavor_id),
+                    'user_id': instance.server.user_id}
+                message.update(self.transform_instance(instance,
+                                                       audit_start,
+                                                       audit_end))
+                yield message
@@ -20,6 +20,7 @@ from novaclient import exceptions as nova_exceptions
 
 from trove.backup.models import Backup
 from trove.common import exception
+from trove.common import utils
 from trove.common import wsgi
 from trove.common.auth import admin_context
 from trove.instance import models as instance_models
@@ -75,14 +76,13 @@ class MgmtInstanceController(InstanceController):
         LOG.info(_("id : '%s'\n\n") % id)
 
         context = req.environ[wsgi.CONTEXT_KEY]
-        server = models.DetailedMgmtInstance.load(context, id)
-        root_history = mysql_models.RootHistory.load(context=context,
-                                                     instance_id=id)
+        live = utils.bool_from_string(req.GET.get('live', 'false'))
+        server = models.DetailedMgmtInstance.load(context, id, live=live)
         return wsgi.Result(
             views.MgmtInstanceDetailView(
                 server,
                 req=req,
-                root_history=root_history).data(),
+                root_history=server.root_history).data(),
             200)
 
     @admin_context
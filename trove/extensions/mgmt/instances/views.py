@@ -80,11 +80,14 @@ class MgmtInstanceDetailView(MgmtInstanceView):
                 "size": volume.size,
                 "status": volume.status,
                 "used": self.instance.volume_used or None,
+                "used_age": self.instance.volume_used_age,
             }
         else:
             result['instance']['volume'] = None
         description = self.instance.service_status.status.description
         result['instance']['guest_status'] = {"state_description": description}
+        result['instance']['timed_out'] = getattr(self.instance, 'timed_out',
+                                                  [])
         return result
 
 
@@ -19,7 +19,9 @@ from trove.openstack.common import log as logging
 
 from trove.common import extensions
 from trove.common import wsgi
+from trove.extensions.mgmt.caches.service import CacheController
 from trove.extensions.mgmt.instances.service import MgmtInstanceController
+from trove.extensions.mgmt.host.service import GuestUpdateController
 from trove.extensions.mgmt.host.service import HostController
 from trove.extensions.mgmt.quota.service import QuotaController
 from trove.extensions.mgmt.host.instance import service as hostservice
@@ -86,6 +88,22 @@ class Mgmt(extensions.ExtensionsDescriptor):
             member_actions={})
         resources.append(storage)
 
+        caches = extensions.ResourceExtension(
+            '{tenant_id}/mgmt/caches',
+            CacheController(),
+            deserializer=wsgi.RequestDeserializer(),
+            serializer=serializer,
+            member_actions={})
+        resources.append(caches)
+
+        guest_updates = extensions.ResourceExtension(
+            '{tenant_id}/mgmt/guest-updates',
+            GuestUpdateController(),
+            deserializer=wsgi.RequestDeserializer(),
+            serializer=serializer,
+            member_actions={})
+        resources.append(guest_updates)
+
         host_instances = extensions.ResourceExtension(
             'instances',
             hostservice.HostInstanceController(),
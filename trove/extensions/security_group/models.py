@@ -51,6 +51,19 @@ class SecurityGroup(DatabaseModelBase):
         return SecurityGroupInstanceAssociation\
             .get_instance_id_by_security_group_id(self.id)
 
+    @classmethod
+    def paginate(cls, context, query):
+        """Returns a page of the security groups in query, oldest first,
+        and the marker of the next page."""
+        limit = int(context.limit or CONF.security_groups_page_size)
+        if limit > CONF.security_groups_page_size:
+            limit = CONF.security_groups_page_size
+        data_view = cls.find_by_pagination('security_groups', query, 'foo',
+                                           limit=limit,
+                                           marker=context.marker,
+                                           sort_keys=['created', 'id'])
+        return data_view.collection, data_view.next_page_marker
+
     @classmethod
     def create_sec_group(cls, name, description, context):
         try:
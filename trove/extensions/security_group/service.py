@@ -18,6 +18,7 @@
 
 
 from trove.common import exception
+from trove.common import pagination
 from trove.common import wsgi
 from trove.common import cfg
 from trove.extensions.security_group import models
@@ -36,16 +37,19 @@ class SecurityGroupController(wsgi.Controller):
         """Return all security groups tied to a particular tenant_id."""
         LOG.debug("Index() called with %s" % (tenant_id))
 
+        context = req.environ[wsgi.CONTEXT_KEY]
         sec_groups = models.SecurityGroup().find_all(tenant_id=tenant_id,
                                                      deleted=False)
+        sec_groups, marker = models.SecurityGroup.paginate(context,
+                                                           sec_groups)
 
         # Construct the mapping from Security Groups to Security Group Rules
         rules_map = dict([(g.id, g.get_rules()) for g in sec_groups])
 
-        return wsgi.Result(
-            views.SecurityGroupsView(sec_groups,
-                                     rules_map,
-                                     req, tenant_id).list(), 200)
+        view = views.SecurityGroupsView(sec_groups, rules_map, req, tenant_id)
+        paged = pagination.SimplePaginatedDataView(req.url, 'security_groups',
+                                                   view, marker)
+        return wsgi.Result(paged.data(), 200)
 
     def show(self, req, tenant_id, id):
         """Return a single security group."""
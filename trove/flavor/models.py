@@ -20,11 +20,88 @@
 from trove import db
 
 from novaclient import exceptions as nova_exceptions
+from novaclient.v1_1 import flavors as nova_flavors
+from trove.common import cache
+from trove.common import cfg
 from trove.common import exception
 from trove.common import utils
 from trove.common.models import NovaRemoteModelBase
 from trove.common.remote import create_nova_client
 
+CONF = cfg.CONF
+
+_FLAVOR_CACHE = None
+
+
+def get_flavor_cache():
+    """Returns the cache of Nova flavors keyed by flavor id."""
+    global _FLAVOR_CACHE
+    if _FLAVOR_CACHE is None:
+        _FLAVOR_CACHE = cache.create_cache(
+            'flavors', CONF.flavor_cache_ttl,
+            negative_ttl=CONF.flavor_cache_negative_ttl,
+            max_size=CONF.flavor_cache_size)
+    return _FLAVOR_CACHE
+
+
+def is_public(flavor):
+    """Whether every tenant may see the Nova flavor.
+
+    Flavors of a Nova without the flavor access extension are public.
+    """
+    return flavor._info.get('os-flavor-access:is_public', True) is not False
+
+
+def cache_flavors(flavors):
+    """Stores the public Nova flavors in the flavor cache.
+
+    The cache is shared by every tenant, so private flavors are left out
+    and always looked up with the caller's own client.
+    """
+    flavor_cache = get_flavor_cache()
+    for flavor in flavors:
+        if is_public(flavor):
+            # Only the flavor's data is kept so any cache backend can hold
+            # it.
+            flavor_cache.set(str(flavor.id), flavor._info)
+
+
+def get_flavor(context, flavor_id, client=None):
+    """Returns the Nova flavor with the given id.
+
+    On a miss the whole flavor list is fetched into the cache, since one
+    call costs about the same as a single get. Flavors missing from the
+    list are fetched on their own. Only public flavors are cached, and a
+    missing flavor is only remembered for the tenant that asked for it.
+    Raises Nova's NotFound like flavors.get does.
+    """
+    flavor_cache = get_flavor_cache()
+    client = client or create_nova_client(context)
+    if not flavor_cache.enabled:
+        return client.flavors.get(flavor_id)
+
+    key = str(flavor_id)
+    info = flavor_cache.get(key)
+    if info is None:
+        # Another tenant may well see the flavor, so a miss is cached
+        # under a key of the caller's tenant.
+        missing_key = "%s:%s" % (context.tenant, key)
+        if flavor_cache.get(missing_key) == cache.TTLCache.NOT_FOUND:
+            raise nova_exceptions.NotFound(404, "Flavor %s not found." % key)
+        listed = dict((str(flavor.id), flavor)
+                      for flavor in client.flavors.list())
+        cache_flavors(listed.values())
+        flavor = listed.get(key)
+        if flavor is None:
+            try:
+                flavor = client.flavors.get(flavor_id)
+            except nova_exceptions.NotFound:
+                flavor_cache.set_not_found(missing_key)
+                raise
+            cache_flavors([flavor])
+        info = flavor._info
+    return nova_flavors.Flavor(client.flavors, info, loaded=True)
+
 
 class Flavor(object):
 
@@ -36,8 +113,7 @@ class Flavor(object):
             return
         if flavor_id and context:
             try:
-                client = create_nova_client(context)
-                self.flavor = client.flavors.get(flavor_id)
+                self.flavor = get_flavor(context, flavor_id)
             except nova_exceptions.NotFound as e:
                 raise exception.NotFound(uuid=flavor_id)
             except nova_exceptions.ClientException as e:
@@ -75,8 +151,9 @@ class Flavor(object):
 class Flavors(NovaRemoteModelBase):
 
     def __init__(self, context):
-        nova_flavors = create_nova_client(context).flavors.list()
-        self.flavors = [Flavor(flavor=item) for item in nova_flavors]
+        flavors = create_nova_client(context).flavors.list()
+        cache_flavors(flavors)
+        self.flavors = [Flavor(flavor=item) for item in flavors]
 
     def __iter__(self):
         for item in self.flavors:
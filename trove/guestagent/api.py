@@ -48,6 +48,8 @@ class API(proxy.RpcProxy):
 
     def _call(self, method_name, timeout_sec, **kwargs):
         LOG.debug("Calling %s with timeout %s" % (method_name, timeout_sec))
+        # Don't wait out the timeout on an agent that has stopped beating.
+        self._check_for_hearbeat()
         try:
             result = self.call(self.context,
                                self.make_msg(method_name, **kwargs),
@@ -100,13 +102,24 @@ class API(proxy.RpcProxy):
         return "guestagent.%s" % self.id
 
     def _check_for_hearbeat(self):
-        """Preemptively raise GuestTimeout if heartbeat is old."""
+        """Preemptively raise GuestTimeout if heartbeat is old.
+
+        Heartbeats of active agents are cached for a few seconds, so most
+        calls don't need to read the database.
+        """
+        heartbeat_cache = agent_models.get_heartbeat_cache()
+        agent = heartbeat_cache.get(self.id)
+        if agent is not None and agent_models.AgentHeartBeat.is_active(agent):
+            return True
         try:
             agent = agent_models.AgentHeartBeat.find_by(instance_id=self.id)
             if agent_models.AgentHeartBeat.is_active(agent):
+                heartbeat_cache.set(self.id, agent)
                 return True
         except exception.ModelNotFoundError as mnfe:
             LOG.warn(mnfe)
+        LOG.warn(_("The guest agent of instance %s is not responding.") %
+                 self.id)
         raise exception.GuestTimeout()
 
     def change_passwords(self, users):
@@ -261,9 +274,9 @@ class API(proxy.RpcProxy):
         return self._call("get_filesystem_stats", AGENT_LOW_TIMEOUT,
                           fs_path=CONF.mount_point)
 
-    def update_guest(self):
+    def update_guest(self, timeout=None):
         """Make a synchronous call to update the guest agent."""
-        self._call("update_guest", AGENT_HIGH_TIMEOUT)
+        self._call("update_guest", timeout or AGENT_HIGH_TIMEOUT)
 
     def create_backup(self, backup_id):
         """Make async call to create a full backup of this instance"""
@@ -3,6 +3,8 @@ from trove.common import cfg
 from trove.guestagent import dbaas
 from trove.guestagent import backup
 from trove.guestagent import volume
+from trove.guestagent.models import HeartBeatWriter
+from trove.guestagent.models import VolumeUsage
 from trove.guestagent.manager.mysql_service import MySqlAppStatus
 from trove.guestagent.manager.mysql_service import MySqlAdmin
 from trove.guestagent.manager.mysql_service import MySqlApp
@@ -18,10 +20,34 @@ CONF = cfg.CONF
 
 class Manager(periodic_task.PeriodicTasks):
 
+    _heartbeat = None
+
+    @property
+    def heartbeat(self):
+        if self._heartbeat is None:
+            self._heartbeat = HeartBeatWriter(CONF.guest_id)
+        return self._heartbeat
+
+    @periodic_task.periodic_task
+    def publish_heartbeat(self, context):
+        """Let the API know the agent is up."""
+        self.heartbeat.beat()
+
     @periodic_task.periodic_task(ticks_between_runs=3)
     def update_status(self, context):
         """Update the status of the MySQL service"""
         MySqlAppStatus.get().update()
+        self._report_volume_usage()
+
+    def _report_volume_usage(self):
+        """Stores the filesystem stats of the volume so the API can show
+        them without calling the guest."""
+        try:
+            stats = dbaas.get_filesystem_volume_stats(CONF.mount_point)
+            VolumeUsage.report(CONF.guest_id, stats)
+        except Exception as e:
+            # The volume isn't mounted until the guest has been prepared.
+            LOG.debug(_("Unable to report the volume usage: %s") % e)
 
     def change_passwords(self, context, users):
         return MySqlAdmin().change_passwords(users)
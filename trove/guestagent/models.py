@@ -12,9 +12,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from datetime import datetime
+import time
 from datetime import timedelta
 
+from trove.common import cache
 from trove.common import cfg
 from trove.common import exception
 from trove.common import utils
@@ -29,9 +30,12 @@ CONF = cfg.CONF
 
 AGENT_HEARTBEAT = CONF.agent_heartbeat_time
 
+_HEARTBEAT_CACHE = None
+
 
 def persisted_models():
-    return {'agent_heartbeats': AgentHeartBeat}
+    return {'agent_heartbeats': AgentHeartBeat,
+            'volume_usages': VolumeUsage}
 
 
 class AgentHeartBeat(dbmodels.DatabaseModelBase):
@@ -61,5 +65,89 @@ class AgentHeartBeat(dbmodels.DatabaseModelBase):
 
     @staticmethod
     def is_active(agent):
-        return (datetime.now() - agent.updated_at <
+        return (utils.utcnow() - agent.updated_at <
                 timedelta(seconds=AGENT_HEARTBEAT))
+
+
+def get_heartbeat_cache():
+    """Returns the cache of recent heartbeats, keyed by instance id."""
+    global _HEARTBEAT_CACHE
+    if _HEARTBEAT_CACHE is None:
+        _HEARTBEAT_CACHE = cache.create_cache(
+            'agent_heartbeats', CONF.agent_heartbeat_cache_ttl)
+    return _HEARTBEAT_CACHE
+
+
+class HeartBeatWriter(object):
+    """Publishes the heartbeat of the Guest Agent.
+
+    beat is cheap enough to call on every tick of the agent; the heartbeat
+    is only written to the database once per interval.
+    """
+
+    def __init__(self, instance_id, interval=None):
+        self.instance_id = instance_id
+        if interval is None:
+            interval = CONF.agent_heartbeat_interval
+        self.interval = interval
+        self._heartbeat = None
+        self._last_written = None
+
+    def beat(self):
+        """Writes the heartbeat if it's due. Returns True if it was."""
+        now = time.time()
+        if (self._last_written is not None and
+                now - self._last_written < self.interval):
+            return False
+        try:
+            self._write()
+        except Exception:
+            LOG.exception(_("Unable to write the heartbeat of %s.") %
+                          self.instance_id)
+            return False
+        self._last_written = now
+        return True
+
+    def _write(self):
+        if self._heartbeat is None:
+            self._heartbeat = AgentHeartBeat.get_by(
+                instance_id=self.instance_id)
+        if self._heartbeat is None:
+            self._heartbeat = AgentHeartBeat.create(
+                instance_id=self.instance_id)
+        else:
+            self._heartbeat.save()
+
+
+class VolumeUsage(dbmodels.DatabaseModelBase):
+    """The filesystem usage of an instance's volume, as last reported by
+    its Guest Agent."""
+
+    _data_fields = ['instance_id', 'used', 'total', 'free', 'updated_at']
+    _table_name = 'volume_usages'
+
+    @classmethod
+    def report(cls, instance_id, stats):
+        """Stores the stats returned by get_filesystem_volume_stats."""
+        values = {'used': stats['used'],
+                  'total': stats['total'],
+                  'free': stats['free']}
+        usage = cls.get_by(instance_id=instance_id)
+        if usage is None:
+            return cls.create(instance_id=instance_id, **values)
+        usage.merge_attributes(values)
+        return usage.save()
+
+    def save(self):
+        if not self.is_valid():
+            raise exception.InvalidModelError(errors=self.errors)
+        self['updated_at'] = utils.utcnow()
+        LOG.debug(_("Saving %s: %s") %
+                  (self.__class__.__name__, self.__dict__))
+        return get_db_api().save(self)
+
+    @property
+    def age(self):
+        """Seconds since the usage was reported."""
+        delta = utils.utcnow() - self.updated_at
+        return delta.days * 86400 + delta.seconds
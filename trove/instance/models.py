@@ -18,20 +18,27 @@
 """Model classes that form the core of instances functionality."""
 
 from datetime import datetime
+from eventlet import greenpool
 from novaclient import exceptions as nova_exceptions
+from trove.common import cache
 from trove.common import cfg
 from trove.common import exception
+from trove.common import pagination
+from trove.common import utils
 from trove.common.remote import create_dns_client
 from trove.common.remote import create_guest_client
 from trove.common.remote import create_nova_client
 from trove.common.remote import create_cinder_client
 from trove.extensions.security_group.models import SecurityGroup
 from trove.db import models as dbmodels
+from trove.flavor import models as flavor_models
 from trove.backup.models import Backup
+from trove.guestagent.models import VolumeUsage
 from trove.quota.quota import run_with_quotas
 from trove.instance.tasks import InstanceTask
 from trove.instance.tasks import InstanceTasks
 from trove.taskmanager import api as task_api
+from trove.openstack.common import jsonutils
 from trove.openstack.common import log as logging
 from trove.openstack.common.gettextutils import _
 
@@ -40,17 +47,95 @@ CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
+_SERVER_STATE_CACHE = None
+_SERVICE_IMAGE_CACHE = None
+
+
+class ServerState(object):
+    """The parts of a compute server which are kept in the cache."""
+
+    def __init__(self, id, status, addresses):
+        self.id = id
+        self.status = status
+        self.addresses = addresses
+
+    @classmethod
+    def from_server(cls, server):
+        return cls(server.id, server.status, server.addresses)
+
+
+def get_server_state_cache():
+    """Returns the cache of compute server states keyed by server id."""
+    global _SERVER_STATE_CACHE
+    if _SERVER_STATE_CACHE is None:
+        _SERVER_STATE_CACHE = cache.create_cache(
+            'server_state', CONF.server_state_cache_ttl,
+            negative_ttl=CONF.server_state_cache_negative_ttl)
+    return _SERVER_STATE_CACHE
+
+
+def invalidate_server_state(server_id):
+    """Drops a cached server state, e.g. when Trove starts changing it."""
+    if server_id:
+        get_server_state_cache().invalidate(server_id)
+
+
+def load_stored_server_state(db_info):
+    """Returns the server state stored from compute notifications, if any.
+
+    This is only used when server_state_from_notifications is enabled.
+    """
+    if not CONF.server_state_from_notifications:
+        return None
+    if getattr(db_info, 'server_updated', None) is None:
+        return None
+    addresses = getattr(db_info, 'server_addresses', None)
+    return ServerState(db_info.compute_instance_id, db_info.server_status,
+                       jsonutils.loads(addresses) if addresses else {})
+
+
+def load_server_state(context, server_id, client=None, db_info=None):
+    """Loads the state of a server.
+
+    The state is read from the instances table when notifications keep it
+    there, and otherwise from the cache or from Nova. Returns None if the
+    server could not be found.
+    """
+    if db_info is not None:
+        state = load_stored_server_state(db_info)
+        if state is not None:
+            return state if state.status != 'DELETED' else None
+    server_cache = get_server_state_cache()
+    state = server_cache.get(server_id)
+    if state is None:
+        client = client or create_nova_client(context)
+        try:
+            server = client.servers.get(server_id)
+        except nova_exceptions.NotFound:
+            LOG.debug("Could not find nova server_id(%s)" % server_id)
+            server_cache.set_not_found(server_id)
+            return None
+        state = ServerState.from_server(server)
+        server_cache.set(server_id, state)
+    elif state == server_cache.NOT_FOUND:
+        return None
+    return state
+
+
 def load_server(context, instance_id, server_id):
     """Loads a server or raises an exception."""
     client = create_nova_client(context)
+    server_cache = get_server_state_cache()
     try:
         server = client.servers.get(server_id)
     except nova_exceptions.NotFound:
         LOG.debug("Could not find nova server_id(%s)" % server_id)
+        server_cache.set_not_found(server_id)
         raise exception.ComputeInstanceNotFound(instance_id=instance_id,
                                                 server_id=server_id)
     except nova_exceptions.ClientException as e:
         raise exception.TroveError(str(e))
+    server_cache.set(server_id, ServerState.from_server(server))
     return server
 
 
@@ -66,6 +151,12 @@ class InstanceStatus(object):
     SHUTDOWN = "SHUTDOWN"
     ERROR = "ERROR"
 
+# The statuses an instance can only be found to have once its compute
+# server is known.
+SERVER_DERIVED_STATUSES = [InstanceStatus.BUILD, InstanceStatus.ERROR,
+                           InstanceStatus.REBOOT, InstanceStatus.RESIZE,
+                           InstanceStatus.SHUTDOWN]
+
 
 def validate_volume_size(size):
     if size is None:
@@ -84,14 +175,22 @@ def load_simple_instance_server_status(context, db_info):
         db_info.server_status = "BUILD"
         db_info.addresses = {}
     else:
-        client = create_nova_client(context)
-        try:
-            server = client.servers.get(db_info.compute_instance_id)
-            db_info.server_status = server.status
-            db_info.addresses = server.addresses
-        except nova_exceptions.NotFound:
-            db_info.server_status = "SHUTDOWN"
-            db_info.addresses = {}
+        server = load_server_state(context, db_info.compute_instance_id,
+                                   db_info=db_info)
+        set_server_state(db_info, server)
+
+
+def set_server_state(db_info, server):
+    """Sets the server status and addresses of db_info from a server state.
+
+    A server that could not be found is reported as shut down.
+    """
+    if server is not None:
+        db_info.server_status = server.status
+        db_info.addresses = server.addresses
+    else:
+        db_info.server_status = "SHUTDOWN"
+        db_info.addresses = {}
 
 
 # If the compute server is in any of these states we can't perform any
@@ -113,10 +212,14 @@ class SimpleInstance(object):
 
     """
 
-    def __init__(self, context, db_info, service_status):
+    def __init__(self, context, db_info, service_status,
+                 backup_running=None):
         self.context = context
         self.db_info = db_info
         self.service_status = service_status
+        # When loaded in bulk the caller already knows whether a backup is
+        # running, otherwise it is looked up on demand.
+        self._backup_running = backup_running
 
     @property
     def addresses(self):
@@ -164,6 +267,10 @@ class SimpleInstance(object):
 
     @property
     def status(self):
+        return self.status_for_server(self.db_info.server_status)
+
+    def status_for_server(self, server_status):
+        """The API status of the instance if its server had server_status."""
         ### Check for taskmanager errors.
         if self.db_info.task_status.is_error:
             return InstanceStatus.ERROR
@@ -171,7 +278,7 @@ class SimpleInstance(object):
         ### Check for taskmanager status.
         ACTION = self.db_info.task_status.action
         if 'BUILDING' == ACTION:
-            if 'ERROR' == self.db_info.server_status:
+            if 'ERROR' == server_status:
                 return InstanceStatus.ERROR
             return InstanceStatus.BUILD
         if 'REBOOTING' == ACTION:
@@ -180,22 +287,21 @@ class SimpleInstance(object):
             return InstanceStatus.RESIZE
 
         ### Check for server status.
-        if self.db_info.server_status in ["BUILD", "ERROR", "REBOOT",
-                                          "RESIZE"]:
-            return self.db_info.server_status
+        if server_status in ["BUILD", "ERROR", "REBOOT", "RESIZE"]:
+            return server_status
 
         ### Check if there is a backup running for this instance
-        if Backup.running(self.id):
+        if self.backup_running:
             return InstanceStatus.BACKUP
 
         ### Report as Shutdown while deleting, unless there's an error.
         if 'DELETING' == ACTION:
-            if self.db_info.server_status in ["ACTIVE", "SHUTDOWN", "DELETED"]:
+            if server_status in ["ACTIVE", "SHUTDOWN", "DELETED"]:
                 return InstanceStatus.SHUTDOWN
             else:
                 msg = _("While shutting down instance (%s): server had "
                         "status (%s).")
-                LOG.error(msg % (self.id, self.db_info.server_status))
+                LOG.error(msg % (self.id, server_status))
                 return InstanceStatus.ERROR
 
         ### Check against the service status.
@@ -209,6 +315,12 @@ class SimpleInstance(object):
         # For everything else we can look at the service status mapping.
         return self.service_status.status.api_status
 
+    @property
+    def backup_running(self):
+        if self._backup_running is None:
+            self._backup_running = Backup.running(self.id) is not None
+        return self._backup_running
+
     @property
     def updated(self):
         return self.db_info.updated
@@ -233,9 +345,11 @@ class DetailInstance(SimpleInstance):
     instance from the guest.
     """
 
-    def __init__(self, context, db_info, service_status):
-        super(DetailInstance, self).__init__(context, db_info, service_status)
+    def __init__(self, context, db_info, service_status, **kwargs):
+        super(DetailInstance, self).__init__(context, db_info, service_status,
+                                             **kwargs)
         self._volume_used = None
+        self.volume_used_age = None
 
     @property
     def volume_used(self):
@@ -293,22 +407,63 @@ def load_instance(cls, context, id, needs_server=False):
     return cls(context, db_info, server, service_status)
 
 
-def load_instance_with_guest(cls, context, id):
+def load_instance_with_guest(cls, context, id, live=False):
+    """Loads an instance along with its server status and volume usage.
+
+    Nova and the guest are asked at the same time, since whether the guest
+    can be reached only depends on what the database knows. Whatever isn't
+    back within instance_show_timeout seconds is left out: the server
+    status falls back to the one stored and the addresses or volume usage
+    are omitted.
+    """
     db_info = get_db_info(context, id)
-    load_simple_instance_server_status(context, db_info)
     service_status = InstanceServiceStatus.find_by(instance_id=id)
     LOG.info("service status=%s" % service_status)
     instance = cls(context, db_info, service_status)
-    load_guest_info(instance, context, id)
+    if 'BUILDING' == db_info.task_status.action:
+        load_simple_instance_server_status(context, db_info)
+        load_guest_info(instance, context, id, live=live)
+        return instance
+
+    def load_server():
+        # A missing server is told apart from a failed or late lookup,
+        # which both leave None behind.
+        server = load_server_state(context, db_info.compute_instance_id,
+                                   db_info=db_info)
+        return server or ServerState(db_info.compute_instance_id,
+                                     "SHUTDOWN", {})
+
+    results, _timed_out = utils.fetch_concurrently(
+        {'server': load_server,
+         'guest': lambda: load_guest_info(instance, context, id, live=live)},
+        CONF.instance_show_timeout)
+    if results['server'] is not None:
+        set_server_state(db_info, results['server'])
+    else:
+        LOG.warn("Showing instance %s without its server details." % id)
+        db_info.addresses = None
     return instance
 
 
-def load_guest_info(instance, context, id):
+def load_guest_info(instance, context, id, live=False):
+    """Sets the volume usage of the instance.
+
+    The usage last reported by the guest is used, along with its age in
+    seconds. The guest is only asked for it when live is set or it hasn't
+    reported any yet.
+    """
+    if not live:
+        usage = VolumeUsage.get_by(instance_id=id)
+        if usage is not None:
+            instance.volume_used = usage.used
+            instance.volume_used_age = usage.age
+            return instance
     if instance.status not in AGENT_INVALID_STATUSES:
         guest = create_guest_client(context, id)
         try:
             volume_info = guest.get_volume_info()
             instance.volume_used = volume_info['used']
+            instance.volume_used_age = 0
         except Exception as e:
             LOG.error(e)
     return instance
@@ -317,8 +472,9 @@ def load_guest_info(instance, context, id):
 class BaseInstance(SimpleInstance):
     """Represents an instance."""
 
-    def __init__(self, context, db_info, server, service_status):
-        super(BaseInstance, self).__init__(context, db_info, service_status)
+    def __init__(self, context, db_info, server, service_status, **kwargs):
+        super(BaseInstance, self).__init__(context, db_info, service_status,
+                                           **kwargs)
         self.server = server
         self._guest = None
         self._nova_client = None
@@ -336,6 +492,7 @@ class BaseInstance(SimpleInstance):
                       self.db_info.compute_instance_id)
             LOG.debug(_(" ... setting status to DELETING."))
             self.update_db(task_status=InstanceTasks.DELETING)
+            invalidate_server_state(self.server_id)
             task_api.API(self.context).delete_instance(self.id)
 
         deltas = {'instances': -1}
@@ -418,7 +575,8 @@ class Instance(BuiltInstance):
 
         client = create_nova_client(context)
         try:
-            flavor = client.flavors.get(flavor_id)
+            flavor = flavor_models.get_flavor(context, flavor_id,
+                                              client=client)
         except nova_exceptions.NotFound:
             raise exception.FlavorNotFound(uuid=flavor_id)
 
@@ -489,10 +647,12 @@ class Instance(BuiltInstance):
         # as the current one.
         client = create_nova_client(self.context)
         try:
-            new_flavor = client.flavors.get(new_flavor_id)
+            new_flavor = flavor_models.get_flavor(self.context, new_flavor_id,
+                                                  client=client)
         except nova_exceptions.NotFound:
             raise exception.FlavorNotFound(uuid=new_flavor_id)
-        old_flavor = client.flavors.get(self.flavor_id)
+        old_flavor = flavor_models.get_flavor(self.context, self.flavor_id,
+                                              client=client)
         new_flavor_size = new_flavor.ram
         old_flavor_size = old_flavor.ram
         if CONF.trove_volume_support:
@@ -510,6 +670,7 @@ class Instance(BuiltInstance):
 
         # Set the task to RESIZING and begin the async call before returning.
         self.update_db(task_status=InstanceTasks.RESIZING)
+        invalidate_server_state(self.server_id)
         LOG.debug("Instance %s set to RESIZING." % self.id)
         task_api.API(self.context).resize_flavor(self.id, old_flavor,
                                                  new_flavor)
@@ -540,6 +701,7 @@ class Instance(BuiltInstance):
         self.validate_can_perform_action()
         LOG.info("Rebooting instance %s..." % self.id)
         self.update_db(task_status=InstanceTasks.REBOOTING)
+        invalidate_server_state(self.server_id)
         task_api.API(self.context).reboot(self.id)
 
     def restart(self):
@@ -558,6 +720,7 @@ class Instance(BuiltInstance):
         self.validate_can_perform_action()
         LOG.info("Migrating instance id = %s, to host = %s" % (self.id, host))
         self.update_db(task_status=InstanceTasks.MIGRATING)
+        invalidate_server_state(self.server_id)
         task_api.API(self.context).migrate(self.id, host)
 
     def reset_task_status(self):
@@ -586,87 +749,218 @@ class Instance(BuiltInstance):
 
 def create_server_list_matcher(server_list):
     # Returns a method which finds a server from the given list.
+    # The list is indexed by server id up front so that matching a whole
+    # page of instances doesn't rescan it for every instance.
+    servers_by_id = {}
+    duplicate_ids = set()
+    for server in server_list or []:
+        if server.id in servers_by_id:
+            duplicate_ids.add(server.id)
+        servers_by_id[server.id] = server
+
     def find_server(instance_id, server_id):
-        matches = [server for server in server_list if server.id == server_id]
-        if len(matches) == 1:
-            return matches[0]
-        elif len(matches) < 1:
+        if server_id in duplicate_ids:
+            # Should never happen, but never say never.
+            LOG.error(_("Server %s for instance %s was found twice!") %
+                      (server_id, instance_id))
+            raise exception.TroveError(uuid=instance_id)
+        try:
+            return servers_by_id[server_id]
+        except KeyError:
             # The instance was not found in the list and
             # this can happen if the instance is deleted from
             # nova but still in trove database
             raise exception.ComputeInstanceNotFound(
                 instance_id=instance_id, server_id=server_id)
-        else:
-            # Should never happen, but never say never.
-            LOG.error(_("Server %s for instance %s was found twice!") %
-                      (server_id, instance_id))
-            raise exception.TroveError(uuid=instance_id)
     return find_server
 
 
+def load_servers_for_instances(context, db_infos):
+    """Fetches the states of only the servers backing the given instances.
+
+    Instances which are still building are skipped, as are servers Nova no
+    longer knows about; the server list matcher reports both as missing.
+    States not in the cache are fetched concurrently since a page is small.
+    """
+    db_infos = [db_info for db_info in db_infos
+                if db_info.compute_instance_id and
+                InstanceTasks.BUILDING != db_info.task_status]
+    if not db_infos:
+        return []
+    client = create_nova_client(context)
+
+    def get_server(db_info):
+        return load_server_state(context, db_info.compute_instance_id,
+                                 client=client, db_info=db_info)
+
+    pool = greenpool.GreenPool(len(db_infos))
+    return [server for server in pool.imap(get_server, db_infos)
+            if server is not None]
+
+
+def _load_simple_instance(context, db, status, backup_running=None,
+                          **kwargs):
+    return SimpleInstance(context, db, status, backup_running=backup_running)
+
+
+def _instance_filter_conditions(filters):
+    """Turns instance list filters into find_all conditions and criteria."""
+    conditions = {}
+    criteria = []
+    if filters.get('name'):
+        prefix = filters['name']
+        for char in ('\\', '%', '_'):
+            prefix = prefix.replace(char, '\\' + char)
+        criteria.append(DBInstance.name.like(prefix + '%', escape='\\'))
+    if filters.get('task'):
+        codes = [task.code for task in InstanceTask.from_action(
+            filters['task'])]
+        criteria.append(DBInstance.task_id.in_(codes))
+    if filters.get('service_type'):
+        conditions['service_type'] = filters['service_type']
+    if filters.get('created_since'):
+        criteria.append(DBInstance.created >= filters['created_since'])
+    if filters.get('created_before'):
+        criteria.append(DBInstance.created < filters['created_before'])
+    return conditions, criteria
+
+
 class Instances(object):
 
     DEFAULT_LIMIT = CONF.instances_page_size
 
+    SORT_KEYS = ['created', 'updated', 'name']
+
     @staticmethod
-    def load(context):
+    def load(context, filters=None, sort_key='created', sort_dir='asc'):
+        """Loads a page of the tenant's instances.
 
-        def load_simple_instance(context, db, status, **kwargs):
-            return SimpleInstance(context, db, status)
+        filters may hold a name prefix, task action, service_type,
+        created_since and created_before, which are all applied in SQL,
+        and a list of API statuses. Instances are ordered by sort_key, with
+        the id breaking ties.
+        """
 
         if context is None:
             raise TypeError("Argument context not defined.")
-        client = create_nova_client(context)
-        servers = client.servers.list()
 
-        db_infos = DBInstance.find_all(tenant_id=context.tenant, deleted=False)
+        filters = dict(filters or {})
+        statuses = filters.pop('status', None)
+        conditions, criteria = _instance_filter_conditions(filters)
+        db_infos = DBInstance.find_all(tenant_id=context.tenant,
+                                       deleted=False,
+                                       criteria=criteria,
+                                       **conditions)
         limit = int(context.limit or Instances.DEFAULT_LIMIT)
         if limit > Instances.DEFAULT_LIMIT:
             limit = Instances.DEFAULT_LIMIT
+        sort_keys = [sort_key, 'id']
+
+        if statuses:
+            return Instances._load_by_status(context, db_infos, statuses,
+                                             limit, sort_keys, sort_dir)
+
         data_view = DBInstance.find_by_pagination('instances', db_infos, "foo",
                                                   limit=limit,
-                                                  marker=context.marker)
+                                                  marker=context.marker,
+                                                  sort_keys=sort_keys,
+                                                  sort_dir=sort_dir)
         next_marker = data_view.next_page_marker
 
+        # Only ask Nova about the servers backing this page of instances.
+        servers = load_servers_for_instances(context, data_view.collection)
         find_server = create_server_list_matcher(servers)
-        for db in db_infos:
-            LOG.debug("checking for db [id=%s, compute_instance_id=%s]" %
-                      (db.id, db.compute_instance_id))
-        ret = Instances._load_servers_status(load_simple_instance, context,
+        ret = Instances._load_servers_status(_load_simple_instance, context,
                                              data_view.collection,
                                              find_server)
         return ret, next_marker
 
     @staticmethod
-    def _load_servers_status(load_instance, context, db_items, find_server):
+    def _load_by_status(context, db_infos, statuses, limit, sort_keys,
+                        sort_dir):
+        """Fills a page with the instances having one of statuses.
+
+        Rows are read a page at a time. The status of each is first worked
+        out from its service status and running backups alone, and Nova is
+        only asked about the servers of rows that can still match.
+        """
+        wanted = set(statuses)
+        needs_server = bool(wanted.intersection(SERVER_DERIVED_STATUSES))
+        ret = []
+        marker = context.marker
+        while True:
+            data_view = DBInstance.find_by_pagination(
+                'instances', db_infos, "foo", limit=limit, marker=marker,
+                sort_keys=sort_keys, sort_dir=sort_dir)
+            db_items = list(data_view.collection)
+            instance_ids = [db.id for db in db_items]
+            service_statuses = load_service_statuses(instance_ids)
+            backups_running = Backup.running_instance_ids(instance_ids)
+
+            candidates = []
+            for db in db_items:
+                service_status = service_statuses.get(db.id)
+                if service_status is None or not service_status.status:
+                    continue
+                instance = SimpleInstance(
+                    context, db, service_status,
+                    backup_running=db.id in backups_running)
+                if needs_server or instance.status_for_server(
+                        'ACTIVE') in wanted:
+                    candidates.append(db)
+
+            servers = load_servers_for_instances(context, candidates)
+            find_server = create_server_list_matcher(servers)
+            instances = Instances._load_servers_status(
+                _load_simple_instance, context, candidates, find_server,
+                statuses=service_statuses, backups_running=backups_running)
+            for instance in instances:
+                if instance.status not in wanted:
+                    continue
+                ret.append(instance)
+                if len(ret) == limit:
+                    next_marker = pagination.encode_marker(
+                        [instance.db_info[key] for key in sort_keys])
+                    return ret, next_marker
+
+            marker = data_view.next_page_marker
+            if marker is None:
+                return ret, None
+
+    @staticmethod
+    def _load_servers_status(load_instance, context, db_items, find_server,
+                             statuses=None, backups_running=None):
+        db_items = list(db_items)
+        instance_ids = [db.id for db in db_items]
+        # Fetch the statuses and running backups for the whole page up front
+        # rather than issuing a query per instance.
+        if statuses is None:
+            statuses = load_service_statuses(instance_ids)
+        if backups_running is None:
+            backups_running = Backup.running_instance_ids(instance_ids)
         ret = []
         for db in db_items:
             server = None
-            try:
-                #TODO(tim.simpson): Delete when we get notifications working!
-                if InstanceTasks.BUILDING == db.task_status:
-                    db.server_status = "BUILD"
-                else:
-                    try:
-                        server = find_server(db.id, db.compute_instance_id)
-                        db.server_status = server.status
-                    except exception.ComputeInstanceNotFound:
-                        db.server_status = "SHUTDOWN"  # Fake it...
-                #TODO(tim.simpson): End of hack.
-
-                #volumes = find_volumes(server.id)
-                status = InstanceServiceStatus.find_by(instance_id=db.id)
-                LOG.info(_("Server api_status(%s)") %
-                         status.status.api_status)
-                if not status.status:  # This should never happen.
-                    LOG.error(_("Server status could not be read for "
-                                "instance id(%s)") % db.id)
-                    continue
-            except exception.ModelNotFoundError:
+            #TODO(tim.simpson): Delete when we get notifications working!
+            if InstanceTasks.BUILDING == db.task_status:
+                db.server_status = "BUILD"
+            else:
+                try:
+                    server = find_server(db.id, db.compute_instance_id)
+                    db.server_status = server.status
+                except exception.ComputeInstanceNotFound:
+                    db.server_status = "SHUTDOWN"  # Fake it...
+            #TODO(tim.simpson): End of hack.
+
+            #volumes = find_volumes(server.id)
+            status = statuses.get(db.id)
+            if status is None or not status.status:
                 LOG.error(_("Server status could not be read for "
                             "instance id(%s)") % db.id)
                 continue
-            ret.append(load_instance(context, db, status, server=server))
+            LOG.info(_("Server api_status(%s)") % status.status.api_status)
+            ret.append(load_instance(context, db, status, server=server,
+                                     backup_running=db.id in backups_running))
         return ret
 
 
@@ -707,6 +1001,27 @@ class ServiceImage(dbmodels.DatabaseModelBase):
 
     _data_fields = ['service_name', 'image_id']
 
+    @classmethod
+    def find_by_service_name(cls, service_name):
+        """Returns the image of a service, reading the table only on a
+        cache miss."""
+        service_image_cache = get_service_image_cache()
+        data = service_image_cache.get(service_name)
+        if data is None:
+            service_image = cls.find_by(service_name=service_name)
+            service_image_cache.set(service_name, service_image.data())
+            return service_image
+        return cls(**data)
+
+
+def get_service_image_cache():
+    """Returns the cache of service images keyed by service name."""
+    global _SERVICE_IMAGE_CACHE
+    if _SERVICE_IMAGE_CACHE is None:
+        _SERVICE_IMAGE_CACHE = cache.create_cache(
+            'service_images', CONF.service_image_cache_ttl, negative_ttl=0)
+    return _SERVICE_IMAGE_CACHE
+
 
 class InstanceServiceStatus(dbmodels.DatabaseModelBase):
 
@@ -734,6 +1049,19 @@ class InstanceServiceStatus(dbmodels.DatabaseModelBase):
     status = property(get_status, set_status)
 
 
+def load_service_statuses(instance_ids):
+    """Loads the service statuses of many instances with a single query.
+
+    Returns a dict mapping each instance id to its InstanceServiceStatus.
+    Instances without a status row are absent from the result.
+    """
+    if not instance_ids:
+        return {}
+    query = InstanceServiceStatus.query()
+    query = query.filter(InstanceServiceStatus.instance_id.in_(instance_ids))
+    return dict((status.instance_id, status) for status in query.all())
+
+
 def persisted_models():
     return {
         'instance': DBInstance,
@@ -26,8 +26,11 @@ from trove.extensions.mysql.common import populate_validated_databases
 from trove.extensions.mysql.common import populate_users
 from trove.instance import models, views
 from trove.backup.models import Backup as backup_model
+from trove.backup import service as backup_service
 from trove.backup import views as backup_views
+from trove.instance.tasks import InstanceTask
 from trove.openstack.common import log as logging
+from trove.openstack.common import timeutils
 from trove.openstack.common.gettextutils import _
 import trove.common.apischema as apischema
 
@@ -133,20 +136,65 @@ class InstanceController(wsgi.Controller):
         LOG.info(_("req : '%s'\n\n") % req)
         LOG.info(_("Indexing a database instance for tenant '%s'") % tenant_id)
         context = req.environ[wsgi.CONTEXT_KEY]
-        servers, marker = models.Instances.load(context)
+        filters, sort_key, sort_dir = self._list_params(req.GET)
+        servers, marker = models.Instances.load(context, filters=filters,
+                                                sort_key=sort_key,
+                                                sort_dir=sort_dir)
         view = views.InstancesView(servers, req=req)
         paged = pagination.SimplePaginatedDataView(req.url, 'instances', view,
                                                    marker)
         return wsgi.Result(paged.data(), 200)
 
+    @staticmethod
+    def _list_params(params):
+        """Reads the filters and sort order of an instance listing."""
+        filters = {}
+        for key in ('name', 'service_type'):
+            if params.get(key):
+                filters[key] = params[key]
+        if params.get('task'):
+            task = params['task'].upper()
+            if not InstanceTask.from_action(task):
+                raise exception.BadRequest(_("Invalid task: %s") % task)
+            filters['task'] = task
+        if params.get('status'):
+            statuses = [status.strip().upper()
+                        for status in params['status'].split(',')]
+            for status in statuses:
+                if not hasattr(models.InstanceStatus, status):
+                    raise exception.BadRequest(_("Invalid status: %s") %
+                                               status)
+            filters['status'] = statuses
+        for key in ('created_since', 'created_before'):
+            if params.get(key):
+                try:
+                    filters[key] = timeutils.normalize_time(
+                        timeutils.parse_isotime(params[key]))
+                except ValueError:
+                    raise exception.BadRequest(_("Invalid %s: %s") %
+                                               (key, params[key]))
+        sort_key = params.get('sort_key', 'created')
+        if sort_key not in models.Instances.SORT_KEYS:
+            raise exception.BadRequest(_("Invalid sort_key: %s") % sort_key)
+        sort_dir = params.get('sort_dir', 'asc')
+        if sort_dir not in ('asc', 'desc'):
+            raise exception.BadRequest(_("Invalid sort_dir: %s") % sort_dir)
+        return filters, sort_key, sort_dir
+
     def backups(self, req, tenant_id, id):
         """Return all backups for the specified instance."""
         LOG.info(_("req : '%s'\n\n") % req)
         LOG.info(_("Indexing backups for instance '%s'") %
                  id)
 
-        backups = backup_model.list_for_instance(id)
-        return wsgi.Result(backup_views.BackupViews(backups).data(), 200)
+        context = req.environ[wsgi.CONTEXT_KEY]
+        filters = backup_service.list_filters(req.GET)
+        backups, marker = backup_model.paginate(
+            context, backup_model.list_for_instance(id, **filters))
+        view = backup_views.BackupViews(backups)
+        paged = pagination.SimplePaginatedDataView(req.url, 'backups', view,
+                                                   marker)
+        return wsgi.Result(paged.data(), 200)
 
     def show(self, req, tenant_id, id):
         """Return a single instance."""
@@ -155,8 +203,9 @@ class InstanceController(wsgi.Controller):
         LOG.info(_("id : '%s'\n\n") % id)
 
         context = req.environ[wsgi.CONTEXT_KEY]
+        live = utils.bool_from_string(req.GET.get('live', 'false'))
         server = models.load_instance_with_guest(models.DetailInstance,
-                                                 context, id)
+                                                 context, id, live=live)
         return wsgi.Result(views.InstanceDetailView(server,
                                                     req=req).data(), 200)
 
@@ -181,7 +230,7 @@ class InstanceController(wsgi.Controller):
         # Set the service type to mysql if its not in the request
         service_type = (body['instance'].get('service_type') or
                         CONF.service_type)
-        service = models.ServiceImage.find_by(service_name=service_type)
+        service = models.ServiceImage.find_by_service_name(service_type)
         image_id = service['image_id']
         name = body['instance']['name']
         flavor_ref = body['instance']['flavorRef']
@@ -59,6 +59,12 @@ class InstanceTask(object):
             return None
         return cls._lookup[code]
 
+    @classmethod
+    def from_action(cls, action):
+        """Returns every task, including the error ones, for an action."""
+        return [task for task in cls._lookup.values()
+                if task.action == action]
+
     def __str__(self):
         return "(%d %s %s)" % (self._code, self._action, self._db_text)
 
@@ -95,12 +95,13 @@ class InstanceDetailView(InstanceView):
 
         if isinstance(self.instance, models.DetailInstance) and \
             self.instance.volume_used:
-            used = self.instance.volume_used
+            used = {'used': self.instance.volume_used,
+                    'used_age': self.instance.volume_used_age}
             if CONF.trove_volume_support:
-                result['instance']['volume']['used'] = used
+                result['instance']['volume'].update(used)
             else:
                 # either ephemeral or root partition
-                result['instance']['local_storage'] = {'used': used}
+                result['instance']['local_storage'] = used
 
         return result
 
@@ -21,6 +21,7 @@ from trove.openstack.common import log as logging
 from trove.openstack.common.gettextutils import _
 from oslo.config import cfg
 from trove.common import exception
+from trove.db import get_db_api
 from trove.openstack.common import importutils
 from trove.quota.models import Quota
 from trove.quota.models import QuotaUsage
@@ -201,6 +202,56 @@ class DbQuotaDriver(object):
             reservation.save()
 
 
+class AtomicDbQuotaDriver(DbQuotaDriver):
+    """
+    Driver which reserves, commits and rolls back quota each in a single
+    database transaction. The tenant's usage rows are locked while a
+    reservation is checked, so concurrent requests of a tenant can't both
+    take the last of a quota.
+    """
+
+    def reserve(self, tenant_id, resources, deltas):
+        """Check quotas and reserve resources for a tenant.
+
+        :param tenant_id: The ID of the tenant reserving the resources.
+        :param resources: A dictionary of the registered resources.
+        :param deltas: A dictionary of the proposed delta changes.
+        """
+
+        unregistered_resources = [delta for delta in deltas
+                                  if delta not in resources]
+        if unregistered_resources:
+            raise exception.QuotaResourceUnknown(unknown=
+                                                 unregistered_resources)
+
+        defaults = dict((resource, self.resources[resource].default)
+                        for resource in deltas)
+        return get_db_api().quota_reserve(tenant_id, deltas, defaults)
+
+    def commit(self, reservations):
+        """Commit reservations.
+
+        :param reservations: A list of the reservations, as returned by
+                             the reserve() method.
+        """
+
+        get_db_api().reservations_commit([resv.id for resv in reservations])
+        for reservation in reservations:
+            reservation.status = Reservation.Statuses.COMMITTED
+
+    def rollback(self, reservations):
+        """Roll back reservations.
+
+        :param reservations: A list of the reservations, as returned by
+                             the reserve() method.
+        """
+
+        get_db_api().reservations_rollback(
+            [resv.id for resv in reservations])
+        for reservation in reservations:
+            reservation.status = Reservation.Statuses.ROLLEDBACK
+
+
 class QuotaEngine(object):
     """Represent the set of recognized quotas."""
 
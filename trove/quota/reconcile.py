@@ -0,0 +1,122 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Corrects quota usages that drifted from the resources tenants have."""
+
+import datetime
+
+from trove.backup.models import DBBackup
+from trove.common import cfg
+from trove.common import exception
+from trove.common import utils
+from trove.db import get_db_api
+from trove.instance.models import DBInstance
+from trove.instance.tasks import InstanceTasks
+from trove.openstack.common import log as logging
+from trove.openstack.common.gettextutils import _
+from trove.quota.models import QuotaUsage
+from trove.quota.models import Reservation
+from trove.quota.models import Resource
+from trove.quota.quota import QUOTAS
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+
+def count_in_use():
+    """Counts what every tenant has with one GROUP BY query per table.
+
+    :returns: A dict of the amount in use keyed by (tenant_id, resource).
+    """
+    db_api = get_db_api()
+    in_use = {}
+    # Deleting an instance gives back its quota before its row is deleted.
+    for tenant_id, instances, volumes in db_api.aggregate(
+            DBInstance, ['tenant_id'], ['count', ('sum', 'volume_size')],
+            criteria=[DBInstance.task_id != InstanceTasks.DELETING.code],
+            deleted=False):
+        in_use[(tenant_id, Resource.INSTANCES)] = int(instances)
+        in_use[(tenant_id, Resource.VOLUMES)] = int(volumes)
+    for tenant_id, backups in db_api.aggregate(
+            DBBackup, ['tenant_id'], ['count'], deleted=False):
+        in_use[(tenant_id, Resource.BACKUPS)] = int(backups)
+    return in_use
+
+
+def reconcile_quota_usages():
+    """Recomputes the quota usages of all tenants and corrects them.
+
+    Reservations left reserved for longer than quota_reservation_expire
+    are rolled back first. Usages are read before what is in use is
+    counted, and each correction only applies to a usage still as it was
+    read, so a reservation made or settled meanwhile is never undone; the
+    usage is corrected on the next run instead. The in_use of a usage with
+    reservations in flight is left alone for the same reason.
+
+    :returns: A dict of the number of reservations expired and of usages
+              corrected and created.
+    """
+    db_api = get_db_api()
+    expire_before = utils.utcnow() - datetime.timedelta(
+        seconds=CONF.quota_reservation_expire)
+    expired = db_api.reservations_expire(expire_before)
+
+    usages = db_api.find_values(
+        QuotaUsage, ['id', 'tenant_id', 'resource', 'in_use', 'reserved'])
+    reserved = dict(db_api.aggregate(
+        Reservation, ['usage_id'], [('sum', 'delta')],
+        status=Reservation.Statuses.RESERVED))
+    in_use = count_in_use()
+
+    resources = set(QUOTAS.resources)
+    corrections = []
+    for usage_id, tenant_id, resource, old_in_use, old_reserved in usages:
+        new_in_use = in_use.pop((tenant_id, resource), 0)
+        new_reserved = int(reserved.get(usage_id, 0))
+        if resource not in resources:
+            continue
+        if new_reserved:
+            new_in_use = old_in_use
+        if (new_in_use, new_reserved) != (old_in_use, old_reserved):
+            corrections.append({'id': usage_id,
+                                'in_use': old_in_use,
+                                'reserved': old_reserved,
+                                'new_in_use': new_in_use,
+                                'new_reserved': new_reserved})
+
+    now = utils.utcnow()
+    missing = [{'id': utils.generate_uuid(), 'created': now, 'updated': now,
+                'tenant_id': tenant_id, 'resource': resource,
+                'in_use': count, 'reserved': 0}
+               for (tenant_id, resource), count in in_use.iteritems()
+               if count and resource in resources]
+
+    corrected = db_api.quota_usages_correct(corrections)
+    try:
+        db_api.bulk_insert(QuotaUsage, missing)
+    except exception.DBConstraintError:
+        # A reservation created some of them meanwhile.
+        LOG.exception(_("Failed to create missing quota usages, they will "
+                        "be created on the next run."))
+        missing = []
+
+    result = {'expired': expired,
+              'corrected': corrected,
+              'created': len(missing)}
+    LOG.info(_("Reconciled quota usages: %(expired)d reservations expired, "
+               "%(corrected)d usages corrected and %(created)d created.")
+             % result)
+    return result
@@ -107,6 +107,10 @@ class API(ManagerAPI):
         LOG.debug("Making async call to delete backup: %s" % backup_id)
         self._cast("delete_backup", backup_id=backup_id)
 
+    def update_guests(self, job_id):
+        LOG.debug("Making async call to run guest update job: %s" % job_id)
+        self._cast("update_guests", job_id=job_id)
+
     def create_instance(self, instance_id, name, flavor,
                         image_id, databases, users, service_type,
                         volume_size, security_groups, backup_id=None):
@@ -0,0 +1,206 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Keeps the compute server state of instances up to date from Nova's
+compute.instance.* notifications, so the API doesn't have to poll Nova.
+"""
+
+from trove.common import cfg
+from trove.common import utils
+from trove.db import get_db_api
+from trove.instance.models import DBInstance
+from trove.openstack.common import jsonutils
+from trove.openstack.common import log as logging
+from trove.openstack.common import timeutils
+from trove.openstack.common.gettextutils import _
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+EVENT_PREFIX = 'compute.instance.'
+
+# Maps Nova's vm_state, and the task_state where it matters, to the server
+# status reported by the Nova API.
+VM_STATE_TO_STATUS = {
+    'active': 'ACTIVE',
+    'building': 'BUILD',
+    'stopped': 'SHUTOFF',
+    'resized': 'VERIFY_RESIZE',
+    'paused': 'PAUSED',
+    'suspended': 'SUSPENDED',
+    'rescued': 'RESCUE',
+    'error': 'ERROR',
+    'deleted': 'DELETED',
+    'soft-delete': 'SOFT_DELETED',
+    'shelved': 'SHELVED',
+}
+
+TASK_STATE_TO_STATUS = {
+    'rebooting': 'REBOOT',
+    'reboot_pending': 'REBOOT',
+    'reboot_started': 'REBOOT',
+    'rebooting_hard': 'HARD_REBOOT',
+    'rebuilding': 'REBUILD',
+    'resize_prep': 'RESIZE',
+    'resize_migrating': 'RESIZE',
+    'resize_migrated': 'RESIZE',
+    'resize_finish': 'RESIZE',
+    'migrating': 'MIGRATING',
+}
+
+
+def server_status_from_payload(payload):
+    task_state = payload.get('new_task_state') or payload.get('task_state')
+    if payload.get('state') == 'active' and task_state:
+        status = TASK_STATE_TO_STATUS.get(task_state)
+        if status:
+            return status
+    return VM_STATE_TO_STATUS.get(payload.get('state'), 'UNKNOWN')
+
+
+def addresses_from_payload(payload):
+    """Builds a server's addresses dict, as Nova returns it, from the
+    fixed_ips of a notification payload."""
+    addresses = {}
+    for fixed_ip in payload['fixed_ips']:
+        label = fixed_ip.get('label')
+        addresses.setdefault(label, []).append(
+            {'addr': fixed_ip.get('address'),
+             'version': fixed_ip.get('version')})
+        for floating_ip in fixed_ip.get('floating_ips', []):
+            addresses[label].append(
+                {'addr': floating_ip.get('address'),
+                 'version': floating_ip.get('version')})
+    return addresses
+
+
+def _parse_timestamp(timestamp):
+    if not timestamp:
+        return utils.utcnow()
+    try:
+        return timeutils.parse_strtime(timestamp, '%Y-%m-%d %H:%M:%S.%f')
+    except ValueError:
+        try:
+            return timeutils.normalize_time(
+                timeutils.parse_isotime(timestamp))
+        except ValueError:
+            return utils.utcnow()
+
+
+class ComputeEventHandler(object):
+    """Buffers compute notifications and writes them to the instances table.
+
+    Only the latest event for each server is kept, and the buffer is
+    written with a single bulk update once it is full or flush is called.
+    Events older than what is already stored are ignored by the update.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or CONF.compute_notification_batch_size
+        self._pending = {}
+
+    def __call__(self, message):
+        event_type = message.get('event_type', '')
+        if not event_type.startswith(EVENT_PREFIX):
+            return
+        payload = message.get('payload') or {}
+        server_id = payload.get('instance_id')
+        if not server_id:
+            return
+        updated = _parse_timestamp(message.get('timestamp'))
+        pending = self._pending.get(server_id)
+        if pending and pending['server_updated'] > updated:
+            return
+        values = {'compute_instance_id': server_id,
+                  'server_status': server_status_from_payload(payload),
+                  'server_updated': updated}
+        if 'fixed_ips' in payload:
+            values['server_addresses'] = jsonutils.dumps(
+                addresses_from_payload(payload))
+        elif pending and 'server_addresses' in pending:
+            values['server_addresses'] = pending['server_addresses']
+        self._pending[server_id] = values
+        if len(self._pending) >= self.batch_size:
+            try:
+                self.flush()
+            except Exception:
+                # The states stay buffered for the next flush.
+                LOG.exception(_("Failed to store compute server states."))
+
+    def _requeue(self, rows):
+        """Buffers rows that could not be written again, unless a newer
+        event for their server came in meanwhile."""
+        for values in rows:
+            server_id = values['compute_instance_id']
+            pending = self._pending.get(server_id)
+            if pending is None:
+                self._pending[server_id] = values
+            elif ('server_addresses' not in pending and
+                    'server_addresses' in values):
+                pending['server_addresses'] = values['server_addresses']
+
+    def flush(self):
+        """Writes the buffered server states to the database.
+
+        If the write fails, whatever wasn't written is kept buffered and
+        the error is raised.
+        """
+        if not self._pending:
+            return 0
+        pending = self._pending.values()
+        self._pending = {}
+        # Rows are grouped by the columns they set so each group is one
+        # executemany.
+        groups = {}
+        for values in pending:
+            groups.setdefault(tuple(sorted(values)), []).append(values)
+        db_api = get_db_api()
+        unwritten = groups.values()
+        try:
+            while unwritten:
+                db_api.bulk_update(DBInstance, 'compute_instance_id',
+                                   unwritten[0], newer_than='server_updated')
+                unwritten.pop(0)
+        except Exception:
+            for rows in unwritten:
+                self._requeue(rows)
+            raise
+        LOG.debug(_("Stored the state of %d compute servers.") %
+                  len(pending))
+        return len(pending)
+
+
+class ComputeEventConsumer(object):
+    """Subscribes a ComputeEventHandler to Nova's notification topic."""
+
+    def __init__(self, handler=None):
+        self.handler = handler or ComputeEventHandler()
+
+    def start(self, connection):
+        LOG.info(_("Consuming compute notifications from %s on the %s "
+                   "exchange.") % (CONF.compute_notification_topic,
+                                   CONF.compute_notification_exchange))
+        connection.join_consumer_pool(
+            self.handler,
+            'trove-compute-events',
+            CONF.compute_notification_topic,
+            exchange_name=CONF.compute_notification_exchange)
+
+    def flush(self):
+        try:
+            return self.handler.flush()
+        except Exception:
+            LOG.exception(_("Failed to store compute server states."))
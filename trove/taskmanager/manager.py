@@ -16,12 +16,15 @@
 #    under the License.
 from trove.common.context import TroveContext
 
+import trove.extensions.mgmt.host.models as hostmodels
 import trove.extensions.mgmt.instances.models as mgmtmodels
 import trove.common.cfg as cfg
 from trove.common import exception
 from trove.openstack.common import log as logging
 from trove.openstack.common import importutils
 from trove.openstack.common import periodic_task
+from trove.quota import reconcile
+from trove.taskmanager import compute_events
 from trove.taskmanager import models
 from trove.taskmanager.models import FreshInstanceTasks
 
@@ -42,6 +45,19 @@ class Manager(periodic_task.PeriodicTasks):
             self.exists_transformer = importutils.import_object(
                 CONF.exists_notification_transformer,
                 context=self.admin_context)
+        self.compute_events = None
+        if CONF.server_state_from_notifications:
+            self.compute_events = compute_events.ComputeEventConsumer()
+
+    def initialize_service_hook(self, service):
+        if self.compute_events:
+            self.compute_events.start(service.conn)
+
+    @periodic_task.periodic_task
+    def flush_compute_events(self, context):
+        """Stores the compute server states buffered since the last run."""
+        if self.compute_events:
+            self.compute_events.flush()
 
     def resize_volume(self, context, instance_id, new_size):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
@@ -80,6 +96,9 @@ class Manager(periodic_task.PeriodicTasks):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
         instance_tasks.create_backup(backup_id)
 
+    def update_guests(self, context, job_id):
+        hostmodels.GuestUpdateJob.load(job_id).run(context)
+
     def create_instance(self, context, instance_id, name, flavor,
                         image_id, databases, users, service_type,
                         volume_size, security_groups, backup_id):
@@ -99,3 +118,10 @@ class Manager(periodic_task.PeriodicTasks):
             """
             mgmtmodels.publish_exist_events(self.exists_transformer,
                                             self.admin_context)
+
+    if CONF.quota_reconcile_ticks:
+        @periodic_task.periodic_task(
+            ticks_between_runs=CONF.quota_reconcile_ticks)
+        def reconcile_quota_usages(self, context):
+            """Corrects quota usages that drifted from what tenants have."""
+            reconcile.reconcile_quota_usages()
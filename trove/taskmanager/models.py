@@ -29,6 +29,7 @@ from trove.common.remote import create_dns_client
 from trove.common.remote import create_cinder_client
 from swiftclient.client import ClientException
 from trove.common.utils import poll_until
+from trove.flavor import models as flavor_models
 from trove.instance import models as inst_models
 from trove.instance.models import BuiltInstance
 from trove.instance.models import FreshInstance
@@ -67,7 +68,8 @@ class NotifyMixin(object):
 
         # Grab the instance size from the kwargs or from the nova client
         instance_size = kwargs.pop('instance_size', None)
-        flavor = self.nova_client.flavors.get(self.flavor_id)
+        flavor = flavor_models.get_flavor(self.context, self.flavor_id,
+                                          client=self.nova_client)
         server = kwargs.pop('server', None)
         if server is None:
             server = self.nova_client.servers.get(self.server_id)
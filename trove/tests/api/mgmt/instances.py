@@ -62,6 +62,7 @@ def volume_check(volume):
         check.has_element("id", basestring)
         check.has_element("size", int)
         check.has_element("used", float)
+        check.has_element("used_age", (int, None))
 
 
 @test(depends_on_groups=[GROUP_START], groups=[GROUP, GROUP_TEST])
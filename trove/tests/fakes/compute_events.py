@@ -0,0 +1,65 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""A replayable source of compute.instance.* notifications."""
+
+import datetime
+import uuid
+
+
+def compute_event(event_type, server_id, state, task_state=None,
+                  fixed_ips=None, timestamp=None):
+    """Builds a notification message shaped like the ones Nova sends."""
+    payload = {'instance_id': server_id,
+               'state': state,
+               'new_task_state': task_state}
+    if fixed_ips is not None:
+        payload['fixed_ips'] = fixed_ips
+    timestamp = timestamp or datetime.datetime.utcnow()
+    return {'message_id': str(uuid.uuid4()),
+            'event_type': 'compute.instance.%s' % event_type,
+            'publisher_id': 'compute.fake_host_1',
+            'priority': 'INFO',
+            'timestamp': str(timestamp),
+            'payload': payload}
+
+
+class FakeComputeEventSource(object):
+    """Records compute notifications and replays them to a consumer.
+
+    It stands in for the notification queue, so the same sequence of
+    events can be fed to any number of handlers.
+    """
+
+    def __init__(self, events=None):
+        self.events = list(events or [])
+
+    def add(self, event_type, server_id, state, **kwargs):
+        self.events.append(compute_event(event_type, server_id, state,
+                                         **kwargs))
+        return self
+
+    def join_consumer_pool(self, callback, pool_name, topic,
+                           exchange_name=None, ack_on_error=True):
+        # Lets the source be handed to a consumer in place of a connection.
+        self.callback = callback
+
+    def replay(self, handler=None):
+        handler = handler or self.callback
+        for event in self.events:
+            handler(event)
+        if hasattr(handler, 'flush'):
+            handler.flush()
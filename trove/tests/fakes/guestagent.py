@@ -60,7 +60,7 @@ class FakeGuest(object):
             'threads': 2
         }
 
-    def update_guest(self):
+    def update_guest(self, timeout=None):
         LOG.debug("Updating guest %s" % self.id)
         self.version += 1
 
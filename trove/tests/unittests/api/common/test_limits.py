@@ -18,13 +18,20 @@ Tests dealing with HTTP rate-limiting.
 """
 
 import httplib
+import os
+import shutil
+import socket
 import StringIO
+import tempfile
+import time
 from xml.dom import minidom
 from trove.quota.models import Quota
 import testtools
 import webob
 
+from mock import patch
 from mockito import when, mock, any
+from trove.common import exception
 from trove.common import limits
 from trove.common.limits import Limit
 from trove.limits import views
@@ -491,6 +498,118 @@ class LimiterTest(BaseLimitTestSuite):
         results = list(self._check(5, "PUT", "/anything", "user2"))
         self.assertEqual(expected, results)
 
+    def test_rules_indexed_by_verb(self):
+        rules = limits.Rules(TEST_LIMITS)
+        self.assertEqual([(0, TEST_LIMITS[0])],
+                         rules.matching("GET", "/delayed"))
+        self.assertEqual([], rules.matching("GET", "/anything"))
+        self.assertEqual([(1, TEST_LIMITS[1])],
+                         rules.matching("POST", "/anything"))
+
+    def test_idle_users_are_evicted(self):
+        backend = limits.MemoryLimiterBackend()
+        limiter = limits.Limiter(TEST_LIMITS, backend=backend)
+        limiter.check_for_delay("PUT", "/anything", "user1")
+        limiter.check_for_delay("PUT", "/anything", "user2")
+        self.assertEqual(2, len(backend))
+
+        self.update_limits(30.0)
+        limiter.check_for_delay("PUT", "/anything", "user2")
+        self.assertEqual(2, len(backend))
+
+        self.update_limits(60.0)
+        limiter.check_for_delay("PUT", "/anything", "user2")
+        self.assertEqual(1, len(backend))
+        self.assertEqual(10, limiter.get_limits("user1")[2]['remaining'])
+        self.assertEqual(9, limiter.get_limits("user2")[2]['remaining'])
+
+
+class SharedMemoryLimiterTest(BaseLimitTestSuite):
+    """
+    Tests for `limits.SharedMemoryLimiterBackend`, with limiters standing in
+    for the API workers of a host.
+    """
+
+    def setUp(self):
+        super(SharedMemoryLimiterTest, self).setUp()
+        for l in TEST_LIMITS:
+            when(l)._get_time().thenReturn(0.0)
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        self.path = os.path.join(state_dir, 'rate_limits')
+
+    def _limiter(self, slots=64):
+        backend = limits.SharedMemoryLimiterBackend(self.path, slots)
+        return limits.Limiter(TEST_LIMITS, backend=backend)
+
+    def test_workers_share_buckets(self):
+        worker1 = self._limiter()
+        worker2 = self._limiter()
+        for x in xrange(5):
+            self.assertEqual((None, None),
+                             worker1.check_for_delay("PUT", "/anything"))
+            self.assertEqual((None, None),
+                             worker2.check_for_delay("PUT", "/anything"))
+        delay, error = worker1.check_for_delay("PUT", "/anything")
+        self.assertEqual(6.0, delay)
+        self.assertEqual(0, worker2.get_limits()[2]['remaining'])
+
+    def test_users_have_own_buckets(self):
+        worker = self._limiter()
+        for x in xrange(10):
+            worker.check_for_delay("PUT", "/anything", "user1")
+        self.assertEqual((None, None),
+                         worker.check_for_delay("PUT", "/anything", "user2"))
+
+    def test_state_survives_restart(self):
+        worker = self._limiter()
+        worker.check_for_delay("GET", "/delayed")
+        delay, error = self._limiter().check_for_delay("GET", "/delayed")
+        self.assertEqual(60.0, delay)
+
+    def test_new_table_size_starts_empty(self):
+        worker = self._limiter()
+        worker.check_for_delay("GET", "/delayed")
+        resized = self._limiter(slots=128)
+        self.assertEqual((None, None),
+                         resized.check_for_delay("GET", "/delayed"))
+
+    def test_resizing_leaves_the_old_table_alone(self):
+        worker = self._limiter()
+        worker.check_for_delay("GET", "/delayed")
+        self._limiter(slots=16).check_for_delay("GET", "/delayed")
+        self.assertEqual(worker.backend.size,
+                         os.path.getsize(self.path + '.64'))
+        delay, error = worker.check_for_delay("GET", "/delayed")
+        self.assertEqual(60.0, delay)
+
+    def test_file_of_wrong_size_is_refused(self):
+        with open(self.path + '.64', 'w') as state_file:
+            state_file.write('x' * 100)
+        worker = self._limiter()
+        self.assertRaises(exception.TroveError,
+                          worker.check_for_delay, "GET", "/delayed")
+        self.assertEqual(100, os.path.getsize(self.path + '.64'))
+
+    def test_forked_worker_closes_inherited_file(self):
+        worker = self._limiter()
+        worker.check_for_delay("GET", "/delayed")
+        inherited = worker.backend._fd
+        # As if the worker had been forked from this process.
+        worker.backend._pid = -1
+        with patch.object(limits.os, 'close', wraps=os.close) as close:
+            delay, error = worker.check_for_delay("GET", "/delayed")
+        self.assertEqual(60.0, delay)
+        close.assert_called_once_with(inherited)
+
+    def test_full_table_evicts_oldest(self):
+        worker = self._limiter(slots=1)
+        worker.check_for_delay("GET", "/delayed", "user1")
+        self.assertEqual((None, None),
+                         worker.check_for_delay("GET", "/delayed", "user2"))
+        self.assertEqual((None, None),
+                         worker.check_for_delay("GET", "/delayed", "user1"))
+
 
 class WsgiLimiterTest(BaseLimitTestSuite):
     """
@@ -562,6 +681,29 @@ class WsgiLimiterTest(BaseLimitTestSuite):
         delay = self._request("GET", "/delayed", "user2")
         self.assertEqual(delay, '60.00')
 
+    def _skip_request(self, skipped):
+        request = webob.Request.blank("/", method="POST")
+        request.body = jsonutils.dumps({"verb": "PUT", "path": "/anything",
+                                        "skipped": skipped})
+        return request.get_response(self.app)
+
+    def test_negative_skipped_is_rejected(self):
+        self.assertEqual(400, self._skip_request(-1).status_int)
+
+    def test_skipped_is_capped_at_the_largest_limit(self):
+        calls = []
+        check_for_delay = self.app._limiter.check_for_delay
+
+        def counting_check_for_delay(*args):
+            calls.append(args)
+            return check_for_delay(*args)
+
+        self.app._limiter.check_for_delay = counting_check_for_delay
+        response = self._skip_request(10 ** 8)
+        self.assertEqual(403, response.status_int)
+        # The PUT limit allows 10 requests, plus the request itself.
+        self.assertEqual(11, len(calls))
+
 
 class FakeHttplibSocket(object):
     """
@@ -687,6 +829,104 @@ class WsgiLimiterProxyTest(BaseLimitTestSuite):
 
         self.assertEqual((delay, error), expected)
 
+    def _count_connections(self):
+        connections = []
+        connect = httplib.HTTPConnection
+
+        def counting_connect(*args, **kwargs):
+            connections.append(connect(*args, **kwargs))
+            return connections[-1]
+
+        httplib.HTTPConnection = counting_connect
+        return connections
+
+    def _fail_connections(self):
+        fake_connection = mock()
+        when(fake_connection).request(any(), any(), any(), any()).thenRaise(
+            socket.timeout("timed out"))
+        httplib.HTTPConnection = lambda *args, **kwargs: fake_connection
+
+    def test_connections_are_reused(self):
+        connections = self._count_connections()
+        for x in xrange(3):
+            self.proxy.check_for_delay("GET", "/anything")
+        self.assertEqual(1, len(connections))
+
+    def test_fail_open(self):
+        self._fail_connections()
+        proxy = limits.WsgiLimiterProxy("169.254.0.1:80", fail_open=True)
+        self.assertEqual((None, None),
+                         proxy.check_for_delay("GET", "/delayed"))
+
+    def test_fail_closed(self):
+        self._fail_connections()
+        proxy = limits.WsgiLimiterProxy("169.254.0.1:80", fail_open=False)
+        delay, error = proxy.check_for_delay("GET", "/delayed")
+        self.assertEqual(proxy.FAIL_CLOSED_DELAY, delay)
+
+    def test_pool_timeout_is_logged_by_name(self):
+        proxy = limits.WsgiLimiterProxy("169.254.0.1:80", pool_size=1,
+                                        timeout=0.01, fail_open=True)
+        proxy._pool.get()
+        with patch.object(limits.LOG, 'warning') as warning:
+            self.assertEqual((None, None),
+                             proxy.check_for_delay("GET", "/anything"))
+        self.assertIn("did not answer: Empty", warning.call_args[0][0])
+
+    def test_precheck_skips_remote_calls(self):
+        for l in TEST_LIMITS:
+            when(l)._get_time().thenReturn(0.0)
+        proxy = limits.WsgiLimiterProxy("169.254.0.1:80",
+                                        precheck_ratio=0.5)
+        for x in xrange(5):
+            self.assertEqual((None, None),
+                             proxy.check_for_delay("PUT", "/anything"))
+        # Only the first PUT was seen, leaving 9 of 10 and 4 to skip.
+        self.assertEqual(9, self.app._limiter.get_limits('')[2]['remaining'])
+
+        self.assertEqual((None, None),
+                         proxy.check_for_delay("PUT", "/anything"))
+        self.assertEqual(4, self.app._limiter.get_limits('')[2]['remaining'])
+
+    def _put_remaining(self):
+        return self.app._limiter.get_limits('')[2]['remaining']
+
+    def test_expired_credit_skips_are_charged(self):
+        for l in TEST_LIMITS:
+            when(l)._get_time().thenReturn(0.0)
+        proxy = limits.WsgiLimiterProxy("169.254.0.1:80",
+                                        precheck_ratio=0.5)
+        proxy._credits[(None, "PUT", "/anything")] = [time.time() + 60, 4]
+        for x in xrange(2):
+            proxy.check_for_delay("PUT", "/anything")
+        proxy._credits[(None, "PUT", "/anything")][0] = 0
+        # Another tenant's request sweeps out the expired credit.
+        proxy.check_for_delay("PUT", "/anything", username="other")
+        self.assertEqual(10, self._put_remaining())
+
+        proxy.check_for_delay("PUT", "/anything")
+        # The two skipped requests are charged along with this one.
+        self.assertEqual(7, self._put_remaining())
+
+    def test_skips_are_kept_when_the_limiter_fails(self):
+        for l in TEST_LIMITS:
+            when(l)._get_time().thenReturn(0.0)
+        proxy = limits.WsgiLimiterProxy("169.254.0.1:80",
+                                        precheck_ratio=0.5, fail_open=True)
+        proxy._credits[(None, "PUT", "/anything")] = [time.time() + 60, 1]
+        proxy.check_for_delay("PUT", "/anything")
+
+        connect = httplib.HTTPConnection
+        self._fail_connections()
+        self.assertEqual((None, None),
+                         proxy.check_for_delay("PUT", "/anything"))
+        httplib.HTTPConnection = connect
+        self.assertEqual(10, self._put_remaining())
+
+        proxy.check_for_delay("PUT", "/anything")
+        # The skip the failed request couldn't report is charged now.
+        self.assertEqual(8, self._put_remaining())
+
     def tearDown(self):
         # restore original HTTPConnection object
         httplib.HTTPConnection = self.oldHTTPConnection
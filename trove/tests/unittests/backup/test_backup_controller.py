@@ -13,11 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+import datetime
+
 import jsonschema
 from testtools import TestCase
 from testtools.matchers import Equals
 from trove.backup.service import BackupController
+from trove.backup.service import list_filters
 from trove.common import apischema
+from trove.common import exception
 
 
 class TestBackupController(TestCase):
@@ -41,3 +45,23 @@ class TestBackupController(TestCase):
         self.assertThat(errors[0].message,
                         Equals("'%s' does not match '%s'" %
                                (invalid_uuid, apischema.uuid['pattern'])))
+
+
+class TestBackupListFilters(TestCase):
+    def test_no_filters(self):
+        self.assertThat(list_filters({}), Equals({}))
+
+    def test_filters(self):
+        filters = list_filters({'state': 'completed',
+                                'created_since': '2013-06-01T12:00:00+02:00'})
+        self.assertThat(filters, Equals({
+            'state': 'COMPLETED',
+            'created_since': datetime.datetime(2013, 6, 1, 10, 0)}))
+
+    def test_invalid_state(self):
+        self.assertRaises(exception.BadRequest, list_filters,
+                          {'state': 'EXPLODED'})
+
+    def test_invalid_created_since(self):
+        self.assertRaises(exception.BadRequest, list_filters,
+                          {'created_since': 'yesterday'})
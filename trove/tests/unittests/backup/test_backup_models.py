@@ -12,6 +12,8 @@
 #limitations under the License.
 
 
+import datetime
+
 import testtools
 from trove.backup import models
 from trove.tests.unittests.util import util
@@ -177,6 +179,14 @@ class BackupORMTest(testtools.TestCase):
                                             exclude=self.backup.id)
         self.assertFalse(not_running)
 
+    def test_running_instance_ids(self):
+        running = models.Backup.running_instance_ids(
+            [self.instance_id, 'non-existent'])
+        self.assertEqual(set([self.instance_id]), running)
+
+    def test_running_instance_ids_empty(self):
+        self.assertEqual(set(), models.Backup.running_instance_ids([]))
+
     def test_is_running(self):
         self.assertTrue(self.backup.is_running)
 
@@ -214,3 +224,95 @@ class BackupORMTest(testtools.TestCase):
 
     def test_filename(self):
         self.assertEqual(BACKUP_FILENAME, self.backup.filename)
+
+
+class BackupPaginationTest(testtools.TestCase):
+    def setUp(self):
+        super(BackupPaginationTest, self).setUp()
+        util.init_db()
+        self.context, self.instance_id = _prep_conf(utils.utcnow())
+        created = datetime.datetime(2013, 1, 1)
+        self.backups = []
+        # Two backups share each created time so the id breaks the ties.
+        for i in range(5):
+            backup = models.DBBackup.create(tenant_id=self.context.tenant,
+                                            name='%s-%d' % (BACKUP_NAME, i),
+                                            state=BACKUP_STATE,
+                                            instance_id=self.instance_id,
+                                            deleted=False)
+            backup.created = created + datetime.timedelta(minutes=i / 2)
+            self.backups.append(backup.save())
+        self.backups.sort(key=lambda backup: (backup.created, backup.id))
+
+    def tearDown(self):
+        super(BackupPaginationTest, self).tearDown()
+        for backup in self.backups:
+            backup.delete()
+
+    def _page(self, limit, marker=None):
+        self.context.limit = limit
+        self.context.marker = marker
+        return models.Backup.paginate(self.context,
+                                      models.Backup.list(self.context))
+
+    def test_walks_pages_in_created_order(self):
+        ids = []
+        marker = None
+        for page_count in range(1, 4):
+            page, marker = self._page(2, marker)
+            ids.extend(backup.id for backup in page)
+            if marker is None:
+                break
+        self.assertEqual(3, page_count)
+        self.assertEqual([backup.id for backup in self.backups], ids)
+
+    def test_last_page_has_no_marker(self):
+        page, marker = self._page(5)
+        self.assertEqual(5, len(page))
+        self.assertEqual(None, marker)
+
+    def test_invalid_marker(self):
+        self.assertRaises(exception.BadRequest, self._page, 2, 'not-a-marker')
+
+    def test_descending_order(self):
+        query = models.Backup.list(self.context)
+        page, marker = query.paginated_collection(
+            limit=3, sort_keys=['created', 'id'], sort_dir='desc')
+        rest, _ = query.paginated_collection(
+            limit=3, marker=marker, sort_keys=['created', 'id'],
+            sort_dir='desc')
+        self.assertEqual([backup.id for backup in reversed(self.backups)],
+                         [backup.id for backup in page + rest])
+
+    def test_filter_by_state(self):
+        self.backups[0].state = models.BackupState.COMPLETED
+        self.backups[0].save()
+        backups = models.Backup.list(self.context,
+                                     state=models.BackupState.COMPLETED)
+        self.assertEqual([self.backups[0].id],
+                         [backup.id for backup in backups])
+
+    def test_filter_by_created_since(self):
+        since = datetime.datetime(2013, 1, 1, 0, 1)
+        backups = models.Backup.list(self.context, created_since=since)
+        self.assertEqual(3, backups.count())
+        backups = models.Backup.list_for_instance(self.instance_id,
+                                                  created_since=since)
+        self.assertEqual(3, backups.count())
+
+    def test_filter_by_instance(self):
+        self.assertEqual(5, models.Backup.list(
+            self.context, instance_id=self.instance_id).count())
+        self.assertEqual(0, models.Backup.list(
+            self.context, instance_id='other-instance').count())
+
+    def test_filtered_pages(self):
+        self.context.limit = 2
+        query = models.Backup.list(
+            self.context, created_since=datetime.datetime(2013, 1, 1, 0, 1))
+        page, marker = models.Backup.paginate(self.context, query)
+        self.context.marker = marker
+        rest, marker = models.Backup.paginate(self.context, query)
+        self.assertEqual([backup.id for backup in self.backups[2:]],
+                         [backup.id for backup in page + rest])
+        self.assertEqual(None, marker)
@@ -0,0 +1,83 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+from mockito import when, unstub
+from testtools import TestCase
+
+from trove.common import cache
+
+
+class MemoryBackendTest(TestCase):
+
+    def tearDown(self):
+        super(MemoryBackendTest, self).tearDown()
+        unstub()
+
+    def test_get_and_set(self):
+        backend = cache.MemoryBackend('test')
+        backend.set('a', 1, 10)
+        self.assertEqual(1, backend.get('a'))
+        self.assertEqual(None, backend.get('b'))
+
+    def test_expired_entry(self):
+        backend = cache.MemoryBackend('test')
+        when(time).time().thenReturn(100)
+        backend.set('a', 1, 10)
+        when(time).time().thenReturn(111)
+        self.assertEqual(None, backend.get('a'))
+
+    def test_evicts_least_recently_used(self):
+        backend = cache.MemoryBackend('test', max_size=2)
+        backend.set('a', 1, 10)
+        backend.set('b', 2, 10)
+        backend.get('a')
+        backend.set('c', 3, 10)
+        self.assertEqual(1, backend.get('a'))
+        self.assertEqual(None, backend.get('b'))
+        self.assertEqual(3, backend.get('c'))
+
+
+class TTLCacheTest(TestCase):
+
+    def test_counts_hits_and_misses(self):
+        ttl_cache = cache.TTLCache('test', 10)
+        self.assertEqual(None, ttl_cache.get('a'))
+        ttl_cache.set('a', 1)
+        self.assertEqual(1, ttl_cache.get('a'))
+        self.assertEqual({'name': 'test', 'hits': 1, 'misses': 1},
+                         ttl_cache.stats())
+
+    def test_not_found(self):
+        ttl_cache = cache.TTLCache('test', 10)
+        ttl_cache.set_not_found('a')
+        self.assertEqual(cache.TTLCache.NOT_FOUND, ttl_cache.get('a'))
+
+    def test_negative_caching_disabled(self):
+        ttl_cache = cache.TTLCache('test', 10, negative_ttl=0)
+        ttl_cache.set_not_found('a')
+        self.assertEqual(None, ttl_cache.get('a'))
+
+    def test_invalidate(self):
+        ttl_cache = cache.TTLCache('test', 10)
+        ttl_cache.set('a', 1)
+        ttl_cache.invalidate('a')
+        self.assertEqual(None, ttl_cache.get('a'))
+
+    def test_disabled(self):
+        ttl_cache = cache.TTLCache('test', 0)
+        ttl_cache.set('a', 1)
+        self.assertEqual(None, ttl_cache.get('a'))
+        self.assertEqual(0, ttl_cache.misses)
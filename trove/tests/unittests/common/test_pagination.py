@@ -0,0 +1,39 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from testtools import TestCase
+
+from trove.common import exception
+from trove.common import pagination
+
+
+class MarkerTest(TestCase):
+
+    def test_round_trip(self):
+        created = datetime.datetime(2013, 6, 1, 12, 30, 15, 123)
+        marker = pagination.encode_marker([created, 'id-1'])
+        self.assertEqual(['2013-06-01T12:30:15.000123', 'id-1'],
+                         pagination.decode_marker(marker))
+
+    def test_marker_is_url_safe(self):
+        marker = pagination.encode_marker(['?' * 10, '/' * 10])
+        self.assertFalse('/' in marker or '+' in marker)
+
+    def test_invalid_marker(self):
+        self.assertRaises(exception.BadRequest, pagination.decode_marker,
+                          'not-a-marker')
+        self.assertRaises(exception.BadRequest, pagination.decode_marker,
+                          pagination.encode_marker({'id': 1}))
@@ -212,3 +212,56 @@ class TestRemote(testtools.TestCase):
         self.assertThat(obj_resp[1], Is('updated-object-contents'))
         # ensure object count has not increased
         self.assertThat(len(conn.get_container('new-container')[1]), Is(1))
+
+
+class TestClientCache(testtools.TestCase):
+
+    def setUp(self):
+        super(TestClientCache, self).setUp()
+        remote.get_client_cache().clear()
+        self.context = TroveContext(user='user', auth_token='token',
+                                    tenant='123')
+
+    def tearDown(self):
+        super(TestClientCache, self).tearDown()
+        remote.get_client_cache().clear()
+
+    def test_nova_client_is_reused(self):
+        client = remote.nova_client(self.context)
+        self.assertIs(client, remote.nova_client(self.context))
+        self.assertIs(remote.get_http_adapter(),
+                      client.client.http.get_adapter('https://'))
+
+    def test_new_token_gets_new_client(self):
+        client = remote.nova_client(self.context)
+        other = TroveContext(user='user', auth_token='token2', tenant='123')
+        self.assertIsNot(client, remote.nova_client(other))
+        self.assertIsNot(client, remote.cinder_client(self.context))
+
+    def test_admin_client_is_not_shared(self):
+        self.addCleanup(setattr, remote, 'create_nova_client',
+                        remote.create_nova_client)
+        remote.create_nova_client = remote.nova_client
+        client = remote.nova_client(self.context)
+        admin = remote.create_admin_nova_client(self.context)
+        self.assertIsNot(client, admin)
+        self.assertIsNone(admin.client.auth_token)
+        self.assertEqual('token', client.client.auth_token)
+
+    def test_pool_stats(self):
+        remote.nova_client(self.context)
+        remote.nova_client(self.context)
+        stats = remote.pool_stats()
+        self.assertTrue(stats['hits'] >= 1)
+        self.assertTrue('checkouts' in stats)
+        self.assertTrue('waits' in stats)
+
+    def test_checkouts_are_counted(self):
+        adapter = remote.CountingHTTPAdapter(1)
+        adapter.get_connection('http://localhost:8774/v2')
+        self.assertEqual(1, adapter.checkouts)
+        self.assertEqual(0, adapter.waits)
+        conn_pool = adapter.get_connection('http://localhost:8774/v2')
+        conn_pool.pool.get()
+        adapter.get_connection('http://localhost:8774/v2')
+        self.assertEqual(1, adapter.waits)
@@ -0,0 +1,134 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import webob
+from testtools import TestCase
+
+from trove.common import wsgi
+from trove.versions import Version
+
+INSTANCE = {
+    'id': 'a5e1b4bf-7b0d-4b1a-8b0d-3c2e2c1c5b1f',
+    'name': 'db & "friends" <1>',
+    'status': 'ACTIVE',
+    'created': '2013-05-08T22:43:34',
+    'updated': '2013-05-08T22:43:34',
+    'hostname': 'e09ad9a3f73309469cf1f43d11e79549caf9acf2.example.com',
+    'flavor': {
+        'id': '8',
+        'links': [{'href': 'https://localhost/v1.0/1234/flavors/8',
+                   'rel': 'self'},
+                  {'href': 'https://localhost/flavors/8',
+                   'rel': 'bookmark'}],
+    },
+    'volume': {'size': 2, 'used': 0.17},
+    'links': [{'href': 'https://localhost/v1.0/1234/instances/a5e1',
+               'rel': 'self'}],
+    'databases': [],
+    'deleted': False,
+}
+
+
+class XMLStreamingCompatibilityTest(TestCase):
+    """The streamed XML has to match the minidom document byte for byte."""
+
+    def assertSameXML(self, data, serializer=None):
+        serializer = serializer or wsgi.TroveXMLDictSerializer()
+        expected = serializer.serialize(data)
+        streamed = ''.join(serializer.iter_serialize(data))
+        self.assertEqual(expected, streamed)
+
+    def test_instance(self):
+        self.assertSameXML({'instance': INSTANCE})
+
+    def test_instance_list_with_links(self):
+        instances = [dict(INSTANCE, id=str(i)) for i in range(50)]
+        self.assertSameXML({
+            'instances': instances,
+            'links': [{'href': 'https://localhost/v1.0/1234/instances?'
+                               'limit=50&marker=49',
+                       'rel': 'next'}]})
+
+    def test_users_and_databases(self):
+        self.assertSameXML({'users': [
+            {'name': 'user1', 'host': '%',
+             'databases': [{'name': 'db1'}, {'name': 'db2'}]},
+            {'name': 'user2', 'host': '10.0.0.1', 'databases': []}]})
+        self.assertSameXML({'databases': [{'name': 'db1'}]})
+
+    def test_atoms_and_empty_nodes(self):
+        self.assertSameXML({'root': {'empty': {}, 'list': [],
+                                     'none': None, 'text': '',
+                                     'number': 10}})
+        self.assertSameXML({'root': 'just text'})
+        self.assertSameXML({'root': 'text', 'links': []})
+
+    def test_object_with_to_xml(self):
+        version = Version('v1.0', 'CURRENT', '2012-08-01T00:00:00Z',
+                          'http://localhost/')
+        self.assertSameXML({'version': version})
+        self.assertSameXML({'version': version,
+                            'links': [{'href': 'http://localhost/',
+                                       'rel': 'self'}]})
+
+    def test_collections_metadata(self):
+        metadata = {'plurals': {'flavors': 'flavor_item'},
+                    'list_collections': {'ids': {'item_name': 'id',
+                                                 'item_key': 'value'}},
+                    'dict_collections': {'metadata': {'item_name': 'meta',
+                                                      'item_key': 'key'}},
+                    'xmlns': 'http://example.com/ns'}
+        serializer = wsgi.TroveXMLDictSerializer(metadata=metadata)
+        self.assertSameXML({'root': {'flavors': [{'name': 'small'}],
+                                     'ids': [1, 2],
+                                     'metadata': {'a': '<1>', 'b': 2}}},
+                           serializer)
+
+    def test_chunked(self):
+        serializer = wsgi.TroveXMLDictSerializer()
+        serializer.STREAM_CHUNK_SIZE = 256
+        data = {'instances': [dict(INSTANCE, id=str(i)) for i in range(20)]}
+        chunks = list(serializer.iter_serialize(data))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(serializer.serialize(data), ''.join(chunks))
+
+    def test_bad_root_fails_before_streaming(self):
+        serializer = wsgi.TroveXMLDictSerializer()
+        self.assertRaises(RuntimeError, serializer.iter_serialize,
+                          {'a': 1, 'b': 2})
+        self.assertRaises(RuntimeError, serializer.iter_serialize,
+                          {'links': []})
+
+
+class TroveResponseSerializerTest(TestCase):
+
+    def setUp(self):
+        super(TroveResponseSerializerTest, self).setUp()
+        self.xml_serializer = wsgi.TroveXMLDictSerializer()
+        self.serializer = wsgi.TroveResponseSerializer(
+            body_serializers={'application/xml': self.xml_serializer})
+
+    def test_xml_body_is_streamed(self):
+        data = {'instance': INSTANCE}
+        response = webob.Response()
+        self.serializer.serialize_body(response, wsgi.Result(data),
+                                       'application/xml', 'show')
+        self.assertEqual('application/xml', response.content_type)
+        self.assertEqual(self.xml_serializer.serialize(data), response.body)
+
+    def test_json_body(self):
+        response = webob.Response()
+        self.serializer.serialize_body(response, wsgi.Result({'a': 1}),
+                                       'application/json', 'show')
+        self.assertEqual('{"a": 1}', response.body)
@@ -0,0 +1,118 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from mockito import mock, when, verify, unstub, never
+from novaclient import exceptions as nova_exceptions
+from novaclient.v1_1.flavors import Flavor as NovaFlavor
+from testtools import TestCase
+
+from trove.common import exception
+from trove.common.context import TroveContext
+from trove.flavor import models
+
+
+class FlavorCacheTest(TestCase):
+
+    def setUp(self):
+        super(FlavorCacheTest, self).setUp()
+        self.context = TroveContext(tenant='tenant_1')
+        self.client = mock()
+        self.client.flavors = mock()
+        when(models).create_nova_client(self.context).thenReturn(self.client)
+        models.get_flavor_cache().clear()
+
+    def tearDown(self):
+        super(FlavorCacheTest, self).tearDown()
+        unstub()
+        models.get_flavor_cache().clear()
+
+    def _flavor(self, id, ram=512, public=None):
+        info = {'id': id, 'name': 'flavor_%s' % id, 'ram': ram}
+        if public is not None:
+            info['os-flavor-access:is_public'] = public
+        return NovaFlavor(self.client.flavors, info, loaded=True)
+
+    def _other_tenant(self):
+        context = TroveContext(tenant='tenant_2')
+        client = mock()
+        client.flavors = mock()
+        when(models).create_nova_client(context).thenReturn(client)
+        return context, client
+
+    def test_miss_prefetches_the_list(self):
+        when(self.client.flavors).list().thenReturn([self._flavor('1'),
+                                                     self._flavor('2')])
+
+        self.assertEqual('flavor_1', models.get_flavor(self.context, 1).name)
+        self.assertEqual(512, models.get_flavor(self.context, '2').ram)
+
+        verify(self.client.flavors, times=1).list()
+        verify(self.client.flavors, never).get('1')
+
+    def test_unlisted_flavor_is_fetched(self):
+        when(self.client.flavors).list().thenReturn([])
+        when(self.client.flavors).get('3').thenReturn(self._flavor('3'))
+
+        models.get_flavor(self.context, '3')
+        models.get_flavor(self.context, '3')
+
+        verify(self.client.flavors, times=1).get('3')
+
+    def test_missing_flavor_is_remembered(self):
+        when(self.client.flavors).list().thenReturn([])
+        when(self.client.flavors).get('4').thenRaise(
+            nova_exceptions.NotFound(404))
+
+        self.assertRaises(nova_exceptions.NotFound, models.get_flavor,
+                          self.context, '4')
+        self.assertRaises(exception.NotFound, models.Flavor,
+                          context=self.context, flavor_id='4')
+        verify(self.client.flavors, times=1).get('4')
+
+    def test_listing_fills_the_cache(self):
+        when(self.client.flavors).list().thenReturn([self._flavor('5')])
+        models.Flavors(self.context)
+        models.get_flavor(self.context, '5')
+        verify(self.client.flavors, times=1).list()
+
+    def test_flush(self):
+        when(self.client.flavors).list().thenReturn([self._flavor('6')])
+        models.get_flavor(self.context, '6')
+        models.get_flavor_cache().clear()
+        models.get_flavor(self.context, '6')
+        verify(self.client.flavors, times=2).list()
+
+    def test_private_flavors_are_not_shared(self):
+        owner_flavors = [self._flavor('7', public=True),
+                         self._flavor('8', public=False)]
+        when(self.client.flavors).list().thenReturn(owner_flavors)
+        other_context, other_client = self._other_tenant()
+        when(other_client.flavors).list().thenReturn([owner_flavors[0]])
+        when(other_client.flavors).get('8').thenRaise(
+            nova_exceptions.NotFound(404))
+
+        # The owner's lookup must not let the other tenant see the flavor.
+        self.assertEqual('flavor_8', models.get_flavor(self.context, '8').name)
+        self.assertRaises(nova_exceptions.NotFound, models.get_flavor,
+                          other_context, '8')
+        verify(other_client.flavors, times=1).get('8')
+
+        # Nor may the other tenant's miss hide it from the owner.
+        self.assertEqual('flavor_8', models.get_flavor(self.context, '8').name)
+        verify(self.client.flavors, times=2).list()
+
+        # Public flavors are still shared.
+        self.assertEqual('flavor_7',
+                         models.get_flavor(other_context, '7').name)
+        verify(other_client.flavors, times=1).list()
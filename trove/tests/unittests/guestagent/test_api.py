@@ -41,6 +41,7 @@ class ApiTest(testtools.TestCase):
     def tearDown(self):
         super(ApiTest, self).tearDown()
         unstub()
+        agent_models.get_heartbeat_cache().clear()
 
     def test_delete_queue(self):
         self.skipTest("find out if this delete_queue function is needed "
@@ -75,6 +76,22 @@ class ApiTest(testtools.TestCase):
         when(agent_models.AgentHeartBeat).is_active(any()).thenReturn(False)
         self.assertRaises(exception.GuestTimeout, self.api._check_for_hearbeat)
 
+    def test_check_for_heartbeat_cached(self):
+        when(db_models.DatabaseModelBase).find_by(
+            instance_id=any()).thenReturn('agent')
+        when(agent_models.AgentHeartBeat).is_active('agent').thenReturn(True)
+        self.assertTrue(self.api._check_for_hearbeat())
+        self.assertTrue(self.api._check_for_hearbeat())
+        verify(db_models.DatabaseModelBase, times=1).find_by(
+            instance_id=any())
+
+    def test_call_fails_fast_on_stale_agent(self):
+        when(db_models.DatabaseModelBase).find_by(
+            instance_id=any()).thenReturn('agent')
+        when(agent_models.AgentHeartBeat).is_active(any()).thenReturn(False)
+        self.assertRaises(exception.GuestTimeout, self.api.list_users)
+        verify(rpc, never).call(any(), any(), any(), any(int))
+
     def test_create_user(self):
         exp_msg = RpcMsgMatcher('create_user', 'users')
         self._mock_rpc_cast(exp_msg)
@@ -104,6 +121,7 @@ class ApiTest(testtools.TestCase):
                                 'include_marker')
         when(rpc).call(any(), any(), exp_msg, any(int)).thenRaise(
             IOError('host down'))
+        self._mock_heartbeat()
 
         with testtools.ExpectedException(exception.GuestError,
                                          'An error occurred.*'):
@@ -266,9 +284,13 @@ class ApiTest(testtools.TestCase):
         verifyZeroInteractions(mock_conn)
         verify(rpc, never).cast(any(), any(), exp_msg)
 
+    def _mock_heartbeat(self):
+        when(self.api)._check_for_hearbeat().thenReturn(True)
+
     def _mock_rpc_call(self, exp_msg, resp=None):
         rpc.common = mock()
         when(rpc).call(any(), any(), exp_msg, any(int)).thenReturn(resp)
+        self._mock_heartbeat()
 
     def _verify_rpc_call(self, exp_msg):
         verify(rpc).call(any(), any(), exp_msg, any(int))
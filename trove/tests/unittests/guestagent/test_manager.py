@@ -24,6 +24,8 @@ from trove.common.context import TroveContext
 
 from trove.guestagent.manager.mysql import Manager
 import trove.guestagent.manager.mysql_service as dbaas
+from trove.guestagent import dbaas as guest_dbaas
+from trove.guestagent.models import VolumeUsage
 from trove.guestagent import backup
 from trove.guestagent.volume import VolumeDevice
 
@@ -64,6 +66,31 @@ class GuestAgentManagerTest(testtools.TestCase):
         verify(dbaas.MySqlAppStatus).get()
         verify(mock_status).update()
 
+    def test_publish_heartbeat(self):
+        self.manager._heartbeat = mock()
+        self.manager.publish_heartbeat(self.context)
+        verify(self.manager._heartbeat).beat()
+
+    def test_update_status_reports_volume_usage(self):
+        mock_status = mock()
+        stats = {'used': 1.5, 'total': 2048, 'free': 512}
+        when(dbaas.MySqlAppStatus).get().thenReturn(mock_status)
+        when(guest_dbaas).get_filesystem_volume_stats(any()).thenReturn(
+            stats)
+        when(VolumeUsage).report(any(), any()).thenReturn(None)
+        self.manager.update_status(self.context)
+        verify(VolumeUsage).report(any(), stats)
+
+    def test_update_status_without_volume(self):
+        mock_status = mock()
+        when(dbaas.MySqlAppStatus).get().thenReturn(mock_status)
+        when(guest_dbaas).get_filesystem_volume_stats(any()).thenRaise(
+            RuntimeError("Filesystem not found"))
+        when(VolumeUsage).report(any(), any()).thenReturn(None)
+        self.manager.update_status(self.context)
+        verify(mock_status).update()
+        verify(VolumeUsage, never).report(any(), any())
+
     def test_create_database(self):
         when(dbaas.MySqlAdmin).create_database(['db1']).thenReturn(None)
         self.manager.create_database(self.context, ['db1'])
@@ -12,6 +12,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 import testtools
 from mock import Mock, MagicMock
 from trove.guestagent import models
@@ -66,3 +68,43 @@ class AgentHeartBeatTest(testtools.TestCase):
         mock = models.AgentHeartBeat()
         models.AgentHeartBeat.__setitem__(mock, 'updated_at', datetime.now())
         self.assertTrue(models.AgentHeartBeat.is_active(mock))
+
+
+class HeartBeatWriterTest(testtools.TestCase):
+    def setUp(self):
+        super(HeartBeatWriterTest, self).setUp()
+        self.origin_get_by = models.AgentHeartBeat.get_by
+        self.origin_create = models.AgentHeartBeat.create
+        self.origin_time = time.time
+        self.heartbeat = Mock()
+        models.AgentHeartBeat.get_by = Mock(return_value=self.heartbeat)
+        models.AgentHeartBeat.create = Mock()
+        self.writer = models.HeartBeatWriter('instance-1', interval=20)
+
+    def tearDown(self):
+        super(HeartBeatWriterTest, self).tearDown()
+        models.AgentHeartBeat.get_by = self.origin_get_by
+        models.AgentHeartBeat.create = self.origin_create
+        time.time = self.origin_time
+
+    def test_first_beat_creates_heartbeat(self):
+        models.AgentHeartBeat.get_by = Mock(return_value=None)
+        self.assertTrue(self.writer.beat())
+        models.AgentHeartBeat.create.assert_called_once_with(
+            instance_id='instance-1')
+
+    def test_beats_are_coalesced(self):
+        time.time = Mock(return_value=100)
+        self.assertTrue(self.writer.beat())
+        time.time = Mock(return_value=110)
+        self.assertFalse(self.writer.beat())
+        time.time = Mock(return_value=121)
+        self.assertTrue(self.writer.beat())
+        self.assertEqual(2, self.heartbeat.save.call_count)
+        self.assertEqual(1, models.AgentHeartBeat.get_by.call_count)
+
+    def test_failed_write_is_retried(self):
+        self.heartbeat.save = Mock(side_effect=Exception("db down"))
+        self.assertFalse(self.writer.beat())
+        self.heartbeat.save = Mock()
+        self.assertTrue(self.writer.beat())
@@ -18,6 +18,7 @@ from testtools import TestCase
 from testtools.matchers import Is, Equals
 from testtools.testcase import skip
 from trove.common import apischema
+from trove.common import exception
 from trove.instance.service import InstanceController
 
 
@@ -215,3 +216,19 @@ class TestInstanceController(TestCase):
         self.assertFalse(validator.is_valid(body))
         errors = sorted(validator.iter_errors(body), key=lambda e: e.path)
         self.verify_errors(errors, ["'' is too short"], ["flavorRef"])
+
+    def test_validator_is_cached(self):
+        schema = self.controller.get_schema('action', {'restart': {}})
+        validator = self.controller.get_validator(schema)
+        self.assertThat(self.controller.get_validator(schema), Is(validator))
+        self.assertThat(InstanceController().get_validator(schema),
+                        Is(validator))
+
+    def test_compile_validators(self):
+        self.assertThat(InstanceController.compile_validators(), Equals(4))
+
+    def test_validate_request_invalid(self):
+        body = {"resize": {"volume": {"size": "a"}}}
+        self.assertRaises(exception.BadRequest,
+                          self.controller.validate_request,
+                          'action', {'body': body})
@@ -0,0 +1,502 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import datetime
+import eventlet
+
+from mock import patch
+from mockito import mock, when, verify, unstub, any, never
+from novaclient import exceptions as nova_exceptions
+from testtools import TestCase
+from testtools.matchers import Equals, Is, LessThan
+
+from trove.backup.models import Backup
+from trove.common import cache
+from trove.common import cfg
+from trove.common import exception
+from trove.common import pagination
+from trove.common import utils
+from trove.common.context import TroveContext
+from trove.db.models import DatabaseModelBase
+from trove.guestagent.models import VolumeUsage
+from trove.instance import models
+from trove.instance.models import create_server_list_matcher
+from trove.instance.models import DBInstance
+from trove.instance.models import InstanceServiceStatus
+from trove.instance.models import Instances
+from trove.instance.models import ServiceStatuses
+from trove.instance.tasks import InstanceTasks
+from trove.tests.unittests.util import util
+
+CONF = cfg.CONF
+
+
+class FakeServer(object):
+    def __init__(self, id, status='ACTIVE', addresses=None):
+        self.id = id
+        self.status = status
+        self.addresses = addresses or {}
+
+
+class ServerListMatcherTest(TestCase):
+
+    def test_find_server(self):
+        servers = [FakeServer('compute-1'), FakeServer('compute-2')]
+        find_server = create_server_list_matcher(servers)
+        self.assertThat(find_server('1', 'compute-2'), Is(servers[1]))
+
+    def test_find_missing_server(self):
+        find_server = create_server_list_matcher([FakeServer('compute-1')])
+        self.assertRaises(exception.ComputeInstanceNotFound,
+                          find_server, '2', 'compute-2')
+
+    def test_find_duplicate_server(self):
+        servers = [FakeServer('compute-1'), FakeServer('compute-1'),
+                   FakeServer('compute-2')]
+        find_server = create_server_list_matcher(servers)
+        self.assertRaises(exception.TroveError,
+                          find_server, '1', 'compute-1')
+        self.assertThat(find_server('2', 'compute-2'), Is(servers[2]))
+
+    def test_empty_server_list(self):
+        find_server = create_server_list_matcher(None)
+        self.assertRaises(exception.ComputeInstanceNotFound,
+                          find_server, '1', 'compute-1')
+
+    def test_large_server_list_is_scanned_once(self):
+        # Matching every instance of a large server fleet used to rescan
+        # the list for each instance; the index reads each server once.
+        count = 1000
+        reads = []
+
+        class CountingServer(FakeServer):
+            @property
+            def id(self):
+                reads.append(self._id)
+                return self._id
+
+            @id.setter
+            def id(self, value):
+                self._id = value
+
+        servers = [CountingServer('compute-%d' % i) for i in range(count)]
+        find_server = create_server_list_matcher(servers)
+        for i in range(count):
+            # The mgmt listing matches each instance twice.
+            find_server(str(i), 'compute-%d' % i)
+            found = find_server(str(i), 'compute-%d' % i)
+        self.assertThat(found, Is(servers[-1]))
+        self.assertThat(len(reads), LessThan(3 * count))
+
+
+class InstancesLoadTest(TestCase):
+
+    def setUp(self):
+        super(InstancesLoadTest, self).setUp()
+        self.context = TroveContext(tenant='tenant_1')
+        self.client = mock()
+        self.client.servers = mock()
+        when(models).create_nova_client(self.context).thenReturn(self.client)
+
+    def tearDown(self):
+        super(InstancesLoadTest, self).tearDown()
+        unstub()
+
+    def _db_instance(self, id, task_status=InstanceTasks.NONE):
+        return DBInstance(task_status,
+                          created='xyz',
+                          name='name_%s' % id,
+                          id=id,
+                          flavor_id='flavor_1',
+                          compute_instance_id='compute-%s' % id,
+                          tenant_id='tenant_1')
+
+    def _stub_page(self, db_infos):
+        ids = [db_info.id for db_info in db_infos]
+        page = pagination.PaginatedDataView('instances', db_infos, 'foo')
+        when(DatabaseModelBase).find_all(
+            tenant_id='tenant_1', deleted=False,
+            criteria=[]).thenReturn(db_infos)
+        paginate = patch.object(DBInstance, 'find_by_pagination',
+                                return_value=page)
+        paginate.start()
+        self.addCleanup(paginate.stop)
+        statuses = dict((id, InstanceServiceStatus(ServiceStatuses.RUNNING,
+                                                   instance_id=id))
+                        for id in ids)
+        when(models).load_service_statuses(ids).thenReturn(statuses)
+        when(Backup).running_instance_ids(ids).thenReturn(set())
+
+    def test_load_only_fetches_page_servers(self):
+        db_infos = [self._db_instance('1'),
+                    self._db_instance('2', InstanceTasks.BUILDING)]
+        self._stub_page(db_infos)
+        when(self.client.servers).get('compute-1').thenReturn(
+            FakeServer('compute-1', status='ACTIVE'))
+
+        instances, marker = Instances.load(self.context)
+
+        self.assertThat(len(instances), Equals(2))
+        self.assertThat(instances[0].status, Equals('ACTIVE'))
+        self.assertThat(instances[1].status, Equals('BUILD'))
+        self.assertThat(marker, Is(None))
+        verify(self.client.servers, times=0).list()
+        verify(self.client.servers, times=1).get(any())
+
+    def test_load_missing_server_is_shutdown(self):
+        db_infos = [self._db_instance('1')]
+        self._stub_page(db_infos)
+        when(self.client.servers).get('compute-1').thenRaise(
+            nova_exceptions.NotFound(404))
+
+        instances, marker = Instances.load(self.context)
+
+        self.assertThat(len(instances), Equals(1))
+        self.assertThat(instances[0].db_info.server_status,
+                        Equals('SHUTDOWN'))
+
+
+class ServerStateCacheTest(TestCase):
+
+    def setUp(self):
+        super(ServerStateCacheTest, self).setUp()
+        self.context = TroveContext(tenant='tenant_1')
+        self.client = mock()
+        self.client.servers = mock()
+        when(models).create_nova_client(self.context).thenReturn(self.client)
+        self.server_cache = cache.TTLCache('server_state', 10)
+        when(models).get_server_state_cache().thenReturn(self.server_cache)
+
+    def tearDown(self):
+        super(ServerStateCacheTest, self).tearDown()
+        unstub()
+
+    def _server(self, id):
+        return FakeServer(id, status='ACTIVE',
+                          addresses={'private': [{'addr': '10.0.0.1'}]})
+
+    def test_cache_hit(self):
+        when(self.client.servers).get('compute-1').thenReturn(
+            self._server('compute-1'))
+        models.load_server_state(self.context, 'compute-1')
+        state = models.load_server_state(self.context, 'compute-1')
+        self.assertThat(state.status, Equals('ACTIVE'))
+        self.assertThat(state.addresses['private'][0]['addr'],
+                        Equals('10.0.0.1'))
+        verify(self.client.servers, times=1).get('compute-1')
+        self.assertThat(self.server_cache.hits, Equals(1))
+        self.assertThat(self.server_cache.misses, Equals(1))
+
+    def test_negative_cache(self):
+        when(self.client.servers).get('compute-1').thenRaise(
+            nova_exceptions.NotFound(404))
+        self.assertThat(models.load_server_state(self.context, 'compute-1'),
+                        Is(None))
+        self.assertThat(models.load_server_state(self.context, 'compute-1'),
+                        Is(None))
+        verify(self.client.servers, times=1).get('compute-1')
+
+    def test_invalidate(self):
+        when(self.client.servers).get('compute-1').thenReturn(
+            self._server('compute-1'))
+        models.load_server_state(self.context, 'compute-1')
+        models.invalidate_server_state('compute-1')
+        models.load_server_state(self.context, 'compute-1')
+        verify(self.client.servers, times=2).get('compute-1')
+
+    def test_load_server_refreshes_cache(self):
+        when(self.client.servers).get('compute-1').thenReturn(
+            self._server('compute-1'))
+        models.load_server(self.context, '1', 'compute-1')
+        state = models.load_server_state(self.context, 'compute-1')
+        self.assertThat(state.status, Equals('ACTIVE'))
+        verify(self.client.servers, times=1).get('compute-1')
+
+
+class FakeDetailInstance(object):
+
+    def __init__(self, status='ACTIVE'):
+        self.status = status
+        self.volume_used = None
+        self.volume_used_age = None
+
+
+class GuestVolumeUsageTest(TestCase):
+
+    def setUp(self):
+        super(GuestVolumeUsageTest, self).setUp()
+        util.init_db()
+        self.context = TroveContext(tenant='tenant_1')
+        self.instance_id = 'usage-%s' % utils.generate_uuid()
+        self.guest = mock()
+        when(models).create_guest_client(any(), any()).thenReturn(self.guest)
+        when(self.guest).get_volume_info().thenReturn({'used': 3.0})
+
+    def tearDown(self):
+        super(GuestVolumeUsageTest, self).tearDown()
+        unstub()
+        usage = VolumeUsage.get_by(instance_id=self.instance_id)
+        if usage is not None:
+            usage.delete()
+
+    def _report(self, used):
+        return VolumeUsage.report(self.instance_id,
+                                  {'used': used, 'total': 4096, 'free': 1024})
+
+    def test_report_updates_record(self):
+        self._report(1.0)
+        usage = self._report(2.0)
+        self.assertThat(usage.used, Equals(2.0))
+        self.assertThat(len(VolumeUsage.find_all(
+            instance_id=self.instance_id).all()), Equals(1))
+
+    def test_reads_reported_usage(self):
+        self._report(1.0)
+        instance = models.load_guest_info(FakeDetailInstance(), self.context,
+                                          self.instance_id)
+        self.assertThat(instance.volume_used, Equals(1.0))
+        self.assertThat(instance.volume_used_age, LessThan(5))
+        verify(self.guest, never).get_volume_info()
+
+    def test_live_asks_the_guest(self):
+        self._report(1.0)
+        instance = models.load_guest_info(FakeDetailInstance(), self.context,
+                                          self.instance_id, live=True)
+        self.assertThat(instance.volume_used, Equals(3.0))
+        self.assertThat(instance.volume_used_age, Equals(0))
+
+    def test_falls_back_to_guest_without_report(self):
+        instance = models.load_guest_info(FakeDetailInstance(), self.context,
+                                          self.instance_id)
+        self.assertThat(instance.volume_used, Equals(3.0))
+
+    def test_guest_not_called_while_building(self):
+        instance = models.load_guest_info(FakeDetailInstance('BUILD'),
+                                          self.context, self.instance_id)
+        self.assertThat(instance.volume_used, Is(None))
+        verify(self.guest, never).get_volume_info()
+
+
+class InstanceShowLoadTest(TestCase):
+
+    def setUp(self):
+        super(InstanceShowLoadTest, self).setUp()
+        self.context = TroveContext(tenant='tenant_1')
+        self.db_info = DBInstance(InstanceTasks.NONE, id='1', name='test',
+                                  flavor_id='1', tenant_id='tenant_1',
+                                  compute_instance_id='compute_1')
+        self.delays = {'server': 0, 'guest': 0}
+        self.running = 0
+        self.most_running = 0
+        self.server = FakeServer('compute_1', status='ACTIVE',
+                                 addresses={'private': [{'addr': '10.0.0.1'}]})
+        self.guest_statuses = []
+        self.server_calls = 0
+
+        def sleep(name):
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+            eventlet.sleep(self.delays[name])
+            self.running -= 1
+
+        def load_server_state(context, server_id, client=None, db_info=None):
+            self.server_calls += 1
+            sleep('server')
+            return self.server
+
+        def load_guest_info(instance, context, id, live=False):
+            self.guest_statuses.append(instance.status)
+            sleep('guest')
+            instance.volume_used = 0.5
+
+        patches = [
+            patch.object(models, 'get_db_info', return_value=self.db_info),
+            patch.object(
+                InstanceServiceStatus, 'find_by',
+                return_value=InstanceServiceStatus(ServiceStatuses.RUNNING)),
+            patch.object(models, 'load_server_state', load_server_state),
+            patch.object(models, 'load_guest_info', load_guest_info),
+            patch.object(Backup, 'running', return_value=None),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _load(self):
+        return models.load_instance_with_guest(models.DetailInstance,
+                                               self.context, '1')
+
+    def test_server_and_guest_are_asked_concurrently(self):
+        self.delays = {'server': 0.01, 'guest': 0.01}
+        instance = self._load()
+        self.assertThat(self.most_running, Equals(2))
+        self.assertThat(instance.status, Equals('ACTIVE'))
+        self.assertThat(instance.addresses, Equals(self.server.addresses))
+        self.assertThat(instance.volume_used, Equals(0.5))
+
+    def test_missing_server_is_shut_down(self):
+        self.server = None
+        instance = self._load()
+        self.assertThat(self.db_info.server_status, Equals('SHUTDOWN'))
+        self.assertThat(instance.addresses, Equals({}))
+
+    def test_slow_server_is_left_out(self):
+        CONF.set_override('instance_show_timeout', 0.05)
+        self.addCleanup(CONF.clear_override, 'instance_show_timeout')
+        self.delays['server'] = 1
+        instance = self._load()
+        # The server call was given up on while it was still running.
+        self.assertThat(self.running, Equals(1))
+        self.assertThat(instance.addresses, Is(None))
+        self.assertThat(instance.volume_used, Equals(0.5))
+
+    def test_slow_guest_is_left_out(self):
+        CONF.set_override('instance_show_timeout', 0.05)
+        self.addCleanup(CONF.clear_override, 'instance_show_timeout')
+        self.delays['guest'] = 1
+        instance = self._load()
+        self.assertThat(instance.volume_used, Is(None))
+        self.assertThat(instance.addresses, Equals(self.server.addresses))
+
+    def test_building_instance_skips_nova(self):
+        self.db_info.task_status = InstanceTasks.BUILDING
+        instance = self._load()
+        self.assertThat(instance.status, Equals('BUILD'))
+        self.assertThat(self.server_calls, Equals(0))
+        self.assertThat(self.guest_statuses, Equals(['BUILD']))
+
+
+class InstancesFilterTest(TestCase):
+
+    def setUp(self):
+        super(InstancesFilterTest, self).setUp()
+        util.init_db()
+        self.tenant = 'tenant-%s' % utils.generate_uuid()
+        self.context = TroveContext(tenant=self.tenant)
+        self.client = mock()
+        self.client.servers = mock()
+        when(models).create_nova_client(self.context).thenReturn(self.client)
+        self.db_infos = []
+        self.created = datetime.datetime(2013, 1, 1)
+        self._create('alpha-1', 0)
+        self._create('alpha-2', 1, service_type='percona')
+        self._create('beta-1', 2, service_status=ServiceStatuses.SHUTDOWN)
+        self._create('beta_2', 3, task_status=InstanceTasks.BUILDING,
+                     service_status=ServiceStatuses.NEW)
+
+    def tearDown(self):
+        super(InstancesFilterTest, self).tearDown()
+        unstub()
+        for db_info in self.db_infos:
+            InstanceServiceStatus.find_by(instance_id=db_info.id).delete()
+            db_info.delete()
+
+    def _create(self, name, minutes, task_status=InstanceTasks.NONE,
+                service_type='mysql', service_status=ServiceStatuses.RUNNING):
+        db_info = DBInstance.create(name=name, flavor_id='1',
+                                    tenant_id=self.tenant,
+                                    compute_instance_id='compute-%s' % name,
+                                    task_status=task_status,
+                                    service_type=service_type)
+        db_info.created = self.created + datetime.timedelta(minutes=minutes)
+        db_info.save()
+        InstanceServiceStatus.create(instance_id=db_info.id,
+                                     status=service_status)
+        when(self.client.servers).get(db_info.compute_instance_id).thenReturn(
+            FakeServer(db_info.compute_instance_id, status='ACTIVE'))
+        self.db_infos.append(db_info)
+
+    def _names(self, **kwargs):
+        instances, marker = Instances.load(self.context, **kwargs)
+        return [instance.name for instance in instances]
+
+    def test_name_prefix(self):
+        self.assertThat(self._names(filters={'name': 'alpha'}),
+                        Equals(['alpha-1', 'alpha-2']))
+        self.assertThat(self._names(filters={'name': 'beta_'}),
+                        Equals(['beta_2']))
+
+    def test_task_and_service_type(self):
+        self.assertThat(self._names(filters={'task': 'BUILDING'}),
+                        Equals(['beta_2']))
+        self.assertThat(self._names(filters={'service_type': 'percona'}),
+                        Equals(['alpha-2']))
+
+    def test_created_range(self):
+        filters = {'created_since': self.created + datetime.timedelta(
+                   minutes=1),
+                   'created_before': self.created + datetime.timedelta(
+                   minutes=3)}
+        self.assertThat(self._names(filters=filters),
+                        Equals(['alpha-2', 'beta-1']))
+
+    def test_sort(self):
+        self.assertThat(self._names(sort_key='name', sort_dir='desc'),
+                        Equals(['beta_2', 'beta-1', 'alpha-2', 'alpha-1']))
+
+    def test_status_only_resolves_matching_servers(self):
+        self.context.limit = 1
+        instances, marker = Instances.load(
+            self.context, filters={'status': ['ACTIVE']})
+        self.assertThat([instance.name for instance in instances],
+                        Equals(['alpha-1']))
+        self.context.marker = marker
+        instances, marker = Instances.load(
+            self.context, filters={'status': ['ACTIVE']})
+        self.assertThat([instance.name for instance in instances],
+                        Equals(['alpha-2']))
+        self.context.marker = marker
+        instances, marker = Instances.load(
+            self.context, filters={'status': ['ACTIVE']})
+        self.assertThat(instances, Equals([]))
+        self.assertThat(marker, Is(None))
+        verify(self.client.servers, times=0).get('compute-beta-1')
+        verify(self.client.servers, times=0).get('compute-beta_2')
+
+    def test_server_derived_status(self):
+        when(self.client.servers).get('compute-alpha-1').thenReturn(
+            FakeServer('compute-alpha-1', status='ERROR'))
+        self.assertThat(self._names(filters={'status': ['ERROR']}),
+                        Equals(['alpha-1']))
+
+
+class ServiceImageCacheTest(TestCase):
+
+    def setUp(self):
+        super(ServiceImageCacheTest, self).setUp()
+        util.init_db()
+        models.get_service_image_cache().clear()
+        self.service_image = models.ServiceImage.create(
+            service_name='cached_service', image_id='image_1')
+
+    def tearDown(self):
+        super(ServiceImageCacheTest, self).tearDown()
+        unstub()
+        models.get_service_image_cache().clear()
+        self.service_image.delete()
+
+    def test_find_by_service_name(self):
+        found = models.ServiceImage.find_by_service_name('cached_service')
+        self.assertEqual('image_1', found['image_id'])
+        when(DatabaseModelBase).find_by(
+            service_name='cached_service').thenRaise(
+                exception.ModelNotFoundError())
+        found = models.ServiceImage.find_by_service_name('cached_service')
+        self.assertEqual('image_1', found['image_id'])
+        self.assertEqual(self.service_image.id, found.id)
+
+    def test_unknown_service(self):
+        self.assertRaises(exception.ModelNotFoundError,
+                          models.ServiceImage.find_by_service_name,
+                          'unknown_service')
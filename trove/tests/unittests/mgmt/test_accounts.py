@@ -0,0 +1,86 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import testtools
+
+from trove.common import utils
+from trove.extensions.account.models import AccountsSummary
+from trove.instance.models import DBInstance
+from trove.instance.models import InstanceServiceStatus
+from trove.instance.models import ServiceStatuses
+from trove.instance.tasks import InstanceTasks
+from trove.tests.unittests.util import util
+
+
+class AccountsSummaryTest(testtools.TestCase):
+
+    def setUp(self):
+        super(AccountsSummaryTest, self).setUp()
+        util.init_db()
+        # Tenants of other tests sort before or after these ones, so
+        # paging from the prefix only ever reaches them at the end.
+        self.prefix = 'accounts-%s-' % utils.generate_uuid()
+        self.records = []
+        self._create('a', ServiceStatuses.RUNNING, 2)
+        self._create('a', ServiceStatuses.SHUTDOWN, 3)
+        self._create('a', ServiceStatuses.CRASHED, None)
+        self._create('b', ServiceStatuses.BUILDING, 1)
+        self._create('c', ServiceStatuses.RUNNING, 4)
+        deleted = self._create('c', ServiceStatuses.RUNNING, 8)
+        deleted.deleted = True
+        deleted.save()
+
+    def tearDown(self):
+        super(AccountsSummaryTest, self).tearDown()
+        for record in self.records:
+            record.delete()
+
+    def _create(self, tenant, status, volume_size):
+        instance = DBInstance.create(name='summary', flavor_id='1',
+                                     tenant_id=self.prefix + tenant,
+                                     volume_size=volume_size,
+                                     task_status=InstanceTasks.NONE)
+        self.records.append(instance)
+        self.records.append(InstanceServiceStatus.create(
+            instance_id=instance.id, status=status))
+        return instance
+
+    def _ours(self, summary):
+        return [account for account in summary.accounts
+                if account['id'].startswith(self.prefix)]
+
+    def test_counts_instances_per_tenant(self):
+        summary = AccountsSummary.load(marker=self.prefix)
+        self.assertEqual([{'id': self.prefix + 'a', 'num_instances': 3},
+                          {'id': self.prefix + 'b', 'num_instances': 1},
+                          {'id': self.prefix + 'c', 'num_instances': 1}],
+                         self._ours(summary))
+
+    def test_pages_through_tenants(self):
+        summary = AccountsSummary.load(limit=2, marker=self.prefix)
+        self.assertEqual([self.prefix + 'a', self.prefix + 'b'],
+                         [account['id'] for account in summary.accounts])
+        self.assertEqual(self.prefix + 'b', summary.next_marker)
+
+        summary = AccountsSummary.load(limit=2, marker=summary.next_marker)
+        self.assertEqual(self.prefix + 'c', summary.accounts[0]['id'])
+
+    def test_detailed_adds_volume_size_and_statuses(self):
+        summary = AccountsSummary.load(limit=1, marker=self.prefix,
+                                       detailed=True)
+        self.assertEqual([{'id': self.prefix + 'a',
+                           'num_instances': 3,
+                           'volume_size': 5,
+                           'statuses': {'ACTIVE': 1, 'SHUTDOWN': 2}}],
+                         summary.accounts)
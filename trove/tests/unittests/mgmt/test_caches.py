@@ -0,0 +1,52 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from mock import Mock
+from mock import patch
+from testtools import TestCase
+
+from trove.common import cache
+from trove.common.context import TroveContext
+from trove.extensions.mgmt.caches.service import CacheController
+from trove.instance import models as instance_models
+
+
+class CacheControllerTest(TestCase):
+
+    def setUp(self):
+        super(CacheControllerTest, self).setUp()
+        self.controller = CacheController()
+        self.req = Mock()
+        self.req.environ = {
+            'trove.context': TroveContext(tenant='admin', is_admin=True)}
+        self.server_cache = cache.TTLCache('server_state', 10)
+        patcher = patch.object(instance_models, '_SERVER_STATE_CACHE',
+                               self.server_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_index_reports_server_state_counters(self):
+        self.server_cache.set('compute-1', 'state')
+        self.server_cache.get('compute-1')
+        self.server_cache.get('compute-2')
+        result = self.controller.index(self.req, 'admin')
+        stats = dict((stat['name'], stat)
+                     for stat in result.data(None)['caches'])
+        self.assertEqual({'name': 'server_state', 'hits': 1, 'misses': 1},
+                         stats['server_state'])
+
+    def test_flush_server_state(self):
+        self.server_cache.set('compute-1', 'state')
+        self.controller.delete(self.req, 'admin', 'server_state')
+        self.assertEqual(None, self.server_cache.get('compute-1'))
@@ -0,0 +1,129 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import mock
+import testtools
+
+from trove.common import exception
+from trove.common.context import TroveContext
+from trove.extensions.mgmt.host import models
+from trove.extensions.mgmt.host.models import GuestUpdateJob
+from trove.extensions.mgmt.host.models import GuestUpdateState
+from trove.tests.unittests.util import util
+
+
+class FakeHost(object):
+
+    def __init__(self, name, instance_ids):
+        self.name = name
+        self.instances = [{'id': id} for id in instance_ids]
+        self.instances.append({'id': None})
+
+
+class FakeGuests(object):
+    """Records how many guests are being updated at once."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.running = 0
+        self.most_running = 0
+        self.updated = []
+
+    def client(self, context, instance_id):
+        guests = self
+
+        class Client(object):
+            def update_guest(self, timeout=None):
+                guests.running += 1
+                guests.most_running = max(guests.most_running,
+                                          guests.running)
+                eventlet.sleep(0.01)
+                guests.running -= 1
+                guests.updated.append(instance_id)
+                if instance_id in guests.failing:
+                    raise exception.GuestTimeout()
+
+        return Client()
+
+
+class GuestUpdateJobTest(testtools.TestCase):
+
+    def setUp(self):
+        super(GuestUpdateJobTest, self).setUp()
+        util.init_db()
+        self.context = TroveContext(tenant='admin', is_admin=True)
+        self.hosts = {'host1': FakeHost('host1', ['a', 'b', 'c', 'd', 'e']),
+                      'host2': FakeHost('host2', ['f', 'g'])}
+        self.guests = FakeGuests()
+        patches = [
+            mock.patch.object(models, 'create_guest_client',
+                              self.guests.client),
+            mock.patch.object(models.DetailedHost, 'load', staticmethod(
+                lambda context, name: self.hosts[name])),
+            mock.patch.object(models.SimpleHost, 'load_all', staticmethod(
+                lambda context: self.hosts.values())),
+            mock.patch.object(models.task_api.API, 'update_guests'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _run(self, **kwargs):
+        job = GuestUpdateJob.create(self.context, **kwargs)
+        job.run(self.context)
+        return GuestUpdateJob.load(job.id)
+
+    def test_create_casts_to_taskmanager(self):
+        job = GuestUpdateJob.create(self.context, hosts=['host1'])
+        models.task_api.API.update_guests.assert_called_once_with(job.id)
+        self.assertEqual(GuestUpdateState.NEW, job.state)
+        self.assertEqual(['host1'], job.host_names)
+
+    def test_updates_within_concurrency_window(self):
+        job = self._run(hosts=['host1'], concurrency=2)
+        self.assertEqual(GuestUpdateState.COMPLETED, job.state)
+        self.assertEqual(5, job.total)
+        self.assertEqual(5, job.succeeded)
+        self.assertEqual(2, self.guests.most_running)
+
+    def test_updates_every_host(self):
+        job = self._run()
+        self.assertEqual(GuestUpdateState.COMPLETED, job.state)
+        self.assertEqual(7, job.succeeded)
+        self.assertEqual(sorted('abcdefg'), sorted(self.guests.updated))
+
+    def test_failures_are_reported(self):
+        self.guests.failing.add('c')
+        job = self._run(hosts=['host1'], concurrency=1, max_failure_rate=0.5)
+        self.assertEqual(GuestUpdateState.FAILED, job.state)
+        self.assertEqual(4, job.succeeded)
+        self.assertEqual(['c'], job.failed_instance_ids)
+
+    def test_stops_once_failure_rate_exceeded(self):
+        self.guests.failing.update('abcdefg')
+        job = self._run(hosts=['host1', 'host2'], concurrency=2,
+                        max_failure_rate=0.2)
+        self.assertEqual(GuestUpdateState.STOPPED, job.state)
+        # No more than the window is tried once two updates failed, and
+        # host2 is never reached.
+        self.assertTrue(2 <= job.failed <= 3)
+        self.assertEqual(job.failed, len(self.guests.updated))
+        self.assertTrue(set(self.guests.updated) < set('abcde'))
+
+    def test_invalid_options(self):
+        self.assertRaises(exception.BadRequest, GuestUpdateJob.create,
+                          self.context, concurrency=0)
+        self.assertRaises(exception.BadRequest, GuestUpdateJob.create,
+                          self.context, max_failure_rate=2)
@@ -0,0 +1,84 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import testtools
+
+from trove.common import utils
+from trove.extensions.mgmt.host import models
+from trove.extensions.mgmt.host.models import DetailedHost
+from trove.instance.models import DBInstance
+from trove.instance.models import InstanceServiceStatus
+from trove.instance.models import ServiceStatuses
+from trove.instance.tasks import InstanceTasks
+from trove.tests.unittests.util import util
+
+
+class FakeHostInfo(object):
+
+    def __init__(self, server_ids):
+        self.name = 'host1'
+        self.percentUsed = 50
+        self.totalRAM = 2048
+        self.usedRAM = 1024
+        self.instances = [{'uuid': server_id, 'name': server_id}
+                          for server_id in server_ids]
+
+
+class DetailedHostTest(testtools.TestCase):
+
+    def setUp(self):
+        super(DetailedHostTest, self).setUp()
+        util.init_db()
+        self.records = []
+
+    def tearDown(self):
+        super(DetailedHostTest, self).tearDown()
+        for record in self.records:
+            record.delete()
+
+    def _create(self, server_id, status=ServiceStatuses.RUNNING,
+                deleted=False):
+        instance = DBInstance.create(name='host', flavor_id='1',
+                                     tenant_id='tenant_1',
+                                     compute_instance_id=server_id,
+                                     task_status=InstanceTasks.NONE)
+        if deleted:
+            instance.deleted = True
+            instance.save()
+        self.records.append(instance)
+        if status is not None:
+            self.records.append(InstanceServiceStatus.create(
+                instance_id=instance.id, status=status))
+        return instance
+
+    def test_instances_are_resolved_in_bulk(self):
+        server_ids = [utils.generate_uuid() for i in range(4)]
+        first = self._create(server_ids[0])
+        self._create(server_ids[1], deleted=True)
+        second = self._create(server_ids[1], status=ServiceStatuses.SHUTDOWN)
+        self._create(server_ids[2], status=None)
+        load_statuses = mock.Mock(wraps=models.load_service_statuses)
+
+        with mock.patch.object(models, 'load_service_statuses',
+                               load_statuses):
+            host = DetailedHost(FakeHostInfo(server_ids))
+
+        ids = [instance['id'] for instance in host.instances]
+        self.assertEqual([first.id, second.id, None, None], ids)
+        self.assertEqual('ACTIVE', host.instances[0]['status'])
+        self.assertEqual('SHUTDOWN', host.instances[1]['status'])
+        self.assertEqual('tenant_1', host.instances[2]['tenant_id'])
+        self.assertEqual(server_ids[3], host.instances[3]['server_id'])
+        self.assertEqual(1, load_statuses.call_count)
@@ -13,10 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+
+import eventlet
+from mock import Mock
+from mock import patch
 from mockito import mock, when, verify, unstub, any
 from testtools import TestCase
 from testtools.matchers import Equals, Is, Not
 
+from novaclient import exceptions as nova_exceptions
 from novaclient.v1_1 import Client
 from novaclient.v1_1.flavors import FlavorManager, Flavor
 from novaclient.v1_1.servers import Server, ServerManager
@@ -28,14 +33,19 @@ from trove.extensions.mgmt.instances.models import NotificationTransformer
 from trove.extensions.mgmt.instances.models import \
     NovaNotificationTransformer
 from trove.extensions.mgmt.instances.models import SimpleMgmtInstance
+from trove.flavor import models as flavor_models
 from trove.instance.models import DBInstance
 from trove.instance.models import InstanceServiceStatus
 from trove.instance.models import ServiceStatuses
 from trove.instance.tasks import InstanceTasks
 import trove.extensions.mgmt.instances.models as mgmtmodels
+import trove.instance.models as imodels
 from trove.openstack.common.notifier import api as notifier
+from trove.common import cfg
 from trove.common import remote
 
+CONF = cfg.CONF
+
 
 class MockMgmtInstanceTest(TestCase):
     def setUp(self):
@@ -46,12 +56,18 @@ class MockMgmtInstanceTest(TestCase):
         self.client.servers = self.server_mgr
         self.flavor_mgr = mock(FlavorManager)
         self.client.flavors = self.flavor_mgr
+        when(self.flavor_mgr).list().thenReturn([])
         when(remote).create_admin_nova_client(self.context).thenReturn(
             self.client)
+        flavor_models.get_flavor_cache().clear()
 
     def tearDown(self):
         super(MockMgmtInstanceTest, self).tearDown()
         unstub()
+        flavor_models.get_flavor_cache().clear()
+
+    def _flavor(self, id, name):
+        return Flavor(self.flavor_mgr, {'id': id, 'name': name}, loaded=True)
 
 
 class TestNotificationTransformer(MockMgmtInstanceTest):
@@ -67,12 +83,13 @@ class TestNotificationTransformer(MockMgmtInstanceTest):
                                  server_id='server_id_1',
                                  tenant_id='tenant_id_1',
                                  server_status=status)
-        when(DatabaseModelBase).find_all(deleted=False).thenReturn(
-            [db_instance])
-        when(DatabaseModelBase).find_by(instance_id='1').thenReturn(
-            InstanceServiceStatus(ServiceStatuses.BUILDING))
+        when(mgmtmodels).iter_instance_pages(
+            any(int), deleted=False).thenReturn([[db_instance]])
+        when(imodels).load_service_statuses(['1']).thenReturn(
+            {'1': InstanceServiceStatus(ServiceStatuses.BUILDING)})
+        when(Backup).running_instance_ids(['1']).thenReturn(set())
 
-        payloads = transformer()
+        payloads = list(transformer())
         self.assertIsNotNone(payloads)
         self.assertThat(len(payloads), Equals(1))
         payload = payloads[0]
@@ -83,18 +100,21 @@ class TestNotificationTransformer(MockMgmtInstanceTest):
 
 class TestNovaNotificationTransformer(MockMgmtInstanceTest):
     def test_transformer_cache(self):
-        flavor = mock(Flavor)
-        flavor.name = 'db.small'
+        flavor = self._flavor('flavor_1', 'db.small')
         when(self.flavor_mgr).get('flavor_1').thenReturn(flavor)
         transformer = NovaNotificationTransformer(context=self.context)
         transformer2 = NovaNotificationTransformer(context=self.context)
-        self.assertThat(transformer._flavor_cache,
-                        Not(Is(transformer2._flavor_cache)))
+        self.assertThat(transformer._lookup_flavor('flavor_1'),
+                        Equals('db.small'))
+        self.assertThat(transformer2._lookup_flavor('flavor_1'),
+                        Equals('db.small'))
+        verify(self.flavor_mgr).get('flavor_1')
 
     def test_lookup_flavor(self):
-        flavor = mock(Flavor)
-        flavor.name = 'flav_1'
+        flavor = self._flavor('1', 'flav_1')
         when(self.flavor_mgr).get('1').thenReturn(flavor)
+        when(self.flavor_mgr).get('2').thenRaise(
+            nova_exceptions.NotFound(404))
         transformer = NovaNotificationTransformer(context=self.context)
         self.assertThat(transformer._lookup_flavor('1'), Equals(flavor.name))
         self.assertThat(transformer._lookup_flavor('2'), Equals('unknown'))
@@ -117,17 +137,16 @@ class TestNovaNotificationTransformer(MockMgmtInstanceTest):
                                            db_instance,
                                            server,
                                            None)
-        when(mgmtmodels).load_mgmt_instances(
+        when(mgmtmodels).iter_mgmt_instances(
             self.context,
             deleted=False,
             client=self.client).thenReturn(
-                [mgmt_instance])
-        flavor = mock(Flavor)
-        flavor.name = 'db.small'
+                [[mgmt_instance]])
+        flavor = self._flavor('flavor_1', 'db.small')
         when(self.flavor_mgr).get('flavor_1').thenReturn(flavor)
         # invocation
         transformer = NovaNotificationTransformer(context=self.context)
-        payloads = transformer()
+        payloads = list(transformer())
         # assertions
         self.assertIsNotNone(payloads)
         self.assertThat(len(payloads), Equals(1))
@@ -159,17 +178,16 @@ class TestNovaNotificationTransformer(MockMgmtInstanceTest):
                                            None)
         when(Backup).running('1').thenReturn(None)
         self.assertThat(mgmt_instance.status, Equals('SHUTDOWN'))
-        when(mgmtmodels).load_mgmt_instances(
+        when(mgmtmodels).iter_mgmt_instances(
             self.context,
             deleted=False,
             client=self.client).thenReturn(
-                [mgmt_instance])
-        flavor = mock(Flavor)
-        flavor.name = 'db.small'
+                [[mgmt_instance]])
+        flavor = self._flavor('flavor_1', 'db.small')
         when(self.flavor_mgr).get('flavor_1').thenReturn(flavor)
         # invocation
         transformer = NovaNotificationTransformer(context=self.context)
-        payloads = transformer()
+        payloads = list(transformer())
         # assertion that SHUTDOWN instances are not reported
         self.assertIsNotNone(payloads)
         self.assertThat(len(payloads), Equals(0))
@@ -192,17 +210,16 @@ class TestNovaNotificationTransformer(MockMgmtInstanceTest):
                                            None)
         when(Backup).running('1').thenReturn(None)
         self.assertThat(mgmt_instance.status, Equals('SHUTDOWN'))
-        when(mgmtmodels).load_mgmt_instances(
+        when(mgmtmodels).iter_mgmt_instances(
             self.context,
             deleted=False,
             client=self.client).thenReturn(
-                [mgmt_instance])
-        flavor = mock(Flavor)
-        flavor.name = 'db.small'
+                [[mgmt_instance]])
+        flavor = self._flavor('flavor_1', 'db.small')
         when(self.flavor_mgr).get('flavor_1').thenReturn(flavor)
         # invocation
         transformer = NovaNotificationTransformer(context=self.context)
-        payloads = transformer()
+        payloads = list(transformer())
         # assertion that SHUTDOWN instances are not reported
         self.assertIsNotNone(payloads)
         self.assertThat(len(payloads), Equals(0))
@@ -225,18 +242,17 @@ class TestNovaNotificationTransformer(MockMgmtInstanceTest):
                                            db_instance,
                                            server,
                                            None)
-        when(mgmtmodels).load_mgmt_instances(
+        when(mgmtmodels).iter_mgmt_instances(
             self.context,
             deleted=False,
             client=self.client).thenReturn(
-                [mgmt_instance])
-        flavor = mock(Flavor)
-        flavor.name = 'db.small'
+                [[mgmt_instance]])
+        flavor = self._flavor('flavor_1', 'db.small')
         when(self.flavor_mgr).get('flavor_1').thenReturn(flavor)
         transformer = NovaNotificationTransformer(context=self.context)
-        transformer()
+        list(transformer())
         # call twice ensure client.flavor invoked once
-        payloads = transformer()
+        payloads = list(transformer())
         self.assertIsNotNone(payloads)
         self.assertThat(len(payloads), Equals(1))
         payload = payloads[0]
@@ -250,6 +266,61 @@ class TestNovaNotificationTransformer(MockMgmtInstanceTest):
         verify(self.flavor_mgr).get('flavor_1')
 
 
+class TestMgmtInstancesLoad(MockMgmtInstanceTest):
+    def _db_instance(self, id):
+        return DBInstance(InstanceTasks.NONE,
+                          created='xyz',
+                          name='test_name_%s' % id,
+                          id=id,
+                          flavor_id='flavor_1',
+                          compute_instance_id='compute_id_%s' % id,
+                          tenant_id='tenant_id_1')
+
+    def _server(self, id):
+        server = mock(Server)
+        server.id = 'compute_id_%s' % id
+        server.status = 'ACTIVE'
+        return server
+
+    def test_load_status_from_existing_batches_queries(self):
+        db_infos = [self._db_instance('1'), self._db_instance('2')]
+        servers = [self._server('1'), self._server('2')]
+        statuses = {
+            '1': InstanceServiceStatus(ServiceStatuses.RUNNING,
+                                       instance_id='1'),
+            '2': InstanceServiceStatus(ServiceStatuses.RUNNING,
+                                       instance_id='2'),
+        }
+        when(imodels).load_service_statuses(['1', '2']).thenReturn(statuses)
+        when(Backup).running_instance_ids(['1', '2']).thenReturn(set(['2']))
+
+        instances = mgmtmodels.MgmtInstances.load_status_from_existing(
+            self.context, db_infos, servers)
+
+        self.assertThat(len(instances), Equals(2))
+        self.assertThat(instances[0].status, Equals('ACTIVE'))
+        self.assertThat(instances[1].status, Equals('BACKUP'))
+        verify(imodels, times=1).load_service_statuses(['1', '2'])
+        verify(Backup, times=1).running_instance_ids(['1', '2'])
+        verify(Backup, times=0).running(any())
+
+    def test_load_status_from_existing_skips_missing_status(self):
+        db_infos = [self._db_instance('1'), self._db_instance('2')]
+        servers = [self._server('1'), self._server('2')]
+        statuses = {
+            '2': InstanceServiceStatus(ServiceStatuses.RUNNING,
+                                       instance_id='2'),
+        }
+        when(imodels).load_service_statuses(['1', '2']).thenReturn(statuses)
+        when(Backup).running_instance_ids(['1', '2']).thenReturn(set())
+
+        instances = mgmtmodels.MgmtInstances.load_status_from_existing(
+            self.context, db_infos, servers)
+
+        self.assertThat(len(instances), Equals(1))
+        self.assertThat(instances[0].id, Equals('2'))
+
+
 class TestMgmtInstanceTasks(MockMgmtInstanceTest):
     def test_public_exists_events(self):
         status = ServiceStatuses.BUILDING.api_status
@@ -269,13 +340,12 @@ class TestMgmtInstanceTasks(MockMgmtInstanceTest):
                                            db_instance,
                                            server,
                                            None)
-        when(mgmtmodels).load_mgmt_instances(
+        when(mgmtmodels).iter_mgmt_instances(
             self.context,
             deleted=False,
             client=self.client).thenReturn(
-                [mgmt_instance, mgmt_instance])
-        flavor = mock(Flavor)
-        flavor.name = 'db.small'
+                [[mgmt_instance], [mgmt_instance]])
+        flavor = self._flavor('flavor_1', 'db.small')
         when(self.flavor_mgr).get('flavor_1').thenReturn(flavor)
         when(notifier).notify(self.context,
                               any(str),
@@ -291,3 +361,111 @@ class TestMgmtInstanceTasks(MockMgmtInstanceTest):
                                          'trove.instance.exists',
                                          'INFO',
                                          any(dict))
+
+    def test_publish_exists_events_caps_rate(self):
+        CONF.set_override('exists_notification_batch_size', 2)
+        CONF.set_override('exists_notification_rate', 1)
+        self.addCleanup(CONF.clear_override, 'exists_notification_batch_size')
+        self.addCleanup(CONF.clear_override, 'exists_notification_rate')
+        when(notifier).notify(self.context, any(str),
+                              'trove.instance.exists', 'INFO',
+                              any(dict)).thenReturn(None)
+        when(mgmtmodels.time).time().thenReturn(100.0)
+        when(mgmtmodels.time).sleep(any()).thenReturn(None)
+
+        result = mgmtmodels.publish_exist_events(
+            lambda: iter([{}] * 5), self.context)
+
+        self.assertThat(result['published'], Equals(5))
+        verify(mgmtmodels.time, times=1).sleep(2.0)
+        verify(mgmtmodels.time, times=1).sleep(4.0)
+
+    def test_iter_instance_pages(self):
+        query = mock()
+        when(DatabaseModelBase).find_all(deleted=False).thenReturn(query)
+        when(query).paginated_collection(limit=2, marker=None).thenReturn(
+            (['1', '2'], '2'))
+        when(query).paginated_collection(limit=2, marker='2').thenReturn(
+            (['3'], None))
+
+        pages = list(mgmtmodels.iter_instance_pages(2, deleted=False))
+
+        self.assertThat(pages, Equals([['1', '2'], ['3']]))
+
+
+class TestDetailedMgmtInstanceLoad(TestCase):
+
+    def setUp(self):
+        super(TestDetailedMgmtInstanceLoad, self).setUp()
+        self.context = TroveContext()
+        self.db_info = DBInstance(InstanceTasks.NONE, id='1', name='test',
+                                  flavor_id='1', tenant_id='tenant_1',
+                                  compute_instance_id='compute_1',
+                                  volume_id='volume_1')
+        self.delays = {'server': 0, 'volume': 0, 'guest': 0}
+        self.nova_calls = []
+        self.running = 0
+        self.most_running = 0
+        server = Mock(status='ACTIVE', addresses={'private': []})
+        volume = Mock(id='volume_1')
+
+        def sleep(name):
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+            eventlet.sleep(self.delays[name])
+            self.running -= 1
+
+        def fetch(name, result):
+            def func(*args, **kwargs):
+                self.nova_calls.append(name)
+                sleep(name)
+                return result
+            return func
+
+        def load_guest_info(instance, context, id, live=False):
+            sleep('guest')
+            instance.volume_used = 0.5
+
+        nova = Mock()
+        nova.rdservers.get.side_effect = fetch('server', server)
+        cinder = Mock()
+        cinder.volumes.get.side_effect = fetch('volume', volume)
+        patches = [
+            patch.object(imodels, 'get_db_info', return_value=self.db_info),
+            patch.object(
+                InstanceServiceStatus, 'find_by',
+                return_value=InstanceServiceStatus(ServiceStatuses.RUNNING)),
+            patch.object(remote, 'create_nova_client', return_value=nova),
+            patch.object(remote, 'create_cinder_client', return_value=cinder),
+            patch.object(imodels, 'load_guest_info', load_guest_info),
+            patch.object(mgmtmodels.mysql_models.RootHistory, 'load',
+                         return_value=None),
+            patch.object(Backup, 'running', return_value=None),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.server = server
+        self.volume = volume
+
+    def test_sources_are_fetched_concurrently(self):
+        self.delays = {'server': 0.01, 'volume': 0.01, 'guest': 0.01}
+        instance = mgmtmodels.DetailedMgmtInstance.load(self.context, '1')
+        # The server, volume and guest were all waited on at once.
+        self.assertThat(self.most_running, Equals(3))
+        self.assertThat(instance.server, Is(self.server))
+        self.assertThat(instance.volume, Is(self.volume))
+        self.assertThat(instance.volume_used, Equals(0.5))
+        self.assertThat(instance.timed_out, Equals([]))
+        self.assertThat(instance.status, Equals('ACTIVE'))
+        # Nova is only asked once, for the admin view of the server.
+        self.assertThat(self.nova_calls.count('server'), Equals(1))
+
+    def test_slow_sources_are_reported(self):
+        CONF.set_override('mgmt_instance_call_timeout', 0.05)
+        self.addCleanup(CONF.clear_override, 'mgmt_instance_call_timeout')
+        self.delays['volume'] = 1
+        instance = mgmtmodels.DetailedMgmtInstance.load(self.context, '1')
+        self.assertThat(instance.timed_out, Equals(['volume']))
+        self.assertThat(instance.volume, Is(None))
+        self.assertThat(instance.server, Is(self.server))
@@ -11,9 +11,12 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import threading
+
 import testtools
 from mockito import mock, when, unstub, any, verify, never, times
 from mock import Mock
+from trove.quota.quota import AtomicDbQuotaDriver
 from trove.quota.quota import DbQuotaDriver
 from trove.quota.models import Resource
 from trove.quota.models import Quota
@@ -23,8 +26,10 @@ from trove.db.models import DatabaseModelBase
 from trove.extensions.mgmt.quota.service import QuotaController
 from trove.common import exception
 from trove.common import cfg
+from trove.common import utils
 from trove.quota.quota import run_with_quotas
 from trove.quota.quota import QUOTAS
+from trove.tests.unittests.util import util
 """
 Unit tests for the classes and functions in DbQuotaDriver.py.
 """
@@ -587,3 +592,104 @@ class DbQuotaDriverTest(testtools.TestCase):
         self.assertEqual(0, FAKE_QUOTAS[1].reserved)
         self.assertEqual(Reservation.Statuses.ROLLEDBACK,
                          FAKE_RESERVATIONS[1].status)
+
+
+class AtomicDbQuotaDriverTest(testtools.TestCase):
+
+    def setUp(self):
+        super(AtomicDbQuotaDriverTest, self).setUp()
+        util.init_db()
+        self.driver = AtomicDbQuotaDriver(resources)
+        self.tenant_id = utils.generate_uuid()
+        self.quota = Quota.create(tenant_id=self.tenant_id,
+                                  resource=Resource.INSTANCES,
+                                  hard_limit=5)
+
+    def tearDown(self):
+        super(AtomicDbQuotaDriverTest, self).tearDown()
+        for usage in QuotaUsage.find_all(tenant_id=self.tenant_id):
+            Reservation.find_all(usage_id=usage.id).delete()
+            usage.delete()
+        self.quota.delete()
+
+    def _usage(self, resource):
+        usages = QuotaUsage.find_all(tenant_id=self.tenant_id,
+                                     resource=resource).all()
+        return usages[0] if usages else None
+
+    def _reserve(self, **deltas):
+        return self.driver.reserve(self.tenant_id, resources, deltas)
+
+    def test_reserve(self):
+        reservations = self._reserve(instances=2, volumes=3)
+
+        instances = self._usage(Resource.INSTANCES)
+        self.assertEqual(0, instances.in_use)
+        self.assertEqual(2, instances.reserved)
+        self.assertEqual(3, self._usage(Resource.VOLUMES).reserved)
+        for reservation in reservations:
+            stored = Reservation.find_by(id=reservation.id)
+            self.assertEqual(Reservation.Statuses.RESERVED, stored.status)
+            self.assertEqual(reservation.delta, stored.delta)
+
+    def test_reserve_adds_to_reserved(self):
+        self._reserve(instances=2)
+        self._reserve(instances=1)
+        self.assertEqual(3, self._usage(Resource.INSTANCES).reserved)
+
+    def test_reserve_over_quota(self):
+        self._reserve(instances=4)
+        self.assertRaises(exception.QuotaExceeded, self._reserve,
+                          instances=2, volumes=1)
+        self.assertEqual(4, self._usage(Resource.INSTANCES).reserved)
+        self.assertEqual(None, self._usage(Resource.VOLUMES))
+
+    def test_reserve_resource_unknown(self):
+        self.assertRaises(exception.QuotaResourceUnknown, self._reserve,
+                          backups=1)
+
+    def test_commit(self):
+        reservations = self._reserve(instances=2)
+        self.driver.commit(reservations)
+        self.driver.commit(reservations)
+
+        usage = self._usage(Resource.INSTANCES)
+        self.assertEqual(2, usage.in_use)
+        self.assertEqual(0, usage.reserved)
+        self.assertEqual(Reservation.Statuses.COMMITTED,
+                         Reservation.find_by(id=reservations[0].id).status)
+
+    def test_rollback(self):
+        reservations = self._reserve(instances=2)
+        self.driver.rollback(reservations)
+
+        usage = self._usage(Resource.INSTANCES)
+        self.assertEqual(0, usage.in_use)
+        self.assertEqual(0, usage.reserved)
+        self.assertEqual(Reservation.Statuses.ROLLEDBACK,
+                         Reservation.find_by(id=reservations[0].id).status)
+
+    def test_concurrent_reservations(self):
+        # More requests than the quota allows race for the tenant's first
+        # usage rows; exactly as many as the quota allows may win.
+        results = []
+
+        def reserve():
+            try:
+                self.driver.commit(self._reserve(instances=1, volumes=1))
+                results.append(True)
+            except exception.QuotaExceeded:
+                results.append(False)
+
+        threads = [threading.Thread(target=reserve) for x in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(12, len(results))
+        self.assertEqual(5, results.count(True))
+        instances = self._usage(Resource.INSTANCES)
+        self.assertEqual(5, instances.in_use)
+        self.assertEqual(0, instances.reserved)
+        self.assertEqual(5, self._usage(Resource.VOLUMES).in_use)
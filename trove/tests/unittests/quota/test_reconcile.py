@@ -0,0 +1,131 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import testtools
+
+from trove.backup.models import DBBackup
+from trove.common import cfg
+from trove.common import utils
+from trove.db import get_db_api
+from trove.instance.models import DBInstance
+from trove.instance.tasks import InstanceTasks
+from trove.quota import reconcile
+from trove.quota.models import QuotaUsage
+from trove.quota.models import Reservation
+from trove.quota.models import Resource
+from trove.tests.unittests.util import util
+
+CONF = cfg.CONF
+
+
+class ReconcileQuotaUsagesTest(testtools.TestCase):
+
+    def setUp(self):
+        super(ReconcileQuotaUsagesTest, self).setUp()
+        util.init_db()
+        self.tenant_id = utils.generate_uuid()
+        self.instances = [
+            self._instance(volume_size=2),
+            self._instance(volume_size=3),
+            self._instance(volume_size=4, task_status=InstanceTasks.DELETING),
+            self._instance(volume_size=5, deleted=True)]
+        get_db_api().save(DBBackup(id=utils.generate_uuid(),
+                                   tenant_id=self.tenant_id, name='backup',
+                                   state='COMPLETED', deleted=False))
+
+    def tearDown(self):
+        super(ReconcileQuotaUsagesTest, self).tearDown()
+        for usage in QuotaUsage.find_all(tenant_id=self.tenant_id):
+            Reservation.find_all(usage_id=usage.id).delete()
+            usage.delete()
+        for instance in self.instances:
+            instance.delete()
+        DBBackup.find_all(tenant_id=self.tenant_id).delete()
+
+    def _instance(self, volume_size, task_status=InstanceTasks.NONE,
+                  deleted=False):
+        instance = DBInstance.create(name='quota', flavor_id='1',
+                                     tenant_id=self.tenant_id,
+                                     volume_size=volume_size,
+                                     task_status=task_status)
+        if deleted:
+            instance.deleted = True
+            instance.save()
+        return instance
+
+    def _usage(self, resource, in_use=0, reserved=0):
+        return QuotaUsage.create(tenant_id=self.tenant_id, resource=resource,
+                                 in_use=in_use, reserved=reserved)
+
+    def _in_use(self, resource):
+        return QuotaUsage.find_by(tenant_id=self.tenant_id,
+                                  resource=resource).in_use
+
+    def test_count_in_use(self):
+        in_use = reconcile.count_in_use()
+        self.assertEqual(2, in_use[(self.tenant_id, Resource.INSTANCES)])
+        self.assertEqual(5, in_use[(self.tenant_id, Resource.VOLUMES)])
+        self.assertEqual(1, in_use[(self.tenant_id, Resource.BACKUPS)])
+
+    def test_corrects_drifted_usages(self):
+        self._usage(Resource.INSTANCES, in_use=7)
+        self._usage(Resource.BACKUPS, in_use=1)
+
+        result = reconcile.reconcile_quota_usages()
+
+        self.assertEqual(2, self._in_use(Resource.INSTANCES))
+        self.assertEqual(1, self._in_use(Resource.BACKUPS))
+        self.assertTrue(result['corrected'] >= 1)
+
+    def test_creates_missing_usages(self):
+        reconcile.reconcile_quota_usages()
+        self.assertEqual(2, self._in_use(Resource.INSTANCES))
+        self.assertEqual(1, self._in_use(Resource.BACKUPS))
+
+    def test_expires_stale_reservations(self):
+        usage = self._usage(Resource.INSTANCES, in_use=2, reserved=1)
+        created = utils.utcnow() - datetime.timedelta(
+            seconds=CONF.quota_reservation_expire + 1)
+        stale = Reservation.create(usage_id=usage.id, delta=1,
+                                   status=Reservation.Statuses.RESERVED)
+        stale.created = created
+        stale.save()
+
+        reconcile.reconcile_quota_usages()
+
+        usage = QuotaUsage.find_by(id=usage.id)
+        self.assertEqual(2, usage.in_use)
+        self.assertEqual(0, usage.reserved)
+        self.assertEqual(Reservation.Statuses.ROLLEDBACK,
+                         Reservation.find_by(id=stale.id).status)
+
+    def test_leaves_in_use_with_reservation_in_flight(self):
+        usage = self._usage(Resource.INSTANCES, in_use=1, reserved=1)
+        Reservation.create(usage_id=usage.id, delta=1,
+                           status=Reservation.Statuses.RESERVED)
+
+        reconcile.reconcile_quota_usages()
+
+        usage = QuotaUsage.find_by(id=usage.id)
+        self.assertEqual(1, usage.in_use)
+        self.assertEqual(1, usage.reserved)
+
+    def test_skips_usage_changed_meanwhile(self):
+        usage = self._usage(Resource.INSTANCES, in_use=7)
+        correction = {'id': usage.id, 'in_use': 6, 'reserved': 0,
+                      'new_in_use': 2, 'new_reserved': 0}
+        self.assertEqual(0, get_db_api().quota_usages_correct([correction]))
+        self.assertEqual(7, self._in_use(Resource.INSTANCES))
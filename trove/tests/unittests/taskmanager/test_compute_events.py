@@ -0,0 +1,178 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import testtools
+from mock import patch
+from mockito import when, unstub, verify, never, any
+
+from trove.common import cfg
+from trove.common import utils
+from trove.common.context import TroveContext
+from trove.instance import models as instance_models
+from trove.instance.models import DBInstance
+from trove.instance.tasks import InstanceTasks
+from trove.taskmanager import compute_events
+from trove.tests.fakes.compute_events import compute_event
+from trove.tests.fakes.compute_events import FakeComputeEventSource
+from trove.tests.unittests.util import util
+
+CONF = cfg.CONF
+
+FIXED_IPS = [{'label': 'private', 'address': '10.0.0.2', 'version': 4,
+              'floating_ips': []}]
+
+
+class ComputeEventPayloadTest(testtools.TestCase):
+
+    def test_status_from_vm_state(self):
+        self.assertEqual('ACTIVE', compute_events.server_status_from_payload(
+            {'state': 'active'}))
+        self.assertEqual('DELETED', compute_events.server_status_from_payload(
+            {'state': 'deleted'}))
+
+    def test_status_from_task_state(self):
+        self.assertEqual('REBOOT', compute_events.server_status_from_payload(
+            {'state': 'active', 'new_task_state': 'rebooting'}))
+
+    def test_addresses_from_payload(self):
+        addresses = compute_events.addresses_from_payload(
+            {'fixed_ips': FIXED_IPS})
+        self.assertEqual({'private': [{'addr': '10.0.0.2', 'version': 4}]},
+                         addresses)
+
+
+class ComputeEventHandlerTest(testtools.TestCase):
+
+    def setUp(self):
+        super(ComputeEventHandlerTest, self).setUp()
+        util.init_db()
+        self.server_id = 'compute-%s' % utils.generate_uuid()
+        self.db_info = DBInstance.create(
+            name='events', flavor_id='1', tenant_id='tenant_1',
+            compute_instance_id=self.server_id,
+            task_status=InstanceTasks.NONE)
+        self.handler = compute_events.ComputeEventHandler(batch_size=10)
+        self.orig_from_notifications = CONF.server_state_from_notifications
+
+    def tearDown(self):
+        super(ComputeEventHandlerTest, self).tearDown()
+        CONF.server_state_from_notifications = self.orig_from_notifications
+        unstub()
+        self.db_info.delete()
+
+    def _stored(self):
+        return DBInstance.find_by(id=self.db_info.id)
+
+    def test_replay_stores_latest_state(self):
+        now = datetime.datetime.utcnow()
+        source = FakeComputeEventSource()
+        source.add('create.end', self.server_id, 'active',
+                   fixed_ips=FIXED_IPS,
+                   timestamp=now)
+        source.add('reboot.start', self.server_id, 'active',
+                   task_state='rebooting',
+                   timestamp=now + datetime.timedelta(seconds=1))
+        source.replay(self.handler)
+
+        stored = self._stored()
+        self.assertEqual('REBOOT', stored.server_status)
+        self.assertTrue('10.0.0.2' in stored.server_addresses)
+
+    def test_stale_event_is_ignored(self):
+        now = datetime.datetime.utcnow()
+        FakeComputeEventSource().add(
+            'create.end', self.server_id, 'active', fixed_ips=FIXED_IPS,
+            timestamp=now).replay(self.handler)
+        FakeComputeEventSource().add(
+            'create.start', self.server_id, 'building',
+            timestamp=now - datetime.timedelta(seconds=5)).replay(self.handler)
+
+        self.assertEqual('ACTIVE', self._stored().server_status)
+
+    def test_other_events_are_ignored(self):
+        source = FakeComputeEventSource()
+        source.events.append({'event_type': 'volume.create.end',
+                              'payload': {'instance_id': self.server_id}})
+        source.replay(self.handler)
+        self.assertEqual(None, self._stored().server_updated)
+
+    def _failing_writes(self, side_effect=None):
+        db_api = compute_events.get_db_api()
+
+        def bulk_update(*args, **kwargs):
+            if side_effect:
+                side_effect()
+            raise RuntimeError("The database is away.")
+
+        return patch.object(db_api, 'bulk_update', bulk_update)
+
+    def test_failed_flush_keeps_states(self):
+        self.handler(compute_event('create.end', self.server_id, 'active',
+                                   fixed_ips=FIXED_IPS))
+        with self._failing_writes():
+            self.assertRaises(RuntimeError, self.handler.flush)
+        self.assertEqual(None, self._stored().server_status)
+
+        self.assertEqual(1, self.handler.flush())
+        stored = self._stored()
+        self.assertEqual('ACTIVE', stored.server_status)
+        self.assertTrue('10.0.0.2' in stored.server_addresses)
+
+    def test_failed_batch_flush_keeps_states(self):
+        handler = compute_events.ComputeEventHandler(batch_size=1)
+        with self._failing_writes():
+            handler(compute_event('create.end', self.server_id, 'active'))
+        handler.flush()
+        self.assertEqual('ACTIVE', self._stored().server_status)
+
+    def test_failed_flush_keeps_newer_state(self):
+        now = datetime.datetime.utcnow()
+        self.handler(compute_event('create.end', self.server_id, 'active',
+                                   fixed_ips=FIXED_IPS, timestamp=now))
+        later = now + datetime.timedelta(seconds=1)
+        newer = compute_event('reboot.start', self.server_id, 'active',
+                              task_state='rebooting', timestamp=later)
+        with self._failing_writes(lambda: self.handler(newer)):
+            self.assertRaises(RuntimeError, self.handler.flush)
+
+        self.handler.flush()
+        stored = self._stored()
+        self.assertEqual('REBOOT', stored.server_status)
+        self.assertTrue('10.0.0.2' in stored.server_addresses)
+
+    def test_consumer_joins_pool(self):
+        source = FakeComputeEventSource()
+        source.add('create.end', self.server_id, 'active',
+                   fixed_ips=FIXED_IPS)
+        consumer = compute_events.ComputeEventConsumer(handler=self.handler)
+        consumer.start(source)
+        source.replay()
+        self.assertEqual('ACTIVE', self._stored().server_status)
+
+    def test_api_reads_stored_state(self):
+        CONF.server_state_from_notifications = True
+        FakeComputeEventSource().add(
+            'create.end', self.server_id, 'active',
+            fixed_ips=FIXED_IPS).replay(self.handler)
+        when(instance_models).create_nova_client(any()).thenReturn(None)
+
+        db_info = self._stored()
+        instance_models.load_simple_instance_server_status(
+            TroveContext(tenant='tenant_1'), db_info)
+
+        self.assertEqual('ACTIVE', db_info.server_status)
+        self.assertEqual('10.0.0.2', db_info.addresses['private'][0]['addr'])
+        verify(instance_models, never).create_nova_client(any())